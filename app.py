@@ -1,16 +1,39 @@
 import os
+import hashlib
+import json
 import logging
+import asyncio
+import secrets
+import time
+from datetime import datetime
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_ai.messages import ModelMessagesTypeAdapter
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-from src import db_connection
-from src.agent import create_clickup_agent
+from src import db_connection, MessageService
+from src.agent import get_clickup_agent
+from src.agent.rate_limit import clickup_rate_limiter
+from src.agent.hedging import model_call_stats
+from src.agent.tool_selection import tool_selection_stats, track_tool_selection
+from src.agent.intents import intent_stats
+from src.agent.run_phases import run_phase_stats, track_run_phases
+from src.clickup.client import close_clickup_client
+from src.clickup.search import task_search
+from src.clickup.snapshot import workspace_snapshot
+from src.jobs.clickup_sync import sync_tasks, sync_workspace
+from src.services.session_cache import session_cache
+from src.services.write_behind import write_behind
+from src.repositories.pagination import InvalidPageToken, decode_token
+from src.services.chat_batch import ChatBatchRunner
+from src.services.live_session import LiveConversation
+from src.services.export import ConversationExporter, ExportFilter, compress_stream, EXPORT_SORT
+from src.repositories.usage import GROUP_FIELDS, BUCKETS, hour_range
 
 load_dotenv()
 
@@ -30,6 +53,28 @@ class ChatResponse(BaseModel):
     success: bool = Field(..., description="Whether the request was successful")
     message: Optional[str] = Field(None, description="Response message")
     error: Optional[str] = Field(None, description="Error message if any")
+    tool_selection: Optional[Dict[str, Any]] = Field(None, description="Tools sent to the model and estimated prompt tokens saved by the tool selection")
+    timings: Optional[Dict[str, Any]] = Field(None, description="Duration of each phase of the agent run, and the time saved by running them concurrently")
+
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest] = Field(..., min_length=1, description="Prompts to run; items of the same user_id run in order")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Runs in flight at once (capped by CHAT_BATCH_CONCURRENCY)")
+    stream: bool = Field(False, description="Stream one NDJSON line per item as it completes")
+
+
+class ChatBatchItemResponse(ChatResponse):
+    index: int = Field(..., description="Position of the item in the request")
+    user_id: str
+    queued_ms: float = Field(..., description="Time spent waiting for a concurrency slot or for earlier items of the session")
+    run_ms: float = Field(..., description="Agent run time, including saving the turn")
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItemResponse] = Field(..., description="Per-item results, in request order")
+    succeeded: int
+    failed: int
+    elapsed_ms: float
 
 
 class HealthResponse(BaseModel):
@@ -37,6 +82,70 @@ class HealthResponse(BaseModel):
     database: str = Field(..., description="Database connection status")
 
 
+class MetricsResponse(BaseModel):
+    database: Dict[str, Any] = Field(..., description="MongoDB connection pool statistics")
+    session_cache: Dict[str, Any] = Field(..., description="Session history cache size and hit rate")
+    write_behind: Dict[str, Any] = Field(..., description="Background persistence queue statistics")
+    clickup_rate_limit: Dict[str, Any] = Field(..., description="ClickUp tool calls and time spent throttled, per priority")
+    model_calls: Dict[str, Any] = Field(..., description="Model request latencies, hedges, retries and wasted tokens")
+    tool_selection: Dict[str, Any] = Field(..., description="Steps, expansions and prompt tokens saved by the per-turn tool selection")
+    intents: Dict[str, Any] = Field(..., description="Commands answered without the model, by intent, and fallbacks to the model")
+    run_phases: Dict[str, Any] = Field(..., description="Percentiles of the agent run phases and of the time saved by overlapping them")
+    workspace_snapshot: Dict[str, Any] = Field(..., description="Size, version and sync results of the ClickUp workspace snapshot")
+    task_search: Dict[str, Any] = Field(..., description="Size, build times and sync results of the ClickUp task search index")
+
+
+class IndexReportResponse(BaseModel):
+    collections: List[Dict[str, Any]] = Field(..., description="Declared vs existing indexes per collection")
+
+
+class SessionListResponse(BaseModel):
+    sessions: List[Dict[str, Any]] = Field(..., description="Sessions of the page, without their messages unless requested")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, absent on the last page")
+
+
+class UsageResponse(BaseModel):
+    start: datetime = Field(..., description="Start of the range summed (UTC): the requested start rounded down to the hour")
+    end: datetime = Field(..., description="End of the range summed (UTC, exclusive): the requested end rounded up to the hour")
+    requested_start: datetime
+    requested_end: datetime
+    group_by: List[str]
+    bucket: Optional[str]
+    rows: List[Dict[str, Any]] = Field(..., description="Summed requests and tokens per group and period")
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether the client's If-None-Match already names `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def require_export_token(request: Request) -> None:
+    """Bearer token check for the session, export and usage endpoints (disabled when EXPORT_API_TOKEN is unset)."""
+    expected = os.getenv("EXPORT_API_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid export token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting up FastAPI application...")
@@ -47,9 +156,32 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to database: {e}")
         raise
     
+    try:
+        await MessageService().prepare_storage()
+        logger.info("Message storage prepared")
+    except Exception as e:
+        logger.error(f"Failed to prepare message storage: {e}")
+    
+    await session_cache.start(db_connection.raw_messages_collection)
+    await write_behind.start(MessageService().save_messages)
+    try:
+        await workspace_snapshot.start(sync_workspace, db_connection.settings.clickup_sync_interval_seconds)
+    except Exception as e:
+        logger.error(f"Failed to load the ClickUp workspace snapshot: {e}")
+    if db_connection.settings.clickup_task_sync_interval_seconds >= 0:
+        try:
+            await task_search.start(sync_tasks, db_connection.settings.clickup_task_sync_interval_seconds)
+        except Exception as e:
+            logger.error(f"Failed to load the ClickUp task search index: {e}")
+    
     yield
     
     logger.info("Shutting down FastAPI application...")
+    await task_search.stop()
+    await close_clickup_client()
+    await workspace_snapshot.stop()
+    await write_behind.stop()
+    await session_cache.stop()
     await db_connection.disconnect()
     logger.info("Database connection closed")
 
@@ -96,6 +228,172 @@ async def health_check():
     )
 
 
+@app.get("/metrics", response_model=MetricsResponse)
+async def metrics():
+    """Runtime statistics used to tune the service."""
+    return MetricsResponse(
+        database=db_connection.get_pool_stats(),
+        session_cache=session_cache.get_stats(),
+        write_behind=write_behind.get_stats(),
+        clickup_rate_limit=clickup_rate_limiter.get_stats(),
+        model_calls=model_call_stats.to_dict(),
+        tool_selection=tool_selection_stats.to_dict(),
+        intents=intent_stats.to_dict(),
+        run_phases=run_phase_stats.to_dict(),
+        workspace_snapshot=workspace_snapshot.get_stats(),
+        task_search=task_search.get_stats()
+    )
+
+
+@app.get("/health/indexes", response_model=IndexReportResponse)
+async def index_report():
+    """Report missing, undeclared and unused indexes, and TTL drift, on the message collections."""
+    reports = await MessageService().get_index_reports()
+    return IndexReportResponse(collections=[report.to_dict() for report in reports])
+
+
+@app.get("/sessions", response_model=SessionListResponse, dependencies=[Depends(require_export_token)])
+async def list_sessions(
+    request: Request,
+    agent_id: Optional[str] = Query(None, description="Only sessions of this agent, newest first (default: all, most recently updated first)"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_messages: bool = Query(False, description="Include the simplified conversation of each session")
+):
+    """Page through sessions with an opaque cursor."""
+    service = MessageService()
+    try:
+        if agent_id:
+            page = await service.list_sessions_by_agent(agent_id, limit, cursor, include_messages)
+        else:
+            page = await service.list_recent_sessions(limit, cursor, include_messages)
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    etag = make_etag(include_messages, page.next_token, *((session.session_id, session.updated_at) for session in page.items))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    body = SessionListResponse(
+        sessions=[session.model_dump(mode="json", exclude_none=True) for session in page.items],
+        next_cursor=page.next_token
+    )
+    return Response(content=body.model_dump_json(), media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/sessions/{session_id}", dependencies=[Depends(require_export_token)])
+async def get_session(session_id: str, request: Request):
+    """A session summary. Polling with If-None-Match only costs an updated_at lookup.
+    
+    An archived session is returned as its stub, without messages, with `archived: true`;
+    reading it does not restore it (running a turn does).
+    """
+    service = MessageService()
+    updated_at = await service.get_session_updated_at(session_id)
+    if updated_at is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    etag = make_etag(session_id, updated_at.isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    session = await service.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    body = session.model_dump(mode="json")
+    body["archived"] = session.archived_at is not None
+    return JSONResponse(body, headers={"ETag": etag})
+
+
+@app.get("/sessions/{session_id}/messages", dependencies=[Depends(require_export_token)])
+async def get_session_messages(
+    session_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="Only the last `limit` messages")
+):
+    """The raw pydantic-ai history of a session. The ETag follows the stored version.
+    
+    An archived history is read from the archive, without restoring the session.
+    """
+    service = MessageService()
+    version = await service.get_messages_version(session_id)
+    etag = make_etag(session_id, version, limit) if version is not None else None
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    messages = await service.get_raw_messages(session_id, limit, restore=False)
+    if messages is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    # Messages stored as JSON are sent as they are, without validating them
+    items = []
+    for index in range(len(messages)):
+        raw = messages.raw_json(index)
+        items.append(raw if raw is not None else ModelMessagesTypeAdapter.dump_json([messages[index]])[1:-1])
+    headers = {"ETag": etag} if etag else {}
+    return Response(content=b"[" + b",".join(items) + b"]", media_type="application/json", headers=headers)
+
+
+@app.get("/export/conversations", dependencies=[Depends(require_export_token)])
+async def export_conversations(
+    agent_id: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Sessions updated at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Sessions updated before this time (UTC)"),
+    include_messages: bool = Query(True, description="Include each session's raw messages"),
+    checkpoint: Optional[str] = Query(None, description="Resume after the checkpoint of the last line received"),
+    compress: str = Query("none", pattern="^(none|gzip|zstd)$"),
+    batch_size: int = Query(200, ge=1, le=1000)
+):
+    """Stream sessions and raw messages as NDJSON, one session per line."""
+    if checkpoint:
+        try:
+            decode_token(checkpoint, EXPORT_SORT)
+        except InvalidPageToken as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    exporter = ConversationExporter(batch_size=batch_size, include_messages=include_messages)
+    export_filter = ExportFilter(agent_id=agent_id, user_id=user_id, since=since, until=until)
+    headers = {"Content-Encoding": compress} if compress != "none" else {}
+    return StreamingResponse(
+        compress_stream(exporter.lines(export_filter, checkpoint), compress),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+
+@app.get("/usage", response_model=UsageResponse, dependencies=[Depends(require_export_token)])
+async def usage(
+    start: datetime = Query(..., description="Range start (UTC), rounded down to the hour"),
+    end: datetime = Query(..., description="Range end (UTC, exclusive), rounded up to the hour"),
+    group_by: str = Query("agent,model", description="Comma-separated dimensions among agent, model, user"),
+    bucket: Optional[str] = Query("day", description="Time bucket: hour, day, month, or empty for the whole range"),
+    agent_id: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None)
+):
+    """Token usage and request counts, summed from the hourly rollups.
+    
+    Rollups have an hourly resolution: the whole hours overlapping the range are summed, and
+    the response's `start` and `end` are that effective range.
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in GROUP_FIELDS]
+    if unknown or (bucket and bucket not in BUCKETS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid group_by or bucket: {unknown or bucket}")
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    
+    rows = await MessageService().get_usage(start, end, dimensions, bucket or None, agent_id, model, user_id)
+    effective_start, effective_end = hour_range(start, end)
+    return UsageResponse(
+        start=effective_start,
+        end=effective_end,
+        requested_start=start,
+        requested_end=end,
+        group_by=dimensions,
+        bucket=bucket or None,
+        rows=rows
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -110,18 +408,21 @@ async def chat(request: ChatRequest):
     logger.info(f"Chat request from user {request.user_id}: {request.user_input[:50]}...")
     
     try:
-        clickup_agent = create_clickup_agent()
+        clickup_agent = get_clickup_agent()
         
-        result = await clickup_agent.run(
-            user_input=request.user_input,
-            user_id=request.user_id
-        )
+        with track_tool_selection() as selection, track_run_phases() as phases:
+            result = await clickup_agent.run(
+                user_input=request.user_input,
+                user_id=request.user_id
+            )
         response = await clickup_agent.get_agent_response(result)
         logger.info(f"Successfully processed chat request for user {request.user_id}")
         
         return ChatResponse(
             success=True,
-            message=str(response) if result else "Agent processed the request successfully"
+            message=str(response) if result else "Agent processed the request successfully",
+            tool_selection=selection.to_dict() if selection.steps else None,
+            timings=phases.to_dict()
         )
         
     except Exception as e:
@@ -133,6 +434,99 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Run many prompts concurrently on the shared agent and MCP servers.
+    
+    Items of the same user_id run sequentially in request order; the others run with
+    bounded concurrency. With `stream`, results are sent as NDJSON lines as they complete.
+    """
+    max_items = int(os.getenv("CHAT_BATCH_MAX_ITEMS", 100))
+    if len(request.items) > max_items:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {max_items} items per batch")
+    concurrency = int(os.getenv("CHAT_BATCH_CONCURRENCY", 8))
+    if request.max_concurrency:
+        concurrency = min(concurrency, request.max_concurrency)
+    
+    logger.info(f"Chat batch of {len(request.items)} items (concurrency {concurrency})")
+    runner = ChatBatchRunner(get_clickup_agent(), concurrency)
+    items = [(item.user_id, item.user_input) for item in request.items]
+    
+    if request.stream:
+        async def lines():
+            async for result in runner.results(items):
+                yield ChatBatchItemResponse(**result.to_dict()).model_dump_json().encode() + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    started = time.perf_counter()
+    results = [ChatBatchItemResponse(**result.to_dict()) async for result in runner.results(items)]
+    results.sort(key=lambda result: result.index)
+    succeeded = sum(1 for result in results if result.success)
+    return ChatBatchResponse(
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+
+
+@app.websocket("/ws/chat/{user_id}")
+async def chat_websocket(websocket: WebSocket, user_id: str):
+    """
+    Interactive conversation over a WebSocket.
+    
+    The session's history, the agent and its MCP servers stay in memory while the connection
+    is active; each turn only writes its new messages. After LIVE_SESSION_IDLE_SECONDS without
+    a message the hot state is released (the connection stays open and the next message reloads it).
+    
+    Client messages: {"user_input": "..."} or plain text.
+    Server messages: {"type": "ready" | "response" | "error" | "released", ...}
+    """
+    await websocket.accept()
+    idle_timeout = float(os.getenv("LIVE_SESSION_IDLE_SECONDS", 300))
+    conversation = LiveConversation(get_clickup_agent(), user_id)
+    try:
+        try:
+            await conversation.open()
+        except Exception as e:
+            logger.error(f"Failed to open live session {user_id}: {e}", exc_info=True)
+            await websocket.send_json({"type": "error", "error": f"Failed to open session: {e}"})
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            return
+        await websocket.send_json({"type": "ready", "session_id": user_id, "messages": conversation.message_count})
+        while True:
+            try:
+                if conversation.is_open:
+                    text = await asyncio.wait_for(websocket.receive_text(), timeout=idle_timeout)
+                else:
+                    text = await websocket.receive_text()
+            except asyncio.TimeoutError:
+                await conversation.release()
+                await websocket.send_json({"type": "released", "reason": "idle"})
+                continue
+            
+            try:
+                user_input = json.loads(text).get("user_input") if text.lstrip().startswith("{") else text
+            except (ValueError, AttributeError):
+                user_input = None
+            if not isinstance(user_input, str) or not user_input.strip():
+                await websocket.send_json({"type": "error", "error": "Expected {\"user_input\": \"...\"} or text"})
+                continue
+            
+            try:
+                turn = await conversation.turn(user_input)
+            except Exception as e:
+                logger.error(f"Live turn failed for user {user_id}: {e}", exc_info=True)
+                await websocket.send_json({"type": "error", "error": f"Failed to process chat request: {e}"})
+                continue
+            await websocket.send_json({"type": "response", "messages": conversation.message_count, **turn})
+    except WebSocketDisconnect:
+        logger.info(f"Live session {user_id} disconnected")
+    finally:
+        await conversation.release()
+
+
 if __name__ == "__main__":
     import uvicorn
     
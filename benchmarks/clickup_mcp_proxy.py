@@ -0,0 +1,38 @@
+"""
+MCP stdio server exposing the native ClickUp tools, used by
+clickup_tools_benchmark to measure the MCP path: the same API calls, plus the
+JSON-RPC round trip over stdio to a separate process. The real ClickUp MCP
+server runs on Node and starts through npx, so this is a lower bound of its
+overhead.
+
+Usage (started by the benchmark):
+    CLICKUP_API_URL=http://127.0.0.1:8765/api/v2 python -m benchmarks.clickup_mcp_proxy
+"""
+import inspect
+
+from mcp.server.fastmcp import FastMCP
+
+from src.agent.clickup_tools import CLICKUP_NATIVE_TOOLS
+
+
+def without_context(tool):
+    """The tool as a plain function of its arguments (the RunContext parameter is unused)."""
+    async def call(**kwargs):
+        return await tool(None, **kwargs)
+
+    signature = inspect.signature(tool)
+    call.__signature__ = signature.replace(parameters=list(signature.parameters.values())[1:])
+    call.__name__ = tool.__name__
+    call.__doc__ = tool.__doc__
+    return call
+
+
+def main() -> None:
+    server = FastMCP("clickup-proxy", log_level="WARNING")
+    for tool in CLICKUP_NATIVE_TOOLS:
+        server.add_tool(without_context(tool), name=tool.__name__, description=inspect.getdoc(tool))
+    server.run("stdio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Latency of ClickUp tool calls through the native tools and through an MCP
+server over stdio, against the local fake ClickUp API.
+
+A scripted pydantic-ai FunctionModel drives each run through real tool calls,
+so only the tool path differs between the backends:
+
+  workflow   get_tasks of a list, then get_task and get_task_comments in
+             parallel, then create_task_comment (4 API calls, 3 model steps)
+  fan-out    10 tasks read in one model step: 10 parallel get_task calls, or
+             one get_tasks_by_id call (native only)
+
+The MCP backend is benchmarks/clickup_mcp_proxy.py, a Python MCP server
+exposing the same tools: its numbers are a lower bound for the Node server,
+which also pays Node and npx startup. --latency-ms delays each fake API
+response, standing in for the round trip to api.clickup.com.
+
+Usage:
+    python -m benchmarks.clickup_tools_benchmark --runs 200 --concurrency 4 --latency-ms 30
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+# Every ClickUp client points at the fake API, without the shared MongoDB rate limiter
+os.environ.setdefault("CLICKUP_API_KEY", "pk_fake")
+os.environ.setdefault("CLICKUP_TEAM_ID", "1")
+os.environ["CLICKUP_RATE_LIMIT_PER_MINUTE"] = "0"
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+
+from src.agent.clickup_tools import CLICKUP_NATIVE_TOOLS
+from src.agent.hedging import percentile
+from src.agent.mcp_servers import FixedMCPServerStdio
+from src.clickup.client import close_clickup_client, get_clickup_client
+
+from .fake_clickup import FakeClickUpServer, FakeWorkspace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scripted_model() -> FunctionModel:
+    """Plays the tool calls named by the prompt: 'workflow <list> <task>', 'fanout <task>...' or 'bulk <task>...'."""
+
+    def respond(messages, info) -> ModelResponse:
+        prompt = next(part.content for part in messages[0].parts if isinstance(part, UserPromptPart))
+        scenario, *ids = prompt.split()
+        step = sum(isinstance(message, ModelResponse) for message in messages)
+        if scenario == "workflow":
+            list_id, task_id = ids
+            steps = [
+                [ToolCallPart("get_tasks", {"list": list_id})],
+                [ToolCallPart("get_task", {"task_id": task_id}), ToolCallPart("get_task_comments", {"task_id": task_id})],
+                [ToolCallPart("create_task_comment", {"task_id": task_id, "comment_text": "Checked by the benchmark"})],
+            ]
+        elif scenario == "fanout":
+            steps = [[ToolCallPart("get_task", {"task_id": task_id}) for task_id in ids]]
+        else:
+            steps = [[ToolCallPart("get_tasks_by_id", {"task_ids": ids})]]
+        return ModelResponse(parts=steps[step] if step < len(steps) else [TextPart("done")])
+
+    return FunctionModel(respond, model_name="scripted")
+
+
+def prompts(workspace: FakeWorkspace, scenario: str, runs: int, seed: int):
+    rng = random.Random(seed)
+    task_ids = list(workspace.tasks)
+    if scenario == "workflow":
+        return [f"workflow {task['list']['id']} {task['id']}" for task in rng.sample(list(workspace.tasks.values()), runs)]
+    return [f"{scenario} " + " ".join(rng.sample(task_ids, 10)) for _ in range(runs)]
+
+
+async def measure(agent: Agent, runs, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(prompt: str):
+        async with semaphore:
+            started = time.perf_counter()
+            await agent.run(prompt)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(prompt) for prompt in runs))
+    return latencies
+
+
+def report(name: str, latencies, requests: int) -> None:
+    print(
+        f"{name:26} p50 {percentile(latencies, 50) * 1000:7.1f} ms   p95 {percentile(latencies, 95) * 1000:7.1f} ms   "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms   API requests {requests}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with FakeClickUpServer(args.latency_ms / 1000, tasks_per_list=100) as server:
+        os.environ["CLICKUP_API_URL"] = server.url
+        workspace = server.workspace
+
+        native = Agent(scripted_model(), tools=CLICKUP_NATIVE_TOOLS)
+        started = time.perf_counter()
+        await native.run(prompts(workspace, "workflow", 1, seed=0)[0])
+        native_cold = time.perf_counter() - started
+
+        proxy = FixedMCPServerStdio(sys.executable, ["-m", "benchmarks.clickup_mcp_proxy"], env=dict(os.environ), cwd=ROOT, timeout=30)
+        mcp = Agent(scripted_model(), mcp_servers=[proxy])
+        started = time.perf_counter()
+        async with mcp.run_mcp_servers():
+            mcp_start = time.perf_counter() - started
+            await mcp.run(prompts(workspace, "workflow", 1, seed=0)[0])
+            mcp_cold = time.perf_counter() - started
+
+            print(f"first run: native {native_cold * 1000:.0f} ms, mcp {mcp_cold * 1000:.0f} ms (server start {mcp_start * 1000:.0f} ms)")
+            print(f"fake API latency {args.latency_ms:.0f} ms, {args.runs} runs, concurrency {args.concurrency}, HTTP/2 {get_clickup_client().http2}\n")
+
+            for scenario, runs in (("workflow", prompts(workspace, "workflow", args.runs, seed=1)), ("fan-out", prompts(workspace, "fanout", args.runs, seed=2))):
+                for name, agent in (("mcp", mcp), ("native", native)):
+                    before = server.requests
+                    latencies = await measure(agent, runs, args.concurrency)
+                    report(f"{scenario} {name}", latencies, server.requests - before)
+            before = server.requests
+            latencies = await measure(native, prompts(workspace, "bulk", args.runs, seed=2), args.concurrency)
+            report("fan-out native bulk", latencies, server.requests - before)
+        await close_clickup_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
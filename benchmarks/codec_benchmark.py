@@ -0,0 +1,106 @@
+"""
+Compression ratio and encode/decode cost of the message codec.
+
+Builds synthetic conversations with ClickUp-shaped tool returns (task lists,
+workspace hierarchies) and long assistant texts, then measures the BSON size
+and the encode/decode time of the stored document with compression disabled,
+enabled, and enabled with a dictionary trained on a separate sample set.
+
+Usage:
+    python -m benchmarks.codec_benchmark --sessions 200
+"""
+import argparse
+import copy
+import random
+import time
+from datetime import datetime, timedelta
+
+import bson
+from pydantic_ai.messages import (
+    ModelMessagesTypeAdapter, ModelRequest, ModelResponse,
+    SystemPromptPart, UserPromptPart, TextPart, ToolCallPart, ToolReturnPart
+)
+
+from src.agent.instructions import INSTRUCTIONS
+from src.repositories.codecs import MessageCodec
+
+STATUSES = ["to do", "in progress", "review", "blocked", "done"]
+WORDS = "client sprint backlog invoice design review deploy api onboarding migration report budget".split()
+
+
+def fake_task(i: int) -> dict:
+    created = datetime(2025, 1, 1) + timedelta(hours=i)
+    return {
+        "id": f"86c{random.randrange(16**6):06x}",
+        "name": " ".join(random.choices(WORDS, k=4)).capitalize(),
+        "status": {"status": random.choice(STATUSES), "color": "#d3d3d3", "type": "custom"},
+        "date_created": str(int(created.timestamp() * 1000)),
+        "due_date": str(int((created + timedelta(days=7)).timestamp() * 1000)),
+        "assignees": [{"id": random.randrange(10**7), "username": random.choice(["alice", "bob", "chen"])}],
+        "list": {"id": str(900100000 + i % 40), "name": f"List {i % 40}"},
+        "space": {"id": "90150001"},
+        "url": f"https://app.clickup.com/t/86c{i:06x}",
+        "custom_fields": [{"id": "5f3e", "name": "Priority", "type": "drop_down", "value": random.randrange(4)}],
+    }
+
+
+def fake_conversation(turns: int) -> list:
+    messages = [ModelRequest(parts=[SystemPromptPart(content=INSTRUCTIONS), UserPromptPart(content="get workspace hierarchy")])]
+    for turn in range(turns):
+        tasks = [fake_task(turn * 50 + i) for i in range(random.randint(5, 50))]
+        messages.append(ModelResponse(parts=[ToolCallPart(tool_name="get_tasks", args={"list_id": "900100001"}, tool_call_id=f"c{turn}")]))
+        messages.append(ModelRequest(parts=[ToolReturnPart(tool_name="get_tasks", content={"tasks": tasks}, tool_call_id=f"c{turn}")]))
+        messages.append(ModelResponse(parts=[TextPart(content=" ".join(random.choices(WORDS, k=300)))]))
+        messages.append(ModelRequest(parts=[UserPromptPart(content="what is blocked in the sprint?")]))
+    return messages
+
+
+def measure(codec: MessageCodec, documents: list) -> tuple:
+    size = encode_time = decode_time = 0.0
+    for messages_data in documents:
+        data = copy.deepcopy(messages_data)
+        start = time.perf_counter()
+        encoded = codec.encode(data)
+        raw = bson.encode({"messages": encoded})
+        encode_time += time.perf_counter() - start
+        size += len(raw)
+
+        start = time.perf_counter()
+        codec.decode(bson.decode(raw)["messages"])
+        decode_time += time.perf_counter() - start
+    return size, encode_time, decode_time
+
+
+def main(sessions: int, threshold: int) -> None:
+    random.seed(7)
+    documents = [ModelMessagesTypeAdapter.dump_python(fake_conversation(random.randint(2, 8)), mode="json") for _ in range(sessions)]
+    training = [ModelMessagesTypeAdapter.dump_python(fake_conversation(4), mode="json") for _ in range(100)]
+
+    samples = []
+    for messages_data in training:
+        samples.extend(MessageCodec.training_samples(messages_data, 256))
+    dictionary_codec = MessageCodec(enabled=True, threshold=threshold)
+    start = time.perf_counter()
+    dictionary_codec.add_dictionary(MessageCodec.train_dictionary(samples))
+    training_time = time.perf_counter() - start
+
+    variants = [
+        ("uncompressed", MessageCodec(enabled=False)),
+        ("zstd", MessageCodec(enabled=True, threshold=threshold)),
+        ("zstd + dictionary", dictionary_codec),
+    ]
+    baseline = None
+    print(f"{sessions} sessions, threshold {threshold} B, dictionary trained on {len(samples)} samples in {training_time:.2f}s\n")
+    print(f"{'variant':20} {'stored MB':>10} {'ratio':>7} {'encode ms/doc':>14} {'decode ms/doc':>14}")
+    for name, codec in variants:
+        size, encode_time, decode_time = measure(codec, documents)
+        baseline = baseline or size
+        print(f"{name:20} {size / 1e6:10.2f} {baseline / size:7.2f} {encode_time * 1000 / sessions:14.3f} {decode_time * 1000 / sessions:14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Message codec benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=4096)
+    args = parser.parse_args()
+    main(args.sessions, args.threshold)
@@ -0,0 +1,269 @@
+"""
+Local fake of the ClickUp API v2, for benchmarks and for trying the native
+ClickUp tools without a real workspace.
+
+It serves an in-memory workspace (one team, spaces, folders, lists, members
+and tasks) for the endpoints the sync job and the native tools use, with an
+optional delay per request standing in for the network and API latency.
+
+Usage:
+    python -m benchmarks.fake_clickup --port 8765 --latency-ms 30
+    CLICKUP_API_URL=http://127.0.0.1:8765/api/v2 CLICKUP_TOOL_BACKEND=native python main.py
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import APIRouter, Body, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+STATUSES = ["to do", "in progress", "review", "complete"]
+WORDS = "invoice payment login onboarding dashboard export report billing webhook search calendar upload profile audit".split()
+
+
+class FakeWorkspace:
+    def __init__(self, team_id: str = "1", spaces: int = 2, lists_per_space: int = 3, tasks_per_list: int = 50, seed: int = 1):
+        rng = random.Random(seed)
+        self.team_id = team_id
+        self.members = [{"id": 100 + number, "username": f"member{number}", "email": f"member{number}@example.com"} for number in range(5)]
+        self.spaces: List[Dict[str, Any]] = []
+        self.lists: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.comments: Dict[str, List[Dict[str, Any]]] = {}
+        self._ids = itertools.count(1000)
+        statuses = [{"status": status, "orderindex": index} for index, status in enumerate(STATUSES)]
+        for space_number in range(spaces):
+            space = {"id": str(10 + space_number), "name": f"Space {space_number}", "statuses": statuses}
+            self.spaces.append(space)
+            for list_number in range(lists_per_space):
+                list_id = f"{space['id']}{list_number:02d}"
+                self.lists[list_id] = {"id": list_id, "name": f"List {space_number}.{list_number}", "space": {"id": space["id"]}, "statuses": statuses}
+                for _ in range(tasks_per_list):
+                    self.add_task(list_id, {
+                        "name": " ".join(rng.sample(WORDS, 3)).capitalize(),
+                        "description": " ".join(rng.choices(WORDS, k=20)),
+                        "status": rng.choice(STATUSES),
+                        "assignees": [rng.choice(self.members)["id"]],
+                    })
+
+    def add_task(self, list_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        task_id = f"t{next(self._ids)}"
+        now = str(int(time.time() * 1000))
+        members = {member["id"]: member for member in self.members}
+        task = {
+            "id": task_id,
+            "name": fields["name"],
+            "text_content": fields.get("markdown_description") or fields.get("description") or "",
+            "status": {"status": fields.get("status") or STATUSES[0]},
+            "list": {"id": list_id, "name": self.lists[list_id]["name"]},
+            "space": self.lists[list_id]["space"],
+            "assignees": [members[member_id] for member_id in fields.get("assignees") or [] if member_id in members],
+            "tags": [{"name": tag} for tag in fields.get("tags") or []],
+            "priority": None,
+            "due_date": str(fields["due_date"]) if fields.get("due_date") else None,
+            "date_created": now,
+            "date_updated": now,
+            "parent": fields.get("parent"),
+            "url": f"https://app.clickup.com/t/{task_id}",
+        }
+        self.tasks[task_id] = task
+        self.comments[task_id] = []
+        return task
+
+    def task_or_404(self, task_id: str) -> Dict[str, Any]:
+        if task_id not in self.tasks:
+            raise HTTPException(404, detail={"err": "Task not found, deleted", "ECODE": "ITEM_013"})
+        return self.tasks[task_id]
+
+
+def page_of(tasks: List[Dict[str, Any]], page: int) -> Dict[str, Any]:
+    chunk = tasks[page * 100:(page + 1) * 100]
+    return {"tasks": chunk, "last_page": (page + 1) * 100 >= len(tasks)}
+
+
+def create_app(workspace: FakeWorkspace, latency_s: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake ClickUp API")
+    api = APIRouter(prefix="/api/v2")
+    app.state.requests = 0
+
+    @app.get("/_stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    @app.middleware("http")
+    async def simulate_api(request: Request, call_next):
+        if request.url.path == "/_stats":
+            return await call_next(request)
+        if not request.headers.get("authorization"):
+            return JSONResponse({"err": "Token invalid", "ECODE": "OAUTH_025"}, status_code=401)
+        app.state.requests += 1
+        if latency_s:
+            await asyncio.sleep(latency_s)
+        return await call_next(request)
+
+    @app.exception_handler(HTTPException)
+    async def clickup_error(request: Request, error: HTTPException):
+        return JSONResponse(error.detail if isinstance(error.detail, dict) else {"err": str(error.detail)}, status_code=error.status_code)
+
+    @api.get("/user")
+    async def authorized_user():
+        return {"user": workspace.members[0]}
+
+    @api.get("/team")
+    async def teams():
+        return {"teams": [{"id": workspace.team_id, "name": "Fake team", "members": [{"user": member} for member in workspace.members]}]}
+
+    @api.get("/team/{team_id}/space")
+    async def spaces(team_id: str):
+        return {"spaces": workspace.spaces}
+
+    @api.get("/space/{space_id}/folder")
+    async def folders(space_id: str):
+        return {"folders": []}
+
+    @api.get("/space/{space_id}/list")
+    async def folderless_lists(space_id: str):
+        return {"lists": [item for item in workspace.lists.values() if item["space"]["id"] == space_id]}
+
+    @api.get("/list/{list_id}")
+    async def get_list(list_id: str):
+        if list_id not in workspace.lists:
+            raise HTTPException(404, detail={"err": "List not found", "ECODE": "ITEM_015"})
+        return workspace.lists[list_id]
+
+    @api.get("/list/{list_id}/task")
+    async def list_tasks(
+        list_id: str,
+        page: int = 0,
+        statuses: Optional[List[str]] = Query(None, alias="statuses[]"),
+        include_closed: bool = False
+    ):
+        tasks = [task for task in workspace.tasks.values() if task["list"]["id"] == list_id]
+        if statuses:
+            tasks = [task for task in tasks if task["status"]["status"] in statuses]
+        if not include_closed:
+            tasks = [task for task in tasks if task["status"]["status"] != "complete"]
+        return page_of(tasks, page)
+
+    @api.post("/list/{list_id}/task")
+    async def create_task(list_id: str, fields: Dict[str, Any] = Body(...)):
+        if list_id not in workspace.lists:
+            raise HTTPException(404, detail={"err": "List not found", "ECODE": "ITEM_015"})
+        return workspace.add_task(list_id, fields)
+
+    @api.get("/team/{team_id}/task")
+    async def team_tasks(team_id: str, page: int = 0, date_updated_gt: Optional[int] = None):
+        tasks = sorted(workspace.tasks.values(), key=lambda task: -int(task["date_updated"]))
+        if date_updated_gt:
+            tasks = [task for task in tasks if int(task["date_updated"]) > date_updated_gt]
+        return page_of(tasks, page)
+
+    @api.get("/task/{task_id}")
+    async def get_task(task_id: str):
+        return workspace.task_or_404(task_id)
+
+    @api.put("/task/{task_id}")
+    async def update_task(task_id: str, changes: Dict[str, Any] = Body(...)):
+        task = workspace.task_or_404(task_id)
+        for key in ("name", "due_date"):
+            if key in changes:
+                task[key] = changes[key]
+        if "status" in changes:
+            task["status"] = {"status": changes["status"]}
+        if "markdown_description" in changes:
+            task["text_content"] = changes["markdown_description"]
+        task["date_updated"] = str(int(time.time() * 1000))
+        return task
+
+    @api.get("/task/{task_id}/comment")
+    async def get_comments(task_id: str):
+        workspace.task_or_404(task_id)
+        return {"comments": list(reversed(workspace.comments[task_id]))}
+
+    @api.post("/task/{task_id}/comment")
+    async def create_comment(task_id: str, comment: Dict[str, Any] = Body(...)):
+        workspace.task_or_404(task_id)
+        created = {
+            "id": str(next(workspace._ids)),
+            "comment_text": comment.get("comment_text"),
+            "user": workspace.members[0],
+            "date": str(int(time.time() * 1000)),
+        }
+        workspace.comments[task_id].append(created)
+        return {"id": created["id"], "date": created["date"]}
+
+    app.include_router(api)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeClickUpServer:
+    """
+    Runs the fake API in a child process, so it does not compete with the
+    measured code for the GIL: `with FakeClickUpServer(...) as server: server.url`.
+    `workspace` is a local copy of the served workspace (both are built from
+    the same seed), for picking ids.
+    """
+
+    def __init__(self, latency_s: float = 0.0, tasks_per_list: int = 50, port: Optional[int] = None):
+        self.workspace = FakeWorkspace(tasks_per_list=tasks_per_list)
+        self.port = port or free_port()
+        self.command = [
+            sys.executable, "-m", "benchmarks.fake_clickup",
+            "--port", str(self.port),
+            "--latency-ms", str(latency_s * 1000),
+            "--tasks-per-list", str(tasks_per_list),
+        ]
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v2"
+
+    @property
+    def requests(self) -> int:
+        return httpx.get(f"http://127.0.0.1:{self.port}/_stats").json()["requests"]
+
+    def __enter__(self) -> "FakeClickUpServer":
+        self._process = subprocess.Popen(self.command, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.requests
+                return self
+            except httpx.TransportError:
+                if time.monotonic() > deadline or self._process.poll() is not None:
+                    self._process.kill()
+                    raise RuntimeError("The fake ClickUp API did not start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--tasks-per-list", type=int, default=50)
+    args = parser.parse_args()
+    app = create_app(FakeWorkspace(tasks_per_list=args.tasks_per_list), args.latency_ms / 1000)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
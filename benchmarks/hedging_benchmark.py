@@ -0,0 +1,100 @@
+"""
+Tail latency of agent runs with and without hedged model requests.
+
+The model is a pydantic-ai FunctionModel whose latency is usually short and
+occasionally (--slow-rate) much longer, like the slow responses seen in
+production; --error-rate of the requests fail with a 503. Each run goes
+through a real Agent, so the hedge and retry logic is exercised exactly as
+in AxleAgent.
+
+  plain          the model as is (failed requests fail the run)
+  hedged         HedgedModel: hedge after the p95 of observed latencies,
+                 retry transient errors with jittered backoff
+
+Usage:
+    python -m benchmarks.hedging_benchmark --runs 400 --concurrency 20
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+from pydantic_ai.usage import Usage
+
+from src.agent.hedging import HedgedModel, HedgingPolicy, ModelCallStats, percentile
+
+
+def flaky_model(fast_s: float, slow_s: float, slow_rate: float, error_rate: float, seed: int) -> FunctionModel:
+    rng = random.Random(seed)
+
+    async def respond(messages, info) -> ModelResponse:
+        draw = rng.random()
+        if draw < error_rate:
+            await asyncio.sleep(fast_s / 2)
+            raise ModelHTTPError(503, "fake", "Service unavailable")
+        latency = slow_s if draw < error_rate + slow_rate else fast_s
+        await asyncio.sleep(latency * rng.uniform(0.8, 1.2))
+        return ModelResponse(parts=[TextPart("ok")], usage=Usage(requests=1, request_tokens=1000, response_tokens=50, total_tokens=1050))
+
+    return FunctionModel(respond, model_name="flaky")
+
+
+async def measure(agent: Agent, runs: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await agent.run("ping")
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(runs)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def report(name: str, latencies, failures: int, elapsed: float) -> None:
+    print(
+        f"{name:8} p50 {percentile(latencies, 50) * 1000:7.1f} ms   p95 {percentile(latencies, 95) * 1000:7.1f} ms   "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms   failed {failures:4}   total {elapsed:6.2f} s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--fast-ms", type=float, default=50)
+    parser.add_argument("--slow-ms", type=float, default=1500)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+    fast_s, slow_s = args.fast_ms / 1000, args.slow_ms / 1000
+
+    plain = Agent(flaky_model(fast_s, slow_s, args.slow_rate, args.error_rate, seed=1))
+    report("plain", *await measure(plain, args.runs, args.concurrency))
+
+    stats = ModelCallStats()
+    policy = HedgingPolicy(initial_delay_s=fast_s * 4, min_delay_s=fast_s, max_retries=2, retry_base_delay_s=fast_s)
+    hedged = Agent(HedgedModel(flaky_model(fast_s, slow_s, args.slow_rate, args.error_rate, seed=1), policy, stats))
+    report("hedged", *await measure(hedged, args.runs, args.concurrency))
+
+    overhead = stats.wasted_request_tokens + stats.wasted_response_tokens
+    print(
+        f"\nhedged {stats.hedged} of {stats.requests} requests ({stats.hedged / stats.requests:.1%}), "
+        f"{stats.hedge_wins} won by the hedge, {stats.retries} retries; "
+        f"wasted tokens {overhead} (~{overhead / (args.runs * 1050):.1%} of the useful tokens)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
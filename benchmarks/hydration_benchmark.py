@@ -0,0 +1,99 @@
+"""
+Documents per second of AgentSession hydration and serialization.
+
+Starts from the dicts the driver returns for agent_sessions documents
+(datetimes, nested simplified messages, token usage) and compares:
+
+  validate per doc     previous path: model_class(**document)
+  validate batch       one TypeAdapter(List[model]).validate_python call
+  trusted              construct_trusted (no validation, nested models built)
+  trusted projected    trusted, on documents read without `messages`
+
+and, for writes, `.dict()` (previous path) against `model_dump()`.
+
+Usage:
+    python -m benchmarks.hydration_benchmark --documents 2000 --messages 20
+"""
+import argparse
+import random
+import time
+import warnings
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks.codec_benchmark import WORDS
+from src.models.messages import AgentSession
+from src.repositories.hydration import construct_trusted, hydrate_many
+from src.repositories.messages import SESSION_SUMMARY_PROJECTION
+
+
+def fake_session_document(i: int, messages: int) -> dict:
+    created = datetime(2025, 1, 1) + timedelta(minutes=i)
+    return {
+        "_id": ObjectId(),
+        "session_id": f"user-{i}",
+        "agent_id": "clickup_agent",
+        "created_at": created,
+        "updated_at": created + timedelta(minutes=30),
+        "raw_messages_collection": "raw_messages",
+        "messages": [
+            {
+                "role": "user" if m % 2 == 0 else "assistant",
+                "content": " ".join(random.choices(WORDS, k=random.randint(8, 80))),
+            }
+            for m in range(messages)
+        ],
+        "model": "gpt-4.1",
+        "token_usage": {
+            "requests": messages // 2,
+            "request_tokens": 1200 * messages,
+            "response_tokens": 150 * messages,
+            "total_tokens": 1350 * messages,
+            "details": {"cached_tokens": 800 * messages, "reasoning_tokens": 0},
+        },
+        "metadata": {"source": "api"},
+    }
+
+
+def project(document: dict) -> dict:
+    return {key: value for key, value in document.items() if key not in SESSION_SUMMARY_PROJECTION}
+
+
+def run(name: str, fn, count: int, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    rate = count * repeat / (time.perf_counter() - start)
+    print(f"{name:22} {rate:14,.0f}")
+    return rate
+
+
+def main(documents: int, messages: int, repeat: int) -> None:
+    docs = [fake_session_document(i, messages) for i in range(documents)]
+    projected = [project(document) for document in docs]
+    sessions = hydrate_many(AgentSession, docs, trusted=True)
+
+    print(f"{documents} sessions of {messages} messages")
+    print(f"{'reads':22} {'docs/s':>14}")
+    baseline = run("validate per doc", lambda: [AgentSession(**document) for document in docs], documents, repeat)
+    run("validate batch", lambda: hydrate_many(AgentSession, docs, trusted=False), documents, repeat)
+    trusted = run("trusted", lambda: [construct_trusted(AgentSession, document) for document in docs], documents, repeat)
+    projected_rate = run("trusted projected", lambda: hydrate_many(AgentSession, projected, trusted=True), documents, repeat)
+    print(f"trusted: x{trusted / baseline:.1f}, trusted projected: x{projected_rate / baseline:.1f}")
+
+    print(f"\n{'writes':22} {'docs/s':>14}")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        run(".dict()", lambda: [session.dict() for session in sessions], documents, repeat)
+    run("model_dump()", lambda: [session.model_dump() for session in sessions], documents, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgentSession hydration benchmark")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.documents, args.messages, args.repeat)
@@ -0,0 +1,119 @@
+"""
+Query latency of the repository lookups with and without the declared indexes.
+
+Seeds a scratch database with synthetic sessions, times the lookups used by
+ModelMessageRepository and AgentSessionRepository, creates the declared
+indexes and times them again. The scratch database is dropped afterwards.
+
+Usage:
+    python -m benchmarks.indexes_benchmark --sessions 50000 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+
+from src.config.database import db_connection
+from src.repositories.indexes import ensure_indexes
+from src.repositories.messages import ModelMessageRepository, AgentSessionRepository
+
+load_dotenv()
+
+
+async def seed(raw, sessions, count: int, agents: int) -> None:
+    now = datetime.utcnow()
+    batch_raw, batch_sessions = [], []
+    for i in range(count):
+        created = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+        session_id = f"session-{i}"
+        batch_raw.append({
+            "session_id": session_id,
+            "messages": [{"kind": "request", "parts": [{"part_kind": "user-prompt", "content": "x" * 200}]}],
+            "timestamp": created.isoformat(),
+            "updated_at": created,
+        })
+        batch_sessions.append({
+            "session_id": session_id,
+            "agent_id": f"agent-{i % agents}",
+            "created_at": created,
+            "updated_at": created + timedelta(minutes=random.randint(0, 600)),
+            "raw_messages_collection": raw.name,
+            "messages": [],
+        })
+        if len(batch_raw) >= 5000:
+            await raw.insert_many(batch_raw)
+            await sessions.insert_many(batch_sessions)
+            batch_raw, batch_sessions = [], []
+    if batch_raw:
+        await raw.insert_many(batch_raw)
+        await sessions.insert_many(batch_sessions)
+
+
+async def time_queries(raw, sessions, count: int, agents: int, queries: int) -> dict:
+    timings = {"raw.find_one(session_id)": [], "sessions.find_one(session_id)": [],
+               "sessions.find(agent_id).sort(created_at)": [], "sessions.find().sort(updated_at)": []}
+    for _ in range(queries):
+        session_id = f"session-{random.randrange(count)}"
+        agent_id = f"agent-{random.randrange(agents)}"
+
+        start = time.perf_counter()
+        await raw.find_one({"session_id": session_id})
+        timings["raw.find_one(session_id)"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await sessions.find_one({"session_id": session_id})
+        timings["sessions.find_one(session_id)"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await sessions.find({"agent_id": agent_id}).sort([("created_at", -1)]).limit(100).to_list(length=100)
+        timings["sessions.find(agent_id).sort(created_at)"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await sessions.find({}).sort([("updated_at", -1)]).limit(100).to_list(length=100)
+        timings["sessions.find().sort(updated_at)"].append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: dict) -> dict:
+    return {
+        name: (statistics.median(values) * 1000, sorted(values)[int(len(values) * 0.95) - 1] * 1000)
+        for name, values in timings.items()
+    }
+
+
+async def main(count: int, agents: int, queries: int) -> None:
+    client = AsyncMongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    database = client[f"{db_connection.settings.database_name}_index_bench"]
+    raw = database["raw_messages"]
+    sessions = database["agent_sessions"]
+    try:
+        await client.drop_database(database.name)
+        print(f"Seeding {count} sessions across {agents} agents...")
+        await seed(raw, sessions, count, agents)
+
+        before = summarize(await time_queries(raw, sessions, count, agents, queries))
+        await ensure_indexes(raw, ModelMessageRepository.index_specs())
+        await ensure_indexes(sessions, AgentSessionRepository.index_specs())
+        after = summarize(await time_queries(raw, sessions, count, agents, queries))
+
+        print(f"\n{'query':45} {'p50 no idx':>11} {'p95 no idx':>11} {'p50 idx':>9} {'p95 idx':>9}  (ms)")
+        for name in before:
+            print(f"{name:45} {before[name][0]:11.2f} {before[name][1]:11.2f} {after[name][0]:9.2f} {after[name][1]:9.2f}")
+    finally:
+        await client.drop_database(database.name)
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index latency benchmark")
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.agents, args.queries))
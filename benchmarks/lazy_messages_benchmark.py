@@ -0,0 +1,83 @@
+"""
+CPU and memory of reading a stored conversation: eager vs lazy deserialization.
+
+Each variant starts from the BSON bytes MongoDB would send back, so the cost
+of the driver's decoding is included:
+
+  eager dicts      previous path: decode to dicts, validate_python the whole list
+  lazy count       RawBSONDocument + LazyMessageSequence, only len()
+  lazy last text   same, only last_text_response()
+  lazy to_list     same, validate everything (JSON fast path for plain messages)
+
+Usage:
+    python -m benchmarks.lazy_messages_benchmark --turns 40 --repeat 50
+"""
+import argparse
+import time
+import tracemalloc
+
+import bson
+from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pydantic_core import to_json
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+from benchmarks.codec_benchmark import fake_conversation
+from src.repositories.lazy_messages import LazyMessageSequence
+
+RAW_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def eager(raw: bytes):
+    return len(ModelMessagesTypeAdapter.validate_python(bson.decode(raw)["messages"]))
+
+
+def lazy_count(raw: bytes):
+    return len(LazyMessageSequence(list(RawBSONDocument(raw, RAW_OPTIONS)["messages"])))
+
+
+def lazy_last_text(raw: bytes):
+    return LazyMessageSequence(list(RawBSONDocument(raw, RAW_OPTIONS)["messages"])).last_text_response()
+
+
+def lazy_all(raw: bytes):
+    return len(LazyMessageSequence(list(RawBSONDocument(raw, RAW_OPTIONS)["messages"])).to_list())
+
+
+def run(name: str, fn, raw: bytes, repeat: int) -> None:
+    fn(raw)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(raw)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:16} {elapsed * 1000:10.3f} {peak / 1024:12.1f}")
+
+
+def main(turns: int, repeat: int) -> None:
+    messages = fake_conversation(turns)
+    messages_data = ModelMessagesTypeAdapter.dump_python(messages, mode="json")
+    documents = {
+        "document format": bson.encode({"messages": messages_data}),
+        "json format": bson.encode({"messages": [to_json(message) for message in messages_data]}),
+    }
+    for label, raw in documents.items():
+        print(f"\n{label}: {len(messages)} messages, {len(raw) / 1024:.0f} KiB BSON")
+        print(f"{'variant':16} {'ms/read':>10} {'peak KiB':>12}")
+        if label == "document format":
+            run("eager dicts", eager, raw, repeat)
+        run("lazy count", lazy_count, raw, repeat)
+        run("lazy last text", lazy_last_text, raw, repeat)
+        run("lazy to_list", lazy_all, raw, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lazy message deserialization benchmark")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.turns, args.repeat)
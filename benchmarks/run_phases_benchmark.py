@@ -0,0 +1,106 @@
+"""
+Critical path of AxleAgent.run with its startup and persistence phases
+overlapped.
+
+The MCP server is benchmarks/clickup_mcp_proxy.py, a real stdio server
+process; the model is a FunctionModel answering after --model-ms; the message
+service stands in for MongoDB, each query costing --db-ms. Every run reports
+its phase durations, its wall time and the time the same phases take one
+after the other (what the run cost before they overlapped):
+
+  cold      the MCP servers start and stop with each run
+  warm      a lease keeps the servers up, as under concurrent traffic
+  command   a command answered by the intent fast path (no model, no MCP)
+
+Usage:
+    python -m benchmarks.run_phases_benchmark --runs 20 --db-ms 15 --model-ms 300
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+
+os.environ.setdefault("DEBUG_MESSAGES", "false")
+
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+
+from src.agent.agent import AxleAgent
+from src.agent.hedging import percentile
+from src.agent.intents import DEFAULT_INTENTS, IntentMatcher
+from src.agent.mcp_servers import FixedMCPServerStdio
+from src.agent.run_phases import track_run_phases
+from src.services.message_service import SessionPrefetch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeMessageService:
+    """The MessageService calls of a run, each MongoDB round trip costing `db_s`."""
+
+    def __init__(self, db_s: float):
+        self.db_s = db_s
+
+    async def get_raw_messages(self, session_id, limit=None):
+        # Version check, then the conversation document
+        await asyncio.sleep(self.db_s * 2)
+        return None
+
+    async def prefetch_session(self, session_id):
+        await asyncio.sleep(self.db_s * 2)
+        return SessionPrefetch(None, None)
+
+    async def save_agent_run(self, session_id, agent_run_result, agent_id, metadata=None, prefetched=None):
+        # Session lookup (skipped when prefetched), then the messages and the summary writes
+        await asyncio.sleep(self.db_s * (2 if prefetched is not None else 3))
+
+
+def model(latency_s: float) -> FunctionModel:
+    async def respond(messages, info) -> ModelResponse:
+        await asyncio.sleep(latency_s)
+        return ModelResponse(parts=[TextPart("done")])
+
+    return FunctionModel(respond, model_name="scripted")
+
+
+async def measure(agent: AxleAgent, prompt: str, runs: int):
+    reports = []
+    for number in range(runs):
+        with track_run_phases() as phases, contextlib.redirect_stdout(io.StringIO()):
+            await agent.run(prompt, user_id=f"session-{number}")
+        reports.append(phases)
+    return reports
+
+
+def report(name: str, reports) -> None:
+    def p50(values) -> str:
+        return f"{percentile(values, 50) * 1000:7.1f}"
+
+    phases = sorted({phase for phases in reports for phase in phases.phases})
+    print(f"{name:8} total p50 {p50([phases.total for phases in reports])} ms   sequential p50 {p50([phases.sequential for phases in reports])} ms")
+    print("         " + "   ".join(f"{phase} {p50([phases.phases.get(phase, 0.0) for phases in reports]).strip()}" for phase in phases))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--db-ms", type=float, default=15)
+    parser.add_argument("--model-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    os.environ.setdefault("CLICKUP_API_KEY", "pk_fake")
+    proxy = FixedMCPServerStdio(sys.executable, ["-m", "benchmarks.clickup_mcp_proxy"], env=dict(os.environ), cwd=ROOT, timeout=30)
+    agent = AxleAgent(agent_id="benchmark", model=model(args.model_ms / 1000), mcp_servers=[proxy], intents=IntentMatcher(DEFAULT_INTENTS))
+    agent._message_service = FakeMessageService(args.db_ms / 1000)
+
+    print(f"database round trip {args.db_ms:.0f} ms, model {args.model_ms:.0f} ms, {args.runs} runs\n")
+    report("cold", await measure(agent, "Summarize the sprint", args.runs))
+    async with agent.mcp_lease().acquire():
+        report("warm", await measure(agent, "Summarize the sprint", args.runs))
+    report("command", await measure(agent, "what time is it", args.runs))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
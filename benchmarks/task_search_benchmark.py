@@ -0,0 +1,121 @@
+"""
+Build time and query latency of the local ClickUp task search index.
+
+Synthetic tasks combine a verb, one or two topics and a component into a
+name, with a few sentences of description, spread over lists and statuses.
+Each query is the name of a random task, either verbatim, reduced to two of
+its words, or with one word misspelled. Many tasks share the same words, so
+a result is relevant when its name holds every word the query meant; the
+reported precision is the share of relevant results in the top 10.
+
+  full-text      BM25 over the inverted index
+  hybrid         BM25 blended with hashed character-trigram vectors
+
+Usage:
+    python -m benchmarks.task_search_benchmark --tasks 100000 --queries 1000
+"""
+import argparse
+import random
+import time
+
+from src.agent.hedging import percentile
+from src.clickup.search import TaskSearchIndex
+
+VERBS = "fix add update remove migrate refactor document review test deploy investigate design optimize".split()
+TOPICS = """
+invoice payment login signup onboarding dashboard export import report billing notification email webhook search
+filter calendar reminder upload avatar profile permission role audit backup cache session token password checkout
+cart coupon subscription refund shipping inventory analytics chart translation locale timezone accessibility
+""".split()
+COMPONENTS = "api frontend backend mobile android ios database worker scheduler gateway admin portal sdk cli".split()
+FILLER = """
+the user reports that when opening page it fails sometimes after upgrade customers need this before release
+please check logs and confirm with the team expected behaviour is described in the spec attached
+""".split()
+STATUSES = ["to do", "in progress", "review", "blocked", "done"]
+
+
+def synthetic_tasks(count: int, lists: int, seed: int):
+    rng = random.Random(seed)
+    tasks = []
+    for number in range(count):
+        topics = rng.sample(TOPICS, rng.choice((1, 2)))
+        name = " ".join([rng.choice(VERBS), *topics, rng.choice(COMPONENTS), f"#{number}"])
+        description = " ".join(rng.choice(FILLER + TOPICS) for _ in range(rng.randint(10, 40)))
+        list_number = rng.randrange(lists)
+        tasks.append({
+            "id": f"t{number:06d}",
+            "name": name,
+            "description": description,
+            "status": rng.choice(STATUSES),
+            "list_id": f"l{list_number}",
+            "list_name": f"Sprint {list_number}",
+            "tags": rng.sample(COMPONENTS, 1),
+        })
+    return tasks
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+
+def queries(tasks, count: int, seed: int):
+    rng = random.Random(seed)
+    generated = []
+    for _ in range(count):
+        task = rng.choice(tasks)
+        words = task["name"].split()[:-1]
+        intended = list(words)
+        kind = rng.choice(("exact", "partial", "typo"))
+        if kind == "partial":
+            words = intended = rng.sample(words, 2)
+        elif kind == "typo":
+            position = max(range(len(words)), key=lambda index: len(words[index]))
+            words[position] = misspell(words[position], rng)
+        generated.append((kind, " ".join(words), set(intended)))
+    return generated
+
+
+def measure(name: str, index: TaskSearchIndex, generated, filtered: bool) -> None:
+    latencies, relevant, totals = [], {}, {}
+    for kind, query, intended in generated:
+        started = time.perf_counter()
+        mask = index.mask(status="in progress") if filtered else None
+        results = index.search(query, 10, mask)
+        latencies.append(time.perf_counter() - started)
+        totals[kind] = totals.get(kind, 0) + 10
+        relevant[kind] = relevant.get(kind, 0) + sum(intended <= set(result["name"].split()) for result in results)
+    precision = "  ".join(f"{kind} {relevant[kind] / totals[kind]:6.1%}" for kind in sorted(totals))
+    print(
+        f"{name:22} p50 {percentile(latencies, 50) * 1000:6.2f} ms   p99 {percentile(latencies, 99) * 1000:6.2f} ms"
+        + ("" if filtered else f"   precision@10: {precision}")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--lists", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=128)
+    args = parser.parse_args()
+
+    tasks = synthetic_tasks(args.tasks, args.lists, seed=1)
+    generated = queries(tasks, args.queries, seed=2)
+    indexes = {
+        "full-text": TaskSearchIndex.build(tasks),
+        "hybrid": TaskSearchIndex.build(tasks, args.dimensions),
+    }
+    for name, index in indexes.items():
+        print(f"build {name:16} {index.build_ms}   {index.nbytes / 2 ** 20:6.1f} MiB")
+    print()
+    for name, index in indexes.items():
+        measure(name, index, generated, filtered=False)
+        measure(f"{name} + status filter", index, generated, filtered=True)
+
+
+if __name__ == "__main__":
+    main()
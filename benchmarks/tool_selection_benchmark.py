@@ -0,0 +1,183 @@
+"""
+Prompt tokens saved by the per-turn tool selection, and whether the tool a
+request needs is still offered to the model.
+
+The catalog stands in for the ClickUp MCP server (its tool names with short
+descriptions and schemas) plus the function tools of the agent. Each sample
+request lists the tools that must be offered; a request counts as a miss when
+one of them is left out, which would cost an expand_tools step in production.
+The last part runs a scripted FunctionModel through an Agent using the
+selector, checking that expand_tools brings back the omitted tools.
+
+Usage:
+    python -m benchmarks.tool_selection_benchmark --max-tools 12
+"""
+import argparse
+import asyncio
+import time
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+from pydantic_ai.tools import Tool, ToolDefinition
+
+from src.agent.hedging import percentile
+from src.agent.tool_selection import EXPAND_TOOL, ToolSelectionPolicy, ToolSelector, estimate_tokens, expand_tools, track_tool_selection
+
+TASK = {"task_id": "Id of the task", "task_name": "Name of the task, instead of the id", "list_name": "Name of the list of the task"}
+CATALOG = {
+    "get_workspace_hierarchy": ("Get the complete workspace hierarchy: spaces, folders and lists with their ids", {}),
+    "create_task": ("Create a single task in a ClickUp list, with description, status, priority, due date, tags and assignees", {"list_id": "Id of the list", "name": "Name", "description": "Description", "status": "Status", "priority": "Priority", "due_date": "Due date", "assignees": "Assignees", "tags": "Tags"}),
+    "create_bulk_tasks": ("Create several tasks in a list at once", {"list_id": "Id of the list", "tasks": "Tasks to create"}),
+    "update_task": ("Update a task: name, description, status, priority, due date, assignees", {**TASK, "assignees": "Assignees", "name": "New name", "status": "New status", "priority": "New priority", "due_date": "New due date"}),
+    "update_bulk_tasks": ("Update several tasks at once", {"tasks": "Tasks with their changes"}),
+    "get_tasks": ("Get the tasks of a list, filtered by status, assignee or due date", {"list_id": "Id of the list", "statuses": "Statuses", "assignees": "Assignees", "due_date_lt": "Due before"}),
+    "get_task": ("Get the details of a task, with its subtasks", {**TASK, "subtasks": "Include subtasks"}),
+    "get_workspace_tasks": ("Get tasks across the workspace filtered by tags, lists, folders, spaces, statuses, assignees and dates", {"tags": "Tags", "list_ids": "Lists", "statuses": "Statuses", "assignees": "Assignees", "due_date_gt": "Due after", "due_date_lt": "Due before"}),
+    "get_task_comments": ("Get the comments of a task", TASK),
+    "create_task_comment": ("Add a comment to a task", {**TASK, "commentText": "Text of the comment", "notifyAll": "Notify everyone"}),
+    "attach_task_file": ("Attach a file to a task from a URL or base64 data", {**TASK, "file_url": "URL of the file", "file_name": "Name"}),
+    "move_task": ("Move a task to another list", {**TASK, "targetListId": "Destination list"}),
+    "move_bulk_tasks": ("Move several tasks to another list", {"tasks": "Tasks", "targetListId": "Destination list"}),
+    "duplicate_task": ("Duplicate a task, optionally into another list", {**TASK, "listId": "Destination list"}),
+    "delete_task": ("Delete a task permanently", TASK),
+    "delete_bulk_tasks": ("Delete several tasks permanently", {"tasks": "Tasks"}),
+    "get_task_time_entries": ("Get the time tracking entries of a task", {**TASK, "startDate": "From", "endDate": "To"}),
+    "start_time_tracking": ("Start tracking time on a task", {**TASK, "description": "Description", "billable": "Billable"}),
+    "stop_time_tracking": ("Stop the running time tracking timer", {"description": "Description"}),
+    "add_time_entry": ("Add a manual time entry to a task", {**TASK, "start": "Start", "duration": "Duration", "billable": "Billable"}),
+    "delete_time_entry": ("Delete a time entry", {"timeEntryId": "Id of the entry"}),
+    "get_current_time_entry": ("Get the running time tracking timer", {}),
+    "create_list": ("Create a list in a space", {"spaceId": "Space", "name": "Name", "content": "Description", "dueDate": "Due date"}),
+    "create_list_in_folder": ("Create a list in a folder", {"folderId": "Folder", "name": "Name", "content": "Description"}),
+    "get_list": ("Get the details of a list", {"listId": "Id of the list", "listName": "Name of the list"}),
+    "update_list": ("Rename a list or change its description", {"listId": "Id of the list", "name": "Name", "content": "Description"}),
+    "delete_list": ("Delete a list and its tasks", {"listId": "Id of the list"}),
+    "create_folder": ("Create a folder in a space", {"spaceId": "Space", "name": "Name"}),
+    "get_folder": ("Get the details of a folder", {"folderId": "Id of the folder", "folderName": "Name"}),
+    "update_folder": ("Rename a folder", {"folderId": "Id of the folder", "name": "Name"}),
+    "delete_folder": ("Delete a folder and its lists", {"folderId": "Id of the folder"}),
+    "get_space_tags": ("Get the tags available in a space", {"spaceId": "Space"}),
+    "add_tag_to_task": ("Add a tag to a task", {**TASK, "tagName": "Tag"}),
+    "remove_tag_from_task": ("Remove a tag from a task", {**TASK, "tagName": "Tag"}),
+    "get_workspace_members": ("Get the members of the workspace", {}),
+    "find_member_by_name": ("Find a workspace member by name or email", {"nameOrEmail": "Name or email"}),
+    "resolve_assignees": ("Resolve member names or emails to user ids for assignment", {"assignees": "Names or emails"}),
+    "create_document": ("Create a document in a space, folder or list", {"name": "Name", "parent": "Parent"}),
+    "get_document": ("Get a document", {"documentId": "Id of the document"}),
+    "list_documents": ("List the documents of the workspace", {"parentId": "Parent"}),
+    "create_document_page": ("Add a page to a document", {"documentId": "Id of the document", "name": "Name", "content": "Content"}),
+    "update_document_page": ("Edit a page of a document", {"documentId": "Id of the document", "pageId": "Page", "content": "Content"}),
+    "get_current_datetime": ("Get the current date and time", {}),
+    "resolve_clickup_ids": ("Resolve names of spaces, folders, lists and members to their ClickUp ids from the synced workspace", {"names": "Names", "kind": "Kind"}),
+    "search_clickup_tasks": ("Search tasks by words of their name or tags across the workspace", {"query": "Words", "list": "List", "status": "Status"}),
+    "get_synced_hierarchy": ("Get the hierarchy of spaces, folders and lists from the synced workspace", {}),
+}
+SAMPLES = [
+    ("Quelle heure est-il ?", {"get_current_datetime"}),
+    ("What time is it?", {"get_current_datetime"}),
+    ("Crée une tâche 'Relancer le client' dans la liste Sales pour vendredi", {"create_task"}),
+    ("Create a task to fix the login page in the Backend list", {"create_task"}),
+    ("Ajoute un commentaire sur la tâche 'Export PDF' pour dire que c'est livré", {"create_task_comment"}),
+    ("What are the latest comments on the onboarding task?", {"get_task_comments"}),
+    ("Passe la tâche 'Audit sécurité' en statut review", {"update_task"}),
+    ("Change the priority of the billing webhook task to urgent", {"update_task"}),
+    ("Déplace la tâche 'Refonte dashboard' dans la liste Archive", {"move_task"}),
+    ("Supprime la tâche 'Test doublon'", {"delete_task"}),
+    ("Start tracking time on the invoice export task", {"start_time_tracking"}),
+    ("Stop my timer", {"stop_time_tracking"}),
+    ("Combien de temps a été passé sur la tâche 'Migration' ?", {"get_task_time_entries"}),
+    ("Montre-moi les tâches de la liste Marketing en cours", {"get_tasks"}),
+    ("Which tasks are due this week across the workspace?", {"get_workspace_tasks"}),
+    ("Crée une liste 'Sprint 12' dans l'espace Produit", {"create_list"}),
+    ("Rename the folder Q3 to Q3 2026", {"update_folder"}),
+    ("Who are the members of the workspace?", {"get_workspace_members"}),
+    ("Assigne la tâche 'Landing page' à Marie", {"update_task", "resolve_assignees"}),
+    ("Ajoute l'étiquette urgent à la tâche 'Paiement Stripe'", {"add_tag_to_task"}),
+    ("Duplique la tâche 'Checklist release' dans la liste Sprint 13", {"duplicate_task"}),
+    ("Show me the workspace hierarchy", {"get_workspace_hierarchy"}),
+    ("Write a new page in the onboarding document", {"create_document_page"}),
+    ("Find the tasks about the upload profile feature", {"search_clickup_tasks"}),
+]
+
+
+def catalog() -> list:
+    return [
+        ToolDefinition(
+            name=name,
+            description=description,
+            parameters_json_schema={
+                "type": "object",
+                "properties": {parameter: {"type": "string", "description": text} for parameter, text in parameters.items()},
+            },
+        )
+        for name, (description, parameters) in CATALOG.items()
+    ] + [ToolDefinition(name=EXPAND_TOOL, description=expand_tools.__doc__, parameters_json_schema={"type": "object", "properties": {"keywords": {"type": "array", "items": {"type": "string"}}}})]
+
+
+def prompt_messages(prompt: str) -> list:
+    return [ModelRequest(parts=[UserPromptPart(prompt)])]
+
+
+def selection(selector: ToolSelector, tool_defs: list, repeats: int) -> None:
+    total = sum(estimate_tokens(tool_def) for tool_def in tool_defs)
+    misses, sent, latencies = [], [], []
+    for prompt, expected in SAMPLES:
+        messages = prompt_messages(prompt)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            selected, _ = selector.select(tool_defs, messages)
+            latencies.append(time.perf_counter() - started)
+        names = {tool_def.name for tool_def in selected}
+        sent.append(sum(estimate_tokens(tool_def) for tool_def in selected))
+        if expected - names:
+            misses.append(f"{prompt!r} misses {', '.join(sorted(expected - names))}")
+
+    print(f"catalog: {len(tool_defs)} tools, ~{total} prompt tokens per step")
+    print(f"selected: ~{sum(sent) / len(sent):.0f} tokens per step on average ({1 - sum(sent) / len(sent) / total:.0%} saved), max {max(sent)}")
+    print(f"selection latency: p50 {percentile(latencies, 50) * 1e6:.0f} µs, p99 {percentile(latencies, 99) * 1e6:.0f} µs")
+    print(f"needed tool offered: {len(SAMPLES) - len(misses)}/{len(SAMPLES)}")
+    for miss in misses:
+        print(f"  {miss}")
+
+
+async def expansion(selector: ToolSelector, tool_defs: list) -> None:
+    """A request whose tool is left out: the model expands with keywords, then finds it."""
+    offered = []
+
+    def respond(messages, info) -> ModelResponse:
+        names = {tool.name for tool in info.function_tools}
+        offered.append(len(names))
+        step = sum(isinstance(message, ModelResponse) for message in messages)
+        if step == 0 and "delete_time_entry" not in names:
+            return ModelResponse(parts=[ToolCallPart(EXPAND_TOOL, {"keywords": ["delete time entry"]})])
+        if "delete_time_entry" in names and not any(isinstance(part, ToolCallPart) and part.tool_name == "delete_time_entry" for message in messages for part in getattr(message, "parts", [])):
+            return ModelResponse(parts=[ToolCallPart("delete_time_entry", {})])
+        return ModelResponse(parts=[TextPart("done")])
+
+    def done() -> dict:
+        return {"ok": True}
+
+    tools = [Tool(expand_tools)] + [
+        Tool(done, name=tool_def.name, description=tool_def.description) for tool_def in tool_defs if tool_def.name != EXPAND_TOOL
+    ]
+    agent = Agent(FunctionModel(respond), tools=tools, prepare_tools=selector)
+    with track_tool_selection() as report:
+        await agent.run("Undo yesterday's mistake, id 42")
+    print(f"\nexpansion run: tools offered per step {offered}, expanded {report.expanded}, ~{report.tokens_saved} tokens saved over {report.steps} steps")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tools", type=int, default=12)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    selector = ToolSelector(ToolSelectionPolicy(max_tools=args.max_tools))
+    tool_defs = catalog()
+    selection(selector, tool_defs, args.repeats)
+    await expansion(selector, tool_defs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
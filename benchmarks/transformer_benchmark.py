@@ -0,0 +1,126 @@
+"""
+Cost of summarizing a run for the session document: three passes vs one fused pass.
+
+  three passes   previous path: transform_messages, extract_model_info and
+                 aggregate_token_usage, each walking the messages, with an
+                 isinstance ladder per part and hasattr checks per usage detail
+  fused          MessageTransformer.transform: one pass, parts dispatched
+                 through a type -> handler table, tool payloads serialized
+                 to JSON by pydantic-core instead of repr()
+
+Usage:
+    python -m benchmarks.transformer_benchmark --messages 10000
+"""
+import argparse
+import time
+
+from pydantic_ai.messages import (
+    ModelRequest, ModelResponse,
+    SystemPromptPart, UserPromptPart, ToolReturnPart, RetryPromptPart, TextPart, ToolCallPart
+)
+
+from benchmarks.codec_benchmark import fake_conversation
+from src.models.messages import SimpleMessage, MessageRole, TokenUsage, TokenUsageDetails
+from src.utils.message_transformer import MessageTransformer
+
+
+def legacy_simple_message(part):
+    # The previous isinstance ladder
+    if isinstance(part, UserPromptPart):
+        content = part.content
+        if isinstance(content, list):
+            text_parts = [item for item in content if isinstance(item, str)]
+            content = " ".join(text_parts) if text_parts else str(content)
+        return SimpleMessage(role=MessageRole.USER, content=str(content))
+    elif isinstance(part, SystemPromptPart):
+        return SimpleMessage(role=MessageRole.SYSTEM, content=part.content)
+    elif isinstance(part, TextPart):
+        return SimpleMessage(role=MessageRole.ASSISTANT, content=part.content)
+    elif isinstance(part, ToolReturnPart):
+        content = part.content if isinstance(part.content, str) else str(part.content)
+        return SimpleMessage(role=MessageRole.TOOL, content=f"[Tool: {part.tool_name}] {content}")
+    elif isinstance(part, ToolCallPart):
+        args_str = part.args if isinstance(part.args, str) else str(part.args)
+        return SimpleMessage(role=MessageRole.ASSISTANT, content=f"[Calling tool: {part.tool_name}] Args: {args_str}")
+    elif isinstance(part, RetryPromptPart):
+        return SimpleMessage(role=MessageRole.SYSTEM, content=f"[Retry requested] {part.model_response()}")
+    return None
+
+
+def legacy_three_passes(messages):
+    simple_messages = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                simple = legacy_simple_message(part)
+                if simple:
+                    simple_messages.append(simple)
+        elif isinstance(message, ModelResponse):
+            for part in message.parts:
+                simple = legacy_simple_message(part)
+                if simple:
+                    simple_messages.append(simple)
+
+    model_name = None
+    for message in messages:
+        if isinstance(message, ModelResponse) and message.model_name:
+            model_name = message.model_name
+            break
+
+    totals = {"requests": 0, "request_tokens": 0, "response_tokens": 0, "total_tokens": 0}
+    details = dict.fromkeys(TokenUsageDetails.model_fields, 0)
+    has_usage = False
+    for message in messages:
+        if isinstance(message, ModelResponse) and message.usage:
+            has_usage = True
+            usage = message.usage
+            totals["requests"] += usage.requests
+            totals["request_tokens"] += usage.request_tokens or 0
+            totals["response_tokens"] += usage.response_tokens or 0
+            totals["total_tokens"] += usage.total_tokens or 0
+            if usage.details:
+                for name in details:
+                    if hasattr(usage.details, name) and getattr(usage.details, name):
+                        details[name] += getattr(usage.details, name)
+    token_usage = TokenUsage(**totals, details=TokenUsageDetails(**details) if any(details.values()) else None) if has_usage else None
+    return simple_messages, model_name, token_usage
+
+
+def history(size: int):
+    messages = []
+    while len(messages) < size:
+        messages.extend(fake_conversation(20))
+    return messages[:size]
+
+
+def run(name: str, fn, messages, repeat: int) -> float:
+    fn(messages)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(messages)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{name:14} {elapsed * 1000:10.2f} {len(messages) / elapsed:14,.0f}")
+    return elapsed
+
+
+def main(size: int, repeat: int) -> None:
+    messages = history(size)
+    fused = MessageTransformer.transform(messages)
+    legacy = legacy_three_passes(messages)
+    # Tool payloads are now rendered as JSON instead of repr(), the rest is identical
+    assert len(fused.simple_messages) == len(legacy[0]) and fused.model_name == legacy[1]
+
+    parts = sum(len(message.parts) for message in messages)
+    print(f"{len(messages)} messages, {parts} parts")
+    print(f"{'variant':14} {'ms':>10} {'messages/s':>14}")
+    before = run("three passes", legacy_three_passes, messages, repeat)
+    after = run("fused", MessageTransformer.transform, messages, repeat)
+    print(f"speedup x{before / after:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MessageTransformer benchmark")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    main(args.messages, args.repeat)
@@ -0,0 +1,83 @@
+import asyncio
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from src import db_connection
+from src.services.export import ConversationExporter, ExportFilter, compress_stream, COMPRESSIONS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, token):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(token or '')
+
+
+async def export(args):
+    checkpoint = args.checkpoint or (read_checkpoint(args.checkpoint_file) if args.checkpoint_file else None)
+    if checkpoint:
+        logger.info(f"Resuming export after checkpoint {checkpoint}")
+    
+    exporter = ConversationExporter(batch_size=args.batch_size, include_messages=not args.no_messages)
+    export_filter = ExportFilter(agent_id=args.agent_id, user_id=args.user_id, since=args.since, until=args.until)
+    # A compressed file cut by a crash cannot be appended to, so only plain output is resumed in place
+    resumable = args.compress == 'none'
+    output = open(args.output, 'ab' if checkpoint and resumable else 'wb') if args.output else sys.stdout.buffer
+    
+    await db_connection.connect()
+    last_report = 0
+    try:
+        async for chunk in compress_stream(exporter.lines(export_filter, checkpoint), args.compress):
+            output.write(chunk)
+            if exporter.stats.sessions - last_report >= args.report_every:
+                last_report = exporter.stats.sessions
+                output.flush()
+                if args.checkpoint_file and resumable:
+                    # Only what was written and flushed is checkpointed
+                    write_checkpoint(args.checkpoint_file, exporter.stats.checkpoint)
+                stats = exporter.stats.to_dict()
+                logger.info(f"{stats['sessions']} sessions, {stats['documents_per_s']} docs/s")
+        output.flush()
+        if args.checkpoint_file:
+            write_checkpoint(args.checkpoint_file, exporter.stats.checkpoint)
+    finally:
+        if args.output:
+            output.close()
+        await db_connection.disconnect()
+    
+    print(json.dumps(exporter.stats.to_dict()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', handlers=[logging.StreamHandler(sys.stderr)])
+    
+    parser = argparse.ArgumentParser(description='Export sessions and raw messages as NDJSON')
+    parser.add_argument('--agent-id', help='Only sessions of this agent')
+    parser.add_argument('--user-id', help='Only the session of this user')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Sessions updated at or after this time (ISO 8601, UTC)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Sessions updated before this time (ISO 8601, UTC)')
+    parser.add_argument('--no-messages', action='store_true', help='Export session summaries and usage only')
+    parser.add_argument('--compress', choices=COMPRESSIONS, default='none')
+    parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    parser.add_argument('--checkpoint', help='Resume after this checkpoint token')
+    parser.add_argument('--checkpoint-file', help='Read the checkpoint from, and save progress to, this file (saved at the end only when compressing)')
+    parser.add_argument('--batch-size', type=int, default=200, help='Sessions fetched per round trip')
+    parser.add_argument('--report-every', type=int, default=1000, help='Log throughput every N sessions')
+    
+    args = parser.parse_args()
+    asyncio.run(export(args))
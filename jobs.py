@@ -0,0 +1,139 @@
+import asyncio
+import argparse
+import json
+import logging
+import sys
+
+from dotenv import load_dotenv
+
+from src import db_connection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+async def train_codec_dictionary(args):
+    from src.jobs.codec_dictionary import train_codec_dictionary
+    return await train_codec_dictionary(
+        sessions=args.sessions,
+        dictionary_size=args.size,
+        dry_run=args.dry_run,
+    )
+
+
+async def collect_blobs(args):
+    from datetime import timedelta
+    from src.repositories.blobs import BlobRepository
+    return await BlobRepository().collect_garbage(
+        [db_connection.raw_messages_collection, db_connection.session_archive_collection],
+        grace=timedelta(hours=args.grace_hours),
+        dry_run=args.dry_run,
+    )
+
+
+async def archive_sessions(args):
+    from src.jobs.archive import archive_idle_sessions
+    return await archive_idle_sessions(
+        idle_days=args.idle_days,
+        limit=args.limit,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+    )
+
+
+async def backfill_usage(args):
+    from src.jobs.usage_rollups import backfill_usage_rollups
+    return await backfill_usage_rollups(batch_size=args.batch_size, dry_run=args.dry_run)
+
+
+async def rebuild_sessions(args):
+    from src.jobs.rebuild_sessions import SessionRebuilder
+    rebuilder = SessionRebuilder(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        default_agent_id=args.default_agent_id,
+        dry_run=args.dry_run,
+    )
+    return await rebuilder.run(checkpoint=args.checkpoint, checkpoint_file=args.checkpoint_file, limit=args.limit)
+
+
+async def sync_clickup(args):
+    from src.agent.rate_limit import BACKGROUND, priority
+    from src.jobs.clickup_sync import sync_workspace
+    with priority(BACKGROUND):
+        return await sync_workspace(team_id=args.team_id, concurrency=args.concurrency, dry_run=args.dry_run)
+
+
+async def sync_clickup_tasks(args):
+    from src.agent.rate_limit import BACKGROUND, priority
+    from src.jobs.clickup_sync import sync_tasks
+    with priority(BACKGROUND):
+        return await sync_tasks(team_id=args.team_id, concurrency=args.concurrency, full=args.full or None, dry_run=args.dry_run)
+
+
+async def run(args):
+    await db_connection.connect()
+    try:
+        result = await args.handler(args)
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        await db_connection.disconnect()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', handlers=[logging.StreamHandler(sys.stderr)])
+    
+    parser = argparse.ArgumentParser(description='ClickUp Agent maintenance jobs')
+    subparsers = parser.add_subparsers(dest='job', required=True)
+    
+    train = subparsers.add_parser('train-codec-dictionary', help='Train the zstd dictionary used for message compression')
+    train.add_argument('--sessions', type=int, default=500, help='Number of sessions to sample')
+    train.add_argument('--size', type=int, default=112 * 1024, help='Dictionary size in bytes')
+    train.add_argument('--dry-run', action='store_true', help='Train and report without storing the dictionary')
+    train.set_defaults(handler=train_codec_dictionary)
+    
+    blobs = subparsers.add_parser('collect-blobs', help='Delete deduplicated message payloads no session references')
+    blobs.add_argument('--grace-hours', type=float, default=24, help='Keep blobs referenced more recently than this')
+    blobs.add_argument('--dry-run', action='store_true', help='Report orphans without deleting them')
+    blobs.set_defaults(handler=collect_blobs)
+    
+    archive = subparsers.add_parser('archive-sessions', help='Move idle sessions to the compressed archive collection')
+    archive.add_argument('--idle-days', type=int, default=None, help='Archive sessions not updated for this many days (default: ARCHIVE_AFTER_DAYS)')
+    archive.add_argument('--limit', type=int, default=None, help='Maximum number of sessions to archive')
+    archive.add_argument('--concurrency', type=int, default=8, help='Sessions archived concurrently')
+    archive.add_argument('--dry-run', action='store_true', help='Count candidates and report the working set without archiving')
+    archive.set_defaults(handler=archive_sessions)
+    
+    usage = subparsers.add_parser('backfill-usage', help='Build the hourly usage rollups from stored conversations')
+    usage.add_argument('--batch-size', type=int, default=200, help='Sessions processed per round trip')
+    usage.add_argument('--dry-run', action='store_true', help='Compute the rollups without writing them')
+    usage.set_defaults(handler=backfill_usage)
+    
+    rebuild = subparsers.add_parser('rebuild-sessions', help='Regenerate agent_sessions summaries from raw_messages in parallel')
+    rebuild.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    rebuild.add_argument('--batch-size', type=int, default=500, help='Conversations read per batch')
+    rebuild.add_argument('--chunk-size', type=int, default=25, help='Conversations per worker task')
+    rebuild.add_argument('--default-agent-id', default='ClickupAgent', help='agent_id of sessions recreated from scratch')
+    rebuild.add_argument('--checkpoint', help='Resume after this checkpoint token')
+    rebuild.add_argument('--checkpoint-file', help='Read the checkpoint from, and save progress to, this file')
+    rebuild.add_argument('--limit', type=int, default=None, help='Stop after this many conversations')
+    rebuild.add_argument('--dry-run', action='store_true', help='Process everything without writing')
+    rebuild.set_defaults(handler=rebuild_sessions)
+    
+    clickup = subparsers.add_parser('sync-clickup', help='Mirror the ClickUp workspace hierarchy into the snapshot collection')
+    clickup.add_argument('--team-id', default=None, help='Workspace to sync (default: CLICKUP_TEAM_ID)')
+    clickup.add_argument('--concurrency', type=int, default=8, help='Spaces fetched concurrently')
+    clickup.add_argument('--dry-run', action='store_true', help='Fetch and diff without writing')
+    clickup.set_defaults(handler=sync_clickup)
+    
+    tasks = subparsers.add_parser('sync-clickup-tasks', help='Mirror the ClickUp tasks the local search index is built from')
+    tasks.add_argument('--team-id', default=None, help='Workspace to sync (default: CLICKUP_TEAM_ID)')
+    tasks.add_argument('--concurrency', type=int, default=4, help='Task pages fetched concurrently')
+    tasks.add_argument('--full', action='store_true', help='Fetch every task and delete the ones that disappeared (default: only when the last full sync is over a day old)')
+    tasks.add_argument('--dry-run', action='store_true', help='Fetch and diff without writing')
+    tasks.set_defaults(handler=sync_clickup_tasks)
+    
+    args = parser.parse_args()
+    asyncio.run(run(args))
@@ -7,8 +7,10 @@ import argparse
 
 from dotenv import load_dotenv
 
-from src import db_connection
+from src import db_connection, MessageService
 from src.agent import create_clickup_agent
+from src.clickup.search import task_search
+from src.clickup.snapshot import workspace_snapshot
 
 load_dotenv()
 
@@ -41,6 +43,20 @@ async def main(user_input=None):
     try:
         print("📝 Connecting to database...")
         await db_connection.connect()
+        try:
+            await MessageService().prepare_storage()
+        except Exception as e:
+            logger.error(f"Failed to prepare message storage: {e}")
+        # The synced ClickUp data, for the native tools and the intent fast path (kept fresh by the app or jobs.py)
+        try:
+            await workspace_snapshot.reload()
+        except Exception as e:
+            logger.error(f"Failed to load the ClickUp workspace snapshot: {e}")
+        if db_connection.settings.clickup_task_sync_interval_seconds >= 0:
+            try:
+                await task_search.reload()
+            except Exception as e:
+                logger.error(f"Failed to load the ClickUp task search index: {e}")
         
         print("🤖 Creating agent...")
         clickup_agent = create_clickup_agent()
@@ -1,17 +1,21 @@
 from .instructions import INSTRUCTIONS
 from .dependencies import AppDependencies
 from .tools import AgentTools
+from .clickup_tools import ClickUpTools, CLICKUP_NATIVE_TOOLS
 from .mcp_servers import MCPServerClickup
-from .agent import AxleAgent, create_clickup_agent
+from .agent import AxleAgent, create_clickup_agent, get_clickup_agent
 
 __all__ = [
     "INSTRUCTIONS",
     "AppDependencies",
     "AgentTools",
+    "ClickUpTools",
+    "CLICKUP_NATIVE_TOOLS",
     "BaseAgent",
     "MCPServerClickup",
     "AgentManager",
     "AppDependencies",
     "AxleAgent",
-    "create_clickup_agent"
+    "create_clickup_agent",
+    "get_clickup_agent"
 ]
\ No newline at end of file
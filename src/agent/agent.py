@@ -1,22 +1,31 @@
 import os
 import asyncio
 import logging
-from typing import Optional
+from contextlib import AsyncExitStack
+from typing import Optional, Union
 from pydantic_ai.agent import AgentRunResult
 from pydantic_core import to_json, to_jsonable_python
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.exceptions import UserError
 from pydantic_ai.mcp import MCPServerStdio
 from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models import infer_model
+from pydantic_ai.tools import Tool
 from datetime import datetime
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
 from ..config.database import db_connection
-from ..services.message_service import MessageService
+from ..services.message_service import MessageService, SessionPrefetch
 from .instructions import INSTRUCTIONS
-from . import MCPServerClickup, AgentTools, AppDependencies
+from . import MCPServerClickup, AgentTools, AppDependencies, CLICKUP_NATIVE_TOOLS
 from .mcp_connection import wait_for_mcp_server
+from .mcp_lease import MCPLease, mcp_lease
+from .hedging import HedgedModel, HedgingPolicy
+from .tool_selection import ToolSelectionPolicy, ToolSelector, expand_tools, track_tool_selection
+from .intents import IntentMatcher, IntentRunResult
+from .run_phases import track_run_phases
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -25,7 +34,7 @@ logger = logging.getLogger(__name__)
 DEBUG_MESSAGES = os.environ.get('DEBUG_MESSAGES', 'true').lower() == 'true'
 
 class AxleAgent(Agent):
-    def __init__(self, agent_id: str, model: str = 'openai:gpt-4.1', deps_type= AppDependencies, system_prompt: str = "You are an helpfull AI agent working for AXLE AI.", instructions: str = None, tools: list = None, mcp_servers: list = None, message_history_limit: Optional[int] = None):
+    def __init__(self, agent_id: str, model: str = 'openai:gpt-4.1', deps_type= AppDependencies, system_prompt: str = "You are an helpfull AI agent working for AXLE AI.", instructions: str = None, tools: list = None, mcp_servers: list = None, message_history_limit: Optional[int] = None, hedging: Optional[HedgingPolicy] = None, tool_selection: Optional[ToolSelectionPolicy] = None, intents: Optional[IntentMatcher] = None):
         
         default_tools = [
             AgentTools.get_current_datetime,
@@ -39,6 +48,15 @@ class AxleAgent(Agent):
                 if tool not in final_tools:
                     final_tools.append(tool)
 
+        if hedging is not None:
+            # Hedge slow model requests and retry transient failures
+            model = HedgedModel(model, hedging)
+        
+        # Only the tools relevant to each turn are sent to the model, which can ask for more
+        self.tool_selector = ToolSelector(tool_selection) if tool_selection is not None else None
+        if self.tool_selector is not None:
+            final_tools.append(expand_tools)
+        
         super().__init__(
             model=model,
             deps_type=deps_type,
@@ -46,39 +64,79 @@ class AxleAgent(Agent):
             tools=final_tools,
             instructions = instructions,
             mcp_servers=mcp_servers or [],
+            prepare_tools=self.tool_selector,
         )
         
         self.agent_id = agent_id
         self._message_service = None
         self.message_history_limit = message_history_limit
+        # Kept here rather than read back from the Agent's private attributes
+        self.tool_names = [tool.name if isinstance(tool, Tool) else tool.__name__ for tool in final_tools]
+        self.system_prompts = [system_prompt] if system_prompt else []
+        self.mcp_servers = list(mcp_servers or [])
+        # Simple commands answered by calling the agent's own tools, without the model
+        self.intents = intents.for_tools(self.tool_names) if intents is not None else None
     
     @property
     def message_service(self):
         if self._message_service is None:
             self._message_service = MessageService()
         return self._message_service
+    
+    def mcp_lease(self) -> MCPLease:
+        """Lease of this agent's MCP servers, shared by concurrent runs; hold it to keep them up between runs."""
+        try:
+            sampling_model = infer_model(self.model) if self.model is not None else None
+        except UserError:
+            sampling_model = None
+        if sampling_model is not None:
+            for server in self.mcp_servers:
+                server.sampling_model = sampling_model
+        return mcp_lease(self.mcp_servers)
         
 
-    async def run(self, user_input: str, user_id: str, deps: AppDependencies = None, message_history: list[dict] = None) -> AgentRunResult:
+    async def run(self, user_input: str, user_id: str, deps: AppDependencies = None, message_history: list[dict] = None) -> Union[AgentRunResult, IntentRunResult]:
         """
-        Run the agent with proper MCP server lifecycle management.
-        Based on PydanticAI best practices.
+        Run the agent on the session's history and save the turn.
+        
+        Independent phases overlap: the history load and the session lookup run while
+        the MCP servers start, and the servers are released while the turn is persisted.
+        Recognized commands are answered without the model or the MCP servers.
         """
-        result = None
-        try:
-            print("  🔌 Starting MCP servers...")
-            logger.debug("DEBUG: About to start MCP servers context manager")
-            
-            # Proper usage of run_mcp_servers context manager
-            async with super().run_mcp_servers():
-                print("  ✅ MCP servers ready")
-                logger.debug("DEBUG: MCP servers started successfully")
+        deps = deps or AppDependencies(user_id=user_id, session_id=user_id)
+        with track_run_phases() as phases:
+            # Started first: both are needed whatever path the run takes
+            history_task = asyncio.create_task(phases.timed("history", self.message_service.get_raw_messages(
+                session_id=user_id,
+                limit=self.message_history_limit
+            )))
+            session_task = asyncio.create_task(phases.timed("session", self.message_service.prefetch_session(user_id)))
+            resources = AsyncExitStack()
+            try:
+                match = self.intents.match(user_input, deps) if self.intents is not None else None
+                if match is not None:
+                    message_history = await history_task
+                    result = await phases.timed("intent", self.intents.answer(
+                        match,
+                        user_input,
+                        message_history.to_list() if message_history else [],
+                        deps=deps,
+                        model=self.model,
+                        system_prompts=self.system_prompts
+                    ))
+                    if result is not None:
+                        phases.fast_path = True
+                        await phases.timed("persist", self._save_run(user_id, result, await session_task))
+                        return result
+                
+                print("  🔌 Starting MCP servers...")
+                logger.debug("DEBUG: Starting MCP servers while the history and the session load")
                 
-                logger.debug("DEBUG: About to get message history")
-                message_history = await self.message_service.get_raw_messages(
-                    session_id=user_id,
-                    limit=self.message_history_limit
-                )
+                # Shared with concurrent runs: only the first one starts the servers, the last one closes them
+                lease = phases.timed("mcp", resources.enter_async_context(self.mcp_lease().acquire()))
+                await phases.timed("startup", self._gather(lease, history_task, session_task))
+                message_history, prefetched = history_task.result(), session_task.result()
+                print("  ✅ MCP servers ready")
                 logger.debug(f"DEBUG: Retrieved {len(message_history) if message_history else 0} historical messages")
                 
                 # Debug logging for message history
@@ -101,8 +159,15 @@ class AxleAgent(Agent):
                 if DEBUG_MESSAGES:
                     logger.info(f"📝 User Input: {user_input[:200]}..." if len(user_input) > 200 else f"📝 User Input: {user_input}")
                 
-                result = await super().run(user_input, deps=deps, message_history=message_history)
+                with track_tool_selection() as selection:
+                    result = await phases.timed("model", super().run(
+                        user_input,
+                        deps=deps,
+                        message_history=message_history.to_list() if message_history else None
+                    ))
                 logger.debug("DEBUG: AI processing completed, result obtained")
+                if self.tool_selector is not None and selection.steps:
+                    logger.info(f"🧰 Tool selection: {selection.tools_sent}/{selection.tools_available} tools sent, ~{selection.tokens_saved} prompt tokens saved over {selection.steps} steps")
                 
                 # Log the AI response
                 if DEBUG_MESSAGES:
@@ -110,8 +175,7 @@ class AxleAgent(Agent):
                     if response_text:
                         logger.info(f"🤖 AI Response: {response_text[:200]}..." if len(response_text) > 200 else f"🤖 AI Response: {response_text}")
                 
-                print("  💾 Saving to database...")
-                logger.debug("DEBUG: About to save agent run to database")
+                print("  💾 Saving to database and releasing MCP servers...")
                 
                 # Log before saving
                 if DEBUG_MESSAGES:
@@ -121,33 +185,64 @@ class AxleAgent(Agent):
                     logger.info(f"   Total messages in result: {len(all_messages)}")
                     logger.info(f"   New messages to save: {len(all_messages) - (len(message_history) if message_history else 0)}")
                 
-                await self.message_service.save_agent_run(
-                    session_id=user_id,
-                    agent_run_result=result,
-                    agent_id=self.agent_id,
-                )
-                logger.debug("DEBUG: Agent run saved to database successfully")
-                
-                # Verify save
-                if DEBUG_MESSAGES:
-                    # Check if messages were saved
-                    saved_messages = await self.message_service.get_raw_messages(user_id)
-                    logger.info(f"✅ Verification - Total messages now in database: {len(saved_messages) if saved_messages else 0}")
-                
-                print("  🔌 Closing MCP servers...")
-                logger.debug("DEBUG: About to exit MCP servers context manager")
-                # Context manager will exit here automatically
+                # The servers are not needed to save the turn: release them meanwhile
+                await phases.timed("finish", self._gather(
+                    phases.timed("persist", self._save_run(user_id, result, prefetched)),
+                    phases.timed("release", resources.aclose())
+                ))
+                logger.debug("DEBUG: Agent run saved and MCP servers lease released")
+                return result
             
-            # This line executes after the context manager closes
-            logger.debug("DEBUG: MCP servers context manager exited successfully")
-            return result
-                
-        except Exception as e:
-            logger.error(f"❌ Agent run failed: {e}")
-            logger.debug("DEBUG: Exception caught in agent.run()")
-            raise
+            except Exception as e:
+                logger.error(f"❌ Agent run failed: {e}")
+                logger.debug("DEBUG: Exception caught in agent.run()")
+                raise
+            finally:
+                for task in (history_task, session_task):
+                    if not task.done():
+                        task.cancel()
+                    elif not task.cancelled():
+                        # Retrieved so a failure already raised elsewhere is not reported as lost
+                        task.exception()
+                await resources.aclose()
+                phases.finish()
+                logger.info(f"⏱️ Run phases: {phases.to_dict()}")
+
+    @staticmethod
+    async def _gather(*awaitables) -> None:
+        """Wait for all the awaitables, then raise the first failure (none is left running)."""
+        for outcome in await asyncio.gather(*awaitables, return_exceptions=True):
+            if isinstance(outcome, BaseException):
+                raise outcome
 
-    async def get_agent_response(self, agent_run_result: AgentRunResult):
+    async def _save_run(self, user_id: str, result: Union[AgentRunResult, IntentRunResult], prefetched: Optional[SessionPrefetch]) -> None:
+        logger.debug("DEBUG: About to save agent run to database")
+        await self.message_service.save_agent_run(
+            session_id=user_id,
+            agent_run_result=result,
+            agent_id=self.agent_id,
+            prefetched=prefetched
+        )
+        if DEBUG_MESSAGES:
+            # Check if messages were saved
+            saved_count = await self.message_service.count_raw_messages(user_id)
+            logger.info(f"✅ Verification - Total messages now in database: {saved_count}")
+
+    async def run_turn(self, user_input: str, message_history: Optional[list] = None, deps: AppDependencies = None) -> Union[AgentRunResult, IntentRunResult]:
+        """
+        Run the model on a history the caller holds, without loading or saving it.
+        Used by live conversations, which keep their history in memory and persist each turn.
+        """
+        match = self.intents.match(user_input, deps) if self.intents is not None else None
+        if match is not None:
+            result = await self.intents.answer(match, user_input, message_history or [], deps=deps, model=self.model, system_prompts=self.system_prompts)
+            if result is not None:
+                return result
+        async with self.mcp_lease().acquire():
+            with track_tool_selection():
+                return await super().run(user_input, deps=deps, message_history=message_history or None)
+
+    async def get_agent_response(self, agent_run_result: Union[AgentRunResult, IntentRunResult]):
         """
         Ignore tools responses and return the last agent response
         """
@@ -168,20 +263,37 @@ class AxleAgent(Agent):
 # ClickupAgent will be created after database connection
 ClickupAgent = None
 
-def create_clickup_agent():
+def create_clickup_agent(tool_backend: Optional[str] = None):
     global ClickupAgent
     try:
         # Get message history limit from database settings
         message_limit = db_connection.settings.message_history_limit
+        tool_backend = (tool_backend or db_connection.settings.clickup_tool_backend).lower()
+        if tool_backend not in ("mcp", "native"):
+            raise ValueError(f"❌ Unknown ClickUp tool backend '{tool_backend}' (expected 'mcp' or 'native')")
+        
+        tools = [AgentTools.resolve_clickup_ids, AgentTools.get_synced_hierarchy, AgentTools.search_clickup_tasks, AgentTools.get_due_tasks]
+        if tool_backend == "native":
+            # ClickUp API calls made in process instead of through the Node MCP server
+            tools.extend(CLICKUP_NATIVE_TOOLS)
         
         ClickupAgent = AxleAgent(
             agent_id="ClickupAgent",
             system_prompt=(INSTRUCTIONS),
-            mcp_servers=[MCPServerClickup],
-            message_history_limit=message_limit
+            tools=tools,
+            mcp_servers=[MCPServerClickup] if tool_backend == "mcp" else [],
+            message_history_limit=message_limit,
+            hedging=HedgingPolicy.from_settings(),
+            tool_selection=ToolSelectionPolicy.from_settings(),
+            intents=IntentMatcher.from_settings()
         )
-        print(f"  ✅ Agent created with message history limit: {message_limit}")
+        print(f"  ✅ Agent created with message history limit: {message_limit}, ClickUp tools: {tool_backend}")
         return ClickupAgent
     except Exception as e:
         logger.error(f"❌ Failed to create agent: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def get_clickup_agent():
+    """The shared ClickupAgent, created on first use (runs on it are independent)."""
+    return ClickupAgent if ClickupAgent is not None else create_clickup_agent()
\ No newline at end of file
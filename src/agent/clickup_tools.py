@@ -0,0 +1,336 @@
+"""
+Native ClickUp tools for Pydantic AI agents.
+
+The most used operations of the ClickUp MCP server, called directly through
+the pooled async API client instead of JSON-RPC over stdio to a Node process.
+They keep the MCP tool names so the agent instructions apply to both backends;
+an agent uses them instead of MCPServerClickup with CLICKUP_TOOL_BACKEND=native.
+Names of lists and members are resolved from the synced workspace snapshot.
+"""
+import functools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+from pydantic_ai import RunContext
+
+from .dependencies import AppDependencies
+from ..clickup.client import ClickUpError, get_clickup_client
+from ..clickup.snapshot import workspace_snapshot
+
+logger = logging.getLogger(__name__)
+
+DESCRIPTION_CHARS = 4000
+PRIORITIES = {"urgent": 1, "high": 2, "normal": 3, "low": 4}
+
+
+def _tool_errors(function):
+    """Return API, transport and input errors to the model as {"error": ...} so it can correct or retry the call."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await function(*args, **kwargs)
+        except (ClickUpError, ValueError) as e:
+            logger.warning(f"⚠️ ClickUp tool {function.__name__} failed: {e}")
+            return {"error": str(e)}
+        except httpx.HTTPError as e:
+            # Timeouts and connection failures carry no status code
+            logger.warning(f"⚠️ ClickUp tool {function.__name__} could not reach ClickUp: {e!r}")
+            return {"error": f"ClickUp request failed: {type(e).__name__}: {e}"}
+    return wrapper
+
+
+def _resolve(value: Union[str, int], kind: str) -> str:
+    value = str(value).strip()
+    if value.isdigit():
+        return value
+    if not workspace_snapshot.loaded:
+        raise ValueError(f"'{value}' is not a {kind} id and the workspace snapshot is not available to resolve names")
+    matches = workspace_snapshot.snapshot.resolve(value, kind, limit=2)
+    if not matches or matches[0]["score"] < 0.8:
+        raise ValueError(f"No {kind} named '{value}', call resolve_clickup_ids to find it")
+    if len(matches) > 1 and matches[1]["score"] == matches[0]["score"]:
+        raise ValueError(f"Several {kind}s are named '{value}': {', '.join(match['path'] if 'path' in match else match['id'] for match in matches)}; pass the id")
+    return matches[0]["id"]
+
+
+def _member_ids(values: Optional[List[Union[str, int]]]) -> List[int]:
+    return [int(_resolve(value, "member")) for value in values or ()]
+
+
+def _timestamp(value: Optional[str]) -> Optional[int]:
+    """Milliseconds since the epoch of a 'YYYY-MM-DD' date or an ISO datetime."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', use YYYY-MM-DD or an ISO datetime")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def _date(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc).isoformat()
+
+
+def _priority(value: Union[str, int, None]) -> Optional[int]:
+    if value is None:
+        return None
+    if str(value).isdigit() and 1 <= int(value) <= 4:
+        return int(value)
+    if str(value).lower() in PRIORITIES:
+        return PRIORITIES[str(value).lower()]
+    raise ValueError(f"Invalid priority '{value}', use urgent, high, normal or low")
+
+
+def _summary(task: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {
+        "id": task.get("id"),
+        "name": task.get("name"),
+        "status": (task.get("status") or {}).get("status"),
+        "list": (task.get("list") or {}).get("name"),
+        "assignees": [user.get("username") or user.get("email") for user in task.get("assignees") or []],
+        "due_date": _date(task.get("due_date")),
+        "priority": (task.get("priority") or {}).get("priority"),
+        "url": task.get("url"),
+    }
+    return {key: value for key, value in summary.items() if value not in (None, [])}
+
+
+def _details(task: Dict[str, Any]) -> Dict[str, Any]:
+    details = _summary(task)
+    description = task.get("text_content") or task.get("description") or ""
+    details.update({
+        "description": description[:DESCRIPTION_CHARS],
+        "tags": [tag.get("name") for tag in task.get("tags") or []],
+        "parent": task.get("parent"),
+        "date_created": _date(task.get("date_created")),
+        "date_updated": _date(task.get("date_updated")),
+        "custom_fields": {
+            field.get("name"): field.get("value") for field in task.get("custom_fields") or [] if field.get("value") is not None
+        },
+        "subtasks": [_summary(subtask) for subtask in task.get("subtasks") or []],
+    })
+    return {key: value for key, value in details.items() if value not in (None, [], {}, "")}
+
+
+class ClickUpTools:
+    """ClickUp operations run through the native API client."""
+
+    @staticmethod
+    @_tool_errors
+    async def get_task(ctx: RunContext[AppDependencies], task_id: str, include_subtasks: bool = False) -> dict:
+        """
+        Get the details of a ClickUp task: description, status, assignees, dates, tags, custom fields and subtasks.
+
+        Args:
+            task_id: Id of the task
+            include_subtasks: Include the subtasks of the task
+
+        Returns:
+            dict: The task details
+        """
+        return _details(await get_clickup_client().get_task(task_id, include_subtasks))
+
+    @staticmethod
+    @_tool_errors
+    async def get_tasks_by_id(ctx: RunContext[AppDependencies], task_ids: List[str]) -> dict:
+        """
+        Get several ClickUp tasks at once, fetched concurrently. Prefer this to repeated get_task calls.
+
+        Args:
+            task_ids: Ids of the tasks
+
+        Returns:
+            dict: The details of each task, by id (or the error for the ones that failed)
+        """
+        tasks = await get_clickup_client().get_tasks(task_ids)
+        return {
+            task_id: {"error": str(task)} if isinstance(task, ClickUpError) else _details(task)
+            for task_id, task in tasks.items()
+        }
+
+    @staticmethod
+    @_tool_errors
+    async def get_tasks(
+        ctx: RunContext[AppDependencies],
+        list: str,
+        statuses: Optional[List[str]] = None,
+        assignees: Optional[List[str]] = None,
+        due_before: Optional[str] = None,
+        due_after: Optional[str] = None,
+        include_closed: bool = False,
+        page: int = 0
+    ) -> dict:
+        """
+        List the tasks of a ClickUp list, 100 per page.
+
+        Args:
+            list: Name or id of the list
+            statuses: Only tasks with one of these statuses
+            assignees: Only tasks assigned to one of these members (names, emails or ids)
+            due_before: Only tasks due before this date (YYYY-MM-DD)
+            due_after: Only tasks due after this date (YYYY-MM-DD)
+            include_closed: Include closed tasks
+            page: Page to return, starting at 0
+
+        Returns:
+            dict: Summaries of the tasks (id, name, status, assignees, due date, priority, url) and whether this is the last page
+        """
+        result = await get_clickup_client().get_list_tasks(
+            _resolve(list, "list"),
+            page=page,
+            **{
+                "statuses[]": statuses or None,
+                "assignees[]": _member_ids(assignees) or None,
+                "due_date_lt": _timestamp(due_before),
+                "due_date_gt": _timestamp(due_after),
+                "include_closed": str(include_closed).lower(),
+                "subtasks": "true",
+            }
+        )
+        tasks = result.get("tasks", [])
+        return {"tasks": [_summary(task) for task in tasks], "page": page, "last_page": result.get("last_page", len(tasks) < 100)}
+
+    @staticmethod
+    @_tool_errors
+    async def create_task(
+        ctx: RunContext[AppDependencies],
+        list: str,
+        name: str,
+        description: Optional[str] = None,
+        status: Optional[str] = None,
+        assignees: Optional[List[str]] = None,
+        due_date: Optional[str] = None,
+        priority: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        parent: Optional[str] = None
+    ) -> dict:
+        """
+        Create a task in a ClickUp list.
+
+        Args:
+            list: Name or id of the list
+            name: Name of the task
+            description: Markdown description
+            status: Status of the task (one of the list's statuses)
+            assignees: Members to assign (names, emails or ids)
+            due_date: Due date (YYYY-MM-DD or ISO datetime)
+            priority: urgent, high, normal or low
+            tags: Tags to add
+            parent: Id of the parent task, to create a subtask
+
+        Returns:
+            dict: Summary of the created task
+        """
+        task = {
+            "name": name,
+            "markdown_description": description,
+            "status": status,
+            "assignees": _member_ids(assignees) or None,
+            "due_date": _timestamp(due_date),
+            "priority": _priority(priority),
+            "tags": tags or None,
+            "parent": parent,
+        }
+        created = await get_clickup_client().create_task(_resolve(list, "list"), {k: v for k, v in task.items() if v is not None})
+        return _summary(created)
+
+    @staticmethod
+    @_tool_errors
+    async def update_task(
+        ctx: RunContext[AppDependencies],
+        task_id: str,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        status: Optional[str] = None,
+        due_date: Optional[str] = None,
+        priority: Optional[str] = None,
+        add_assignees: Optional[List[str]] = None,
+        remove_assignees: Optional[List[str]] = None
+    ) -> dict:
+        """
+        Update a ClickUp task. Only the given fields change.
+
+        Args:
+            task_id: Id of the task
+            name: New name
+            description: New markdown description
+            status: New status
+            due_date: New due date (YYYY-MM-DD or ISO datetime)
+            priority: urgent, high, normal or low
+            add_assignees: Members to assign (names, emails or ids)
+            remove_assignees: Members to unassign (names, emails or ids)
+
+        Returns:
+            dict: Summary of the updated task
+        """
+        changes: Dict[str, Any] = {
+            "name": name,
+            "markdown_description": description,
+            "status": status,
+            "due_date": _timestamp(due_date),
+            "priority": _priority(priority),
+        }
+        if add_assignees or remove_assignees:
+            changes["assignees"] = {"add": _member_ids(add_assignees), "rem": _member_ids(remove_assignees)}
+        changes = {k: v for k, v in changes.items() if v is not None}
+        if not changes:
+            raise ValueError("Nothing to update")
+        return _summary(await get_clickup_client().update_task(task_id, changes))
+
+    @staticmethod
+    @_tool_errors
+    async def get_task_comments(ctx: RunContext[AppDependencies], task_id: str) -> dict:
+        """
+        Get the comments of a ClickUp task, newest first.
+
+        Args:
+            task_id: Id of the task
+
+        Returns:
+            dict: The comments with their author, date and text
+        """
+        comments = await get_clickup_client().get_task_comments(task_id)
+        return {"comments": [
+            {
+                "id": comment.get("id"),
+                "author": (comment.get("user") or {}).get("username"),
+                "date": _date(comment.get("date")),
+                "text": comment.get("comment_text"),
+            }
+            for comment in comments
+        ]}
+
+    @staticmethod
+    @_tool_errors
+    async def create_task_comment(ctx: RunContext[AppDependencies], task_id: str, comment_text: str, notify_all: bool = False) -> dict:
+        """
+        Add a comment to a ClickUp task.
+
+        Args:
+            task_id: Id of the task
+            comment_text: Text of the comment
+            notify_all: Notify every watcher of the task, not only the assignees
+
+        Returns:
+            dict: Id and date of the comment
+        """
+        comment = await get_clickup_client().create_task_comment(task_id, comment_text, notify_all)
+        return {"id": comment.get("id"), "date": _date(comment.get("date"))}
+
+
+CLICKUP_NATIVE_TOOLS = [
+    ClickUpTools.get_task,
+    ClickUpTools.get_tasks_by_id,
+    ClickUpTools.get_tasks,
+    ClickUpTools.create_task,
+    ClickUpTools.update_task,
+    ClickUpTools.get_task_comments,
+    ClickUpTools.create_task_comment,
+]
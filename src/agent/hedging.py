@@ -0,0 +1,226 @@
+"""
+Hedged and retried model requests.
+
+`HedgedModel` wraps the agent's model. When a request has not completed
+after the hedge delay, a second identical request is sent (to the fallback
+model if one is configured) and the first response wins; the other request
+is cancelled. The delay is a percentile of the recent latencies of the model,
+so only the slowest requests get a hedge. Requests failing with a transient
+error (429, 5xx, timeouts, connection errors) are retried with jittered
+exponential backoff.
+
+Cancelled hedges were still billed for their prompt: the wasted tokens are
+estimated from the winner's request tokens, and counted exactly when both
+requests completed. Streamed requests are passed through unchanged.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import httpx
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, infer_model
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from ..config.database import db_connection
+
+try:
+    import openai
+except ImportError:  # pragma: no cover - optional dependency
+    openai = None
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, ModelHTTPError):
+        return error.status_code in TRANSIENT_STATUS_CODES
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        # Also covers APITimeoutError
+        return True
+    return False
+
+
+@dataclass
+class HedgingPolicy:
+    hedge: bool = True
+    percentile: float = 95.0
+    min_delay_s: float = 0.5
+    initial_delay_s: float = 5.0
+    min_samples: int = 20
+    window: int = 500
+    fallback_model: Optional[str] = None
+    max_retries: int = 2
+    retry_base_delay_s: float = 0.5
+    retry_max_delay_s: float = 8.0
+
+    @classmethod
+    def from_settings(cls) -> Optional["HedgingPolicy"]:
+        settings = db_connection.settings
+        if not settings.model_hedging and not settings.model_max_retries:
+            return None
+        return cls(
+            hedge=settings.model_hedging,
+            percentile=settings.model_hedge_percentile,
+            min_delay_s=settings.model_hedge_min_delay_ms / 1000,
+            initial_delay_s=settings.model_hedge_initial_delay_ms / 1000,
+            fallback_model=settings.model_fallback,
+            max_retries=settings.model_max_retries,
+            retry_base_delay_s=settings.model_retry_base_delay_ms / 1000,
+        )
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the `attempt`-th retry (1-based)."""
+        return random.uniform(0, min(self.retry_max_delay_s, self.retry_base_delay_s * 2 ** (attempt - 1)))
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class ModelCallStats:
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    retries: int = 0
+    failures: int = 0
+    wasted_request_tokens: int = 0
+    wasted_response_tokens: int = 0
+    latencies: Dict[str, Deque[float]] = field(default_factory=dict)
+
+    def observe(self, model_name: str, latency: float, window: int) -> None:
+        samples = self.latencies.get(model_name)
+        if samples is None or samples.maxlen != window:
+            samples = self.latencies[model_name] = deque(samples or (), maxlen=window)
+        samples.append(latency)
+
+    def hedge_delay(self, model_name: str, policy: HedgingPolicy) -> float:
+        samples = self.latencies.get(model_name)
+        if not samples or len(samples) < policy.min_samples:
+            return policy.initial_delay_s
+        return max(policy.min_delay_s, percentile(list(samples), policy.percentile))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "failures": self.failures,
+            "wasted_request_tokens": self.wasted_request_tokens,
+            "wasted_response_tokens": self.wasted_response_tokens,
+            "latency_ms": {
+                model_name: {
+                    "samples": len(samples),
+                    "p50": round(percentile(list(samples), 50) * 1000, 1),
+                    "p95": round(percentile(list(samples), 95) * 1000, 1),
+                    "p99": round(percentile(list(samples), 99) * 1000, 1),
+                }
+                for model_name, samples in self.latencies.items() if samples
+            },
+        }
+
+
+model_call_stats = ModelCallStats()
+
+
+class HedgedModel(WrapperModel):
+    def __init__(self, wrapped: Model | str, policy: HedgingPolicy, stats: Optional[ModelCallStats] = None):
+        super().__init__(wrapped)
+        self.policy = policy
+        self.fallback = infer_model(policy.fallback_model) if policy.fallback_model else None
+        self.stats = stats if stats is not None else model_call_stats
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        attempt = 0
+        while True:
+            try:
+                return await self._request_once(messages, model_settings, model_request_parameters)
+            except Exception as e:
+                if attempt >= self.policy.max_retries or not is_transient(e):
+                    self.stats.failures += 1
+                    raise
+                attempt += 1
+                self.stats.retries += 1
+                delay = self.policy.retry_delay(attempt)
+                logger.warning(f"🔁 Model request failed ({e}), retry {attempt}/{self.policy.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _timed(self, model: Model, *args: Any) -> ModelResponse:
+        started = time.perf_counter()
+        try:
+            response = await model.request(*args)
+        except asyncio.CancelledError:
+            # A request cancelled after losing to a hedge was slow: its elapsed time is a lower
+            # bound of its latency, and leaving it out would drag the hedge delay down
+            self.stats.observe(model.model_name, time.perf_counter() - started, self.policy.window)
+            raise
+        self.stats.observe(model.model_name, time.perf_counter() - started, self.policy.window)
+        return response
+
+    async def _request_once(self, *args: Any) -> ModelResponse:
+        self.stats.requests += 1
+        primary = asyncio.create_task(self._timed(self.wrapped, *args))
+        tasks: Set[asyncio.Task] = {primary}
+        try:
+            if not self.policy.hedge:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=self.stats.hedge_delay(self.wrapped.model_name, self.policy))
+            if done:
+                return primary.result()
+
+            hedge_model = self.fallback or self.wrapped
+            hedge = asyncio.create_task(self._timed(hedge_model, *args))
+            tasks.add(hedge)
+            self.stats.hedged += 1
+            logger.info(f"🪃 Hedging slow {self.wrapped.model_name} request with {hedge_model.model_name}")
+
+            winner: Optional[asyncio.Task] = None
+            errors: List[BaseException] = []
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task
+            if winner is None:
+                raise errors[0]
+
+            response = winner.result()
+            if winner is hedge:
+                self.stats.hedge_wins += 1
+            for task in tasks - {winner}:
+                if task.done() and task.exception() is None:
+                    # Both completed: the loser's usage is known
+                    self.stats.wasted_request_tokens += task.result().usage.request_tokens or 0
+                    self.stats.wasted_response_tokens += task.result().usage.response_tokens or 0
+                elif not task.done():
+                    # Cancelled: its prompt was sent and billed all the same
+                    self.stats.wasted_request_tokens += response.usage.request_tokens or 0
+            return response
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # Retrieve exceptions so cancelled or failed losers are not reported as unhandled
+            await asyncio.gather(*tasks, return_exceptions=True)
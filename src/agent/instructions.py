@@ -71,6 +71,10 @@ INSTRUCTIONS = """
 - Evolve the workspace architecture as needed, creating new Sprints, Lists, or Folders if it improves efficiency.
 
 ## OTHER INSTRUCTIONS
+- To find the id of a space, folder, list or member, or the statuses of a list, call `resolve_clickup_ids` (or `get_synced_hierarchy` for the structure) first: they answer instantly from a synced copy of the workspace. Fall back to the ClickUp tools only when nothing matches or the snapshot is unavailable.
+- To find tasks from a description ("the onboarding bug", "tasks about invoices"), call `search_clickup_tasks` before listing or filtering tasks through the ClickUp tools; it searches a synced copy of every task and returns their ids. Fetch a task through the ClickUp tools when you need its latest details.
+- For tasks due on given days ("my tasks due today", "overdue tasks of the Sales list"), call `get_due_tasks`; `assignee='me'` is the current ClickUp user.
+- Only the tools that look relevant to the request are available on each turn. If none of them can do what the user asks, call `expand_tools` (with keywords describing the missing operation) instead of telling the user it is impossible.
 - When working with custom fields that require relationship values or assignees, use this JSON structure: {
   "value": {
     "rem": [
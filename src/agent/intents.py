@@ -0,0 +1,297 @@
+"""
+Deterministic fast path for simple commands.
+
+Some requests always translate to the same tool call ("get workspace
+hierarchy", "list my tasks due today"). An IntentMatcher recognizes them from
+configured patterns before AxleAgent runs the model: the tool is called
+directly and its result formatted with a template. The turn is recorded like
+a model run (user prompt, tool call, tool return and response text, with the
+intent as the model name), so the history stays consistent and later turns
+can build on it. The turn is returned as an IntentRunResult, which offers the
+part of AgentRunResult's interface the agent and the message service use.
+When the tool reports an error, or the intent does not apply to the run's
+dependencies (no workspace member for "my tasks"), the request goes to the
+model as usual.
+"""
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelRequest, ModelResponse, SystemPromptPart, TextPart, ToolCallPart, ToolReturnPart, UserPromptPart
+from pydantic_ai.usage import Usage
+
+from .tools import AgentTools, current_member, user_today
+from ..clickup.snapshot import name_key
+from ..config.database import db_connection
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME_PREFIX = "intent:"
+TEMPLATES = {
+    "en": {
+        "hierarchy": "Here is the workspace hierarchy:",
+        "no_spaces": "The workspace has no spaces.",
+        "synced_at": "_Synced at {synced_at}_",
+        "due_today": "Your tasks due today:",
+        "none_due_today": "You have no tasks due today.",
+        "datetime": "Current date and time: {datetime}",
+    },
+    "fr": {
+        "hierarchy": "Voici la hiérarchie de l'espace de travail :",
+        "no_spaces": "L'espace de travail n'a aucun espace.",
+        "synced_at": "_Synchronisé le {synced_at}_",
+        "due_today": "Vos tâches à rendre aujourd'hui :",
+        "none_due_today": "Vous n'avez aucune tâche à rendre aujourd'hui.",
+        "datetime": "Date et heure actuelles : {datetime}",
+    },
+}
+
+
+def normalize(text: str) -> str:
+    """Lower case, without accents, repeated spaces or trailing punctuation."""
+    return name_key(text.replace("’", "'")).strip(" ?!.")
+
+
+@dataclass
+class Intent:
+    name: str
+    tool: Callable[..., Awaitable[Any]]
+    # Regular expressions matching the whole normalized input, by language of the response
+    patterns: Dict[str, Sequence[str]]
+    render: Callable[[Any, str], str]
+    # Tool arguments for a match (default: the named groups of the pattern)
+    arguments: Callable[[re.Match], Dict[str, Any]] = lambda match: match.groupdict()
+    # Whether the intent can answer for the run's dependencies (default: always)
+    applies: Callable[[Any], bool] = lambda deps: True
+    _compiled: List[Tuple[str, re.Pattern]] = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        self._compiled = [(language, re.compile(pattern)) for language, patterns in self.patterns.items() for pattern in patterns]
+
+    @property
+    def tool_name(self) -> str:
+        return self.tool.__name__
+
+    def match(self, text: str) -> Optional[Tuple[str, re.Match]]:
+        for language, pattern in self._compiled:
+            found = pattern.fullmatch(text)
+            if found:
+                return language, found
+        return None
+
+
+@dataclass
+class IntentMatch:
+    intent: Intent
+    language: str
+    arguments: Dict[str, Any]
+
+
+@dataclass
+class IntentRunResult:
+    """A turn answered without the model, with the accessors of AgentRunResult."""
+    output: str
+    messages: List[ModelMessage]
+    # Messages before this index are the history the turn was run on
+    new_message_index: int
+
+    def all_messages(self) -> List[ModelMessage]:
+        return list(self.messages)
+
+    def new_messages(self) -> List[ModelMessage]:
+        return self.messages[self.new_message_index:]
+
+    def all_messages_json(self) -> bytes:
+        return ModelMessagesTypeAdapter.dump_json(self.messages)
+
+    def new_messages_json(self) -> bytes:
+        return ModelMessagesTypeAdapter.dump_json(self.new_messages())
+
+    def usage(self) -> Usage:
+        return Usage()
+
+
+@dataclass
+class IntentStats:
+    answered: Dict[str, int] = field(default_factory=dict)
+    # Recognized commands sent to the model because their tool failed
+    fallbacks: int = 0
+    total_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        answered = sum(self.answered.values())
+        return {
+            "answered": answered,
+            "by_intent": dict(self.answered),
+            "fallbacks": self.fallbacks,
+            "avg_ms": round(self.total_ms / answered, 2) if answered else None,
+        }
+
+
+intent_stats = IntentStats()
+
+
+class IntentMatcher:
+    """Answers the commands of its intents without the model; `register` adds intents."""
+
+    def __init__(self, intents: Iterable[Intent] = ()):
+        self.intents: List[Intent] = list(intents)
+
+    def register(self, intent: Intent) -> None:
+        self.intents.append(intent)
+
+    def for_tools(self, tool_names: Iterable[str]) -> "IntentMatcher":
+        """The intents whose tool is one of `tool_names`, the tools of the agent."""
+        names = set(tool_names)
+        return IntentMatcher(intent for intent in self.intents if intent.tool_name in names)
+
+    @classmethod
+    def from_settings(cls) -> Optional["IntentMatcher"]:
+        settings = db_connection.settings
+        if not settings.intent_fast_path:
+            return None
+        names = {name.strip() for name in settings.intent_fast_path_intents.split(",") if name.strip()}
+        return cls(intent for intent in DEFAULT_INTENTS if intent.name in names)
+
+    def match(self, user_input: str, deps: Any = None) -> Optional[IntentMatch]:
+        text = normalize(user_input)
+        # Commands are short: skip the patterns for anything longer
+        if not text or len(text) > 80:
+            return None
+        for intent in self.intents:
+            found = intent.match(text)
+            if found is not None:
+                if not intent.applies(deps):
+                    return None
+                language, match = found
+                return IntentMatch(intent, language, intent.arguments(match))
+        return None
+
+    async def answer(
+        self,
+        match: IntentMatch,
+        user_input: str,
+        message_history: Sequence[ModelMessage],
+        deps: Any = None,
+        model: Any = None,
+        system_prompts: Sequence[str] = ()
+    ) -> Optional[IntentRunResult]:
+        """
+        Run the intent's tool and build the result of the turn, as a model run would have.
+        Returns None when the tool fails, for the model to handle the request.
+        """
+        started = time.perf_counter()
+        intent = match.intent
+        history = list(message_history)
+        # A first turn carries the system prompt, like the model's first request
+        request_parts: List[Any] = [] if history else [SystemPromptPart(prompt) for prompt in system_prompts]
+        request_parts.append(UserPromptPart(user_input))
+        call = ToolCallPart(intent.tool_name, match.arguments)
+        model_name = f"{MODEL_NAME_PREFIX}{intent.name}"
+        messages: List[ModelMessage] = [ModelRequest(parts=request_parts), ModelResponse(parts=[call], model_name=model_name)]
+
+        ctx = RunContext(
+            deps=deps,
+            model=model,
+            usage=Usage(),
+            prompt=user_input,
+            messages=history + messages,
+            tool_call_id=call.tool_call_id,
+            tool_name=call.tool_name,
+            run_step=1,
+        )
+        try:
+            result = await intent.tool(ctx, **match.arguments)
+        except Exception as e:
+            logger.warning(f"⚠️ Intent {intent.name} failed, falling back to the model: {e}")
+            intent_stats.fallbacks += 1
+            return None
+        if isinstance(result, dict) and "error" in result:
+            logger.info(f"↩️ Intent {intent.name} unavailable, falling back to the model: {result['error']}")
+            intent_stats.fallbacks += 1
+            return None
+
+        text = intent.render(result, match.language)
+        messages.append(ModelRequest(parts=[ToolReturnPart(call.tool_name, result, call.tool_call_id)]))
+        messages.append(ModelResponse(parts=[TextPart(text)], model_name=model_name))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        intent_stats.answered[intent.name] = intent_stats.answered.get(intent.name, 0) + 1
+        intent_stats.total_ms += elapsed_ms
+        logger.info(f"⚡ Intent {intent.name} answered without the model in {elapsed_ms:.1f} ms")
+        return IntentRunResult(output=text, messages=history + messages, new_message_index=len(history))
+
+
+def render_hierarchy(result: Dict[str, Any], language: str) -> str:
+    templates = TEMPLATES[language]
+    lines = [templates["hierarchy"] if result.get("spaces") else templates["no_spaces"]]
+    for space in result.get("spaces", []):
+        lines.append(f"- **{space['name']}** ({space['id']})")
+        for folder in space.get("folders", []):
+            lines.append(f"  - 📁 {folder['name']} ({folder['id']})")
+            lines.extend(f"    - {item['name']} ({item['id']})" for item in folder.get("lists", []))
+        lines.extend(f"  - {item['name']} ({item['id']})" for item in space.get("lists", []))
+    if result.get("synced_at"):
+        lines.append("")
+        lines.append(templates["synced_at"].format(synced_at=result["synced_at"]))
+    return "\n".join(lines)
+
+
+def render_due_tasks(result: Dict[str, Any], language: str) -> str:
+    templates = TEMPLATES[language]
+    tasks = result.get("results", [])
+    if not tasks:
+        return templates["none_due_today"]
+    lines = [templates["due_today"]]
+    for task in tasks:
+        name = f"[{task['name']}]({task['url']})" if task.get("url") else task["name"]
+        details = " · ".join(value for value in (task.get("status"), task.get("list")) if value)
+        lines.append(f"- {name}" + (f" — {details}" if details else ""))
+    return "\n".join(lines)
+
+
+def render_datetime(result: str, language: str) -> str:
+    return TEMPLATES[language]["datetime"].format(datetime=result)
+
+
+def due_today(match: re.Match) -> Dict[str, Any]:
+    today = user_today().isoformat()
+    return {"due_from": today, "due_to": today, "assignee": "me"}
+
+
+DEFAULT_INTENTS = [
+    Intent(
+        name="workspace_hierarchy",
+        tool=AgentTools.get_synced_hierarchy,
+        patterns={
+            "en": [r"(?:get|show|display|list)(?: me)?(?: the| my)?(?: clickup)? (?:workspace )?(?:hierarchy|structure)"],
+            "fr": [r"(?:affiche|montre|donne)(?:[- ]moi)? (?:la )?(?:hierarchie|structure)(?: (?:du|de mon|de l')(?: ?workspace|espace de travail| ?clickup))?"],
+        },
+        render=render_hierarchy,
+        arguments=lambda match: {},
+    ),
+    Intent(
+        name="tasks_due_today",
+        tool=AgentTools.get_due_tasks,
+        patterns={
+            "en": [r"(?:(?:get|show|list|give)(?: me)? |what are )?my tasks (?:due |for )?today"],
+            "fr": [r"(?:(?:affiche|montre|liste|donne)(?:[- ]moi)? |quelles sont )?mes taches (?:du jour|d'aujourd'hui|pour aujourd'hui|a rendre aujourd'hui)"],
+        },
+        render=render_due_tasks,
+        arguments=due_today,
+        # "my tasks" needs the chat user's workspace member, the model asks otherwise
+        applies=lambda deps: current_member(deps) is not None,
+    ),
+    Intent(
+        name="current_datetime",
+        tool=AgentTools.get_current_datetime,
+        patterns={
+            "en": [r"what time is it|what's the time|what is the (?:date|time)(?: today)?"],
+            "fr": [r"quelle heure est-il|quelle heure il est|quelle est la date(?: d'aujourd'hui)?|on est quel jour"],
+        },
+        render=render_datetime,
+        arguments=lambda match: {},
+    ),
+]
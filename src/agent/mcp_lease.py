@@ -0,0 +1,96 @@
+"""
+Shared MCP server sessions.
+
+Entering an MCP server starts its process; `MCPServer` counts nested enters,
+but two concurrent first enters both start a process, and the anyio context
+must be exited by the task that entered it. A lease keeps the servers open
+from a dedicated holder task for as long as at least one run uses them, so
+concurrent runs share one process per server and the last one to finish
+closes it, whatever task it runs in.
+"""
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from pydantic_ai.mcp import MCPServer
+
+logger = logging.getLogger(__name__)
+
+
+class MCPLease:
+    def __init__(self, servers: Sequence[MCPServer]):
+        self.servers = list(servers)
+        self._lock = asyncio.Lock()
+        self._users = 0
+        self._holder: Optional[asyncio.Task] = None
+        self._release: Optional[asyncio.Event] = None
+        self.starts = 0
+
+    @property
+    def active(self) -> bool:
+        return self._holder is not None and not self._holder.done()
+
+    @property
+    def users(self) -> int:
+        return self._users
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["MCPLease"]:
+        """Use the servers for the duration of the block, starting them if nobody else is."""
+        if not self.servers:
+            yield self
+            return
+        async with self._lock:
+            if not self.active:
+                await self._start()
+            self._users += 1
+        try:
+            yield self
+        finally:
+            async with self._lock:
+                self._users -= 1
+                if self._users == 0:
+                    await self._stop()
+
+    async def _start(self) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._release = asyncio.Event()
+        self._holder = asyncio.create_task(self._hold(ready, self._release))
+        await ready
+        self.starts += 1
+        logger.info(f"🔌 MCP servers started ({len(self.servers)})")
+
+    async def _stop(self) -> None:
+        holder, self._holder = self._holder, None
+        if holder is None:
+            return
+        self._release.set()
+        # The holder closes the servers even if the releasing run is cancelled meanwhile
+        await asyncio.shield(holder)
+        logger.info("🔌 MCP servers closed")
+
+    async def _hold(self, ready: asyncio.Future, release: asyncio.Event) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                for server in self.servers:
+                    await stack.enter_async_context(server)
+                ready.set_result(None)
+                await release.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"Error while closing MCP servers: {e}")
+
+
+_leases: Dict[Tuple[int, ...], MCPLease] = {}
+
+
+def mcp_lease(servers: Sequence[MCPServer]) -> MCPLease:
+    """The process-wide lease of a set of MCP servers (agents sharing servers share the lease)."""
+    key = tuple(id(server) for server in servers)
+    lease = _leases.get(key)
+    if lease is None:
+        lease = _leases[key] = MCPLease(servers)
+    return lease
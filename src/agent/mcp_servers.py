@@ -8,25 +8,42 @@ import signal
 import asyncio
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any, Optional
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.shared.message import SessionMessage
-from pydantic_ai.mcp import MCPServerStdio
+from pydantic_ai.mcp import MCPServerStdio, ToolResult
 from dotenv import load_dotenv
 
+from .rate_limit import RateLimiter, clickup_rate_limiter
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
 class FixedMCPServerStdio(MCPServerStdio):
     """
     Custom MCP Server with proper Linux process termination.
     
     Fixes the issue where Linux processes don't properly terminate,
     causing the main process to hang on exit.
+    
+    Tool calls wait for `rate_limiter` when one is set, so the server's own
+    API calls stay under the upstream limits instead of running into 429s.
     """
     
+    rate_limiter: Optional[RateLimiter] = None
+    
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], metadata: Optional[dict[str, Any]] = None) -> ToolResult:
+        if self.rate_limiter is not None:
+            waited = await self.rate_limiter.acquire()
+            if waited > 1:
+                logger.info(f"⏳ Tool call {tool_name} throttled for {waited:.1f}s")
+        return await super().call_tool(tool_name, arguments, metadata)
+    
     @asynccontextmanager
     async def client_streams(
         self,
@@ -201,7 +218,8 @@ def create_clickup_mcp_server():
                 'CLICKUP_API_KEY': api_key,
                 'CLICKUP_TEAM_ID': team_id,
             },
-            timeout=60.0  # Increase timeout for npx download and server startup
+            timeout=60.0,  # Increase timeout for npx download and server startup
+            rate_limiter=clickup_rate_limiter
         )
         return server
     except Exception as e:
@@ -0,0 +1,187 @@
+"""
+Token-bucket rate limiting of outbound ClickUp calls.
+
+ClickUp limits requests per API token, and every worker and concurrent run
+shares the token. The bucket is therefore kept in MongoDB by default: taking
+a token is a single atomic pipeline update that refills the bucket from the
+server clock (`$$NOW`) and takes one token if enough are left. A per-process
+bucket is used when MongoDB is not configured or not reachable.
+
+Calls have a priority, taken from a context variable: interactive calls (the
+default) may use every token, while batch and background calls wait as long
+as the bucket holds fewer than `reserve` spare tokens. Under load, the last
+tokens therefore go to interactive requests. Waits are measured per priority.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+from pymongo import ReturnDocument
+
+from ..config.database import db_connection
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Time spent on the local bucket after the shared one failed
+BACKEND_RETRY_S = 30.0
+
+call_priority: ContextVar[str] = ContextVar("call_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Run the block's rate-limited calls (and those of tasks it creates) at `level`."""
+    token = call_priority.set(level)
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+
+class LocalTokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+
+    async def take(self, need: float) -> float:
+        """Take one token if `need` are available; otherwise return the seconds to wait before retrying."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if self.tokens >= need:
+            self.tokens -= 1
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+
+class MongoTokenBucket:
+    def __init__(self, key: str, rate: float, burst: int):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+
+    async def take(self, need: float) -> float:
+        """Same as LocalTokenBucket.take, against the bucket document shared by all workers."""
+        elapsed_s = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$refilled_at", "$$NOW"]}]}, 1000]}
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [
+                    self.burst,
+                    {"$add": [{"$ifNull": ["$tokens", self.burst]}, {"$multiply": [elapsed_s, self.rate]}]}
+                ]},
+                "refilled_at": "$$NOW",
+            }},
+            {"$set": {"granted": {"$gte": ["$tokens", need]}}},
+            {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+        ]
+        collection = db_connection.telemetry_collection(db_connection.settings.rate_limits_collection)
+        document = await collection.find_one_and_update(
+            {"_id": self.key},
+            pipeline,
+            projection={"tokens": 1, "granted": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if document["granted"]:
+            return 0.0
+        return (need - document["tokens"]) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, key: str, per_minute: float, burst: int, reserve: int = 0, backend: str = "mongo"):
+        self.key = key
+        self.enabled = per_minute > 0
+        rate = per_minute / 60
+        burst = max(burst, 1)
+        self.reserve = min(reserve, max(burst - 1, 0))
+        self.local = LocalTokenBucket(rate, burst)
+        self.bucket = MongoTokenBucket(key, rate, burst) if backend == "mongo" else self.local
+        self._interactive_waiting = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.backend_errors = 0
+        self._backend_retry_at = 0.0
+
+    async def _take(self, need: float) -> float:
+        if self.bucket is not self.local and time.monotonic() >= self._backend_retry_at:
+            try:
+                return await self.bucket.take(need)
+            except Exception as e:
+                # The shared bucket is unavailable: limit this process on its own for a while
+                self.backend_errors += 1
+                self._backend_retry_at = time.monotonic() + BACKEND_RETRY_S
+                logger.warning(f"⚠️ Shared rate limit bucket unavailable, using a local one for {BACKEND_RETRY_S:.0f}s: {e}")
+        return await self.local.take(need)
+
+    async def acquire(self) -> float:
+        """Wait for a token at the current priority. Returns the time spent throttled, in seconds."""
+        if not self.enabled:
+            return 0.0
+        level = call_priority.get()
+        interactive = level == INTERACTIVE
+        need = 1 if interactive else 1 + self.reserve
+        started = time.perf_counter()
+        if interactive:
+            self._interactive_waiting += 1
+        try:
+            while True:
+                # In this process, lower priorities also step aside while interactive calls wait
+                if interactive or not self._interactive_waiting:
+                    wait = await self._take(need)
+                    if wait <= 0:
+                        break
+                else:
+                    wait = 1 / self.local.rate
+                await asyncio.sleep(min(wait, 5.0) * random.uniform(1.0, 1.2))
+        finally:
+            if interactive:
+                self._interactive_waiting -= 1
+        waited = time.perf_counter() - started
+        self._record(level, waited)
+        return waited
+
+    def _record(self, level: str, waited: float) -> None:
+        stats = self._stats.setdefault(level, {"calls": 0, "throttled": 0, "throttled_s": 0.0, "max_wait_s": 0.0})
+        stats["calls"] += 1
+        if waited > 0.001:
+            stats["throttled"] += 1
+            stats["throttled_s"] += waited
+            stats["max_wait_s"] = max(stats["max_wait_s"], waited)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": "mongo" if self.bucket is not self.local else "local",
+            "backend_errors": self.backend_errors,
+            "priorities": {
+                level: {
+                    "calls": int(stats["calls"]),
+                    "throttled": int(stats["throttled"]),
+                    "throttled_ms": round(stats["throttled_s"] * 1000, 1),
+                    "max_wait_ms": round(stats["max_wait_s"] * 1000, 1),
+                }
+                for level, stats in self._stats.items()
+            },
+        }
+
+
+def create_clickup_rate_limiter() -> RateLimiter:
+    settings = db_connection.settings
+    return RateLimiter(
+        key="clickup",
+        per_minute=settings.clickup_rate_limit_per_minute,
+        burst=settings.clickup_rate_limit_burst,
+        reserve=settings.clickup_rate_limit_reserve,
+        backend=settings.clickup_rate_limit_backend,
+    )
+
+
+clickup_rate_limiter = create_clickup_rate_limiter()
@@ -0,0 +1,107 @@
+"""
+Timings of the phases of an agent run.
+
+AxleAgent.run overlaps its independent phases: the history load and the
+session lookup run while the MCP servers start, and the servers are released
+while the turn is persisted. Each phase is timed on its own, so a run reports
+both its wall time and the time the same phases would take one after the
+other; the difference is what the overlap saved on the critical path.
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Deque, Dict, Iterator, Optional, TypeVar
+
+from .hedging import percentile
+
+T = TypeVar("T")
+
+# Phases that run one after the other even when the others overlap
+SEQUENTIAL_PHASES = ("mcp", "history", "session", "intent", "model", "persist", "release")
+WINDOW = 1000
+
+
+@dataclass
+class RunPhases:
+    """Phase durations (seconds) of one run."""
+
+    started: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, float] = field(default_factory=dict)
+    total: Optional[float] = None
+    fast_path: bool = False
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    @property
+    def sequential(self) -> float:
+        """Duration of the same phases run one after the other."""
+        return sum(self.phases.get(name, 0.0) for name in SEQUENTIAL_PHASES)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        return {
+            **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "total_ms": round(total * 1000, 1),
+            "sequential_ms": round(self.sequential * 1000, 1),
+            "overlap_saved_ms": round(max(0.0, self.sequential - total) * 1000, 1),
+            "fast_path": self.fast_path,
+        }
+
+
+@dataclass
+class RunPhaseStats:
+    runs: int = 0
+    fast_path: int = 0
+    samples: Dict[str, Deque[float]] = field(default_factory=dict)
+
+    def record(self, phases: RunPhases) -> None:
+        if phases.total is None:
+            return
+        self.runs += 1
+        self.fast_path += phases.fast_path
+        values = {**phases.phases, "total": phases.total, "overlap_saved": max(0.0, phases.sequential - phases.total)}
+        for name, seconds in values.items():
+            self.samples.setdefault(name, deque(maxlen=WINDOW)).append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "fast_path": self.fast_path,
+            "phases_ms": {
+                name: {
+                    "p50": round(percentile(list(samples), 50) * 1000, 1),
+                    "p95": round(percentile(list(samples), 95) * 1000, 1),
+                }
+                for name, samples in self.samples.items() if samples
+            },
+        }
+
+
+run_phase_stats = RunPhaseStats()
+current_phases: ContextVar[Optional[RunPhases]] = ContextVar("run_phases", default=None)
+
+
+@contextmanager
+def track_run_phases() -> Iterator[RunPhases]:
+    """Time the phases of the run inside the block (nested blocks share the outer timings)."""
+    phases = current_phases.get()
+    if phases is not None:
+        yield phases
+        return
+    phases = RunPhases()
+    token = current_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        current_phases.reset(token)
+        run_phase_stats.record(phases)
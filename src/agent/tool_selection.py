@@ -0,0 +1,250 @@
+"""
+Per-turn selection of the tools sent to the model.
+
+The ClickUp MCP server exposes dozens of tools and every model request
+carries all their JSON schemas. The selector runs as the agent's
+`prepare_tools` hook (which sees the MCP tools as well as the function
+tools) and keeps, on each step:
+
+  - the tools configured as always available,
+  - the tools already called during this turn or the recent turns,
+  - the best matches of the user input and recent prompts, scored with the
+    full-text and trigram index of the task search on tool names and
+    descriptions.
+
+When nothing offered fits, the model calls `expand_tools`, and the next step
+offers the tools matching its keywords, or every tool. Each request reports
+the estimated prompt tokens the omitted schemas would have cost.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelRequest, ModelResponse, ToolCallPart, UserPromptPart
+from pydantic_ai.tools import ToolDefinition
+from pydantic_core import to_json
+
+from ..clickup.search import TaskSearchIndex, tokenize
+from ..config.database import db_connection
+
+logger = logging.getLogger(__name__)
+
+EXPAND_TOOL = "expand_tools"
+# Schemas are tokenized roughly one token per 4 characters of JSON
+CHARS_PER_TOKEN = 4
+VECTOR_DIMENSIONS = 64
+# French words of the requests mapped to the English vocabulary of the tool descriptions
+QUERY_ALIASES = {
+    "tache": "task", "taches": "tasks", "sous": "subtask", "liste": "list", "listes": "lists",
+    "dossier": "folder", "dossiers": "folder", "espace": "space", "espaces": "space",
+    "commentaire": "comment", "commentaires": "comments", "commenter": "comment",
+    "assigner": "assign assignees", "assigne": "assign assignees", "membre": "member", "membres": "members",
+    "echeance": "due date", "statut": "status", "priorite": "priority", "etiquette": "tag", "etiquettes": "tags",
+    "creer": "create", "cree": "create", "ajouter": "add create", "modifier": "update", "changer": "update",
+    "supprimer": "delete", "deplacer": "move", "dupliquer": "duplicate", "chercher": "search find", "trouver": "find search",
+    "temps": "time tracking", "chrono": "time tracking", "hierarchie": "hierarchy",
+}
+
+
+def estimate_tokens(tool_def: ToolDefinition) -> int:
+    schema = {"name": tool_def.name, "description": tool_def.description, "parameters": tool_def.parameters_json_schema}
+    return len(to_json(schema)) // CHARS_PER_TOKEN + 1
+
+
+def expand_query(text: str) -> str:
+    words = tokenize(text)
+    return " ".join([*words, *(QUERY_ALIASES[word] for word in words if word in QUERY_ALIASES)])
+
+
+async def expand_tools(ctx: RunContext[Any], keywords: Optional[List[str]] = None) -> dict:
+    """
+    Get more tools. Call this when none of the available tools can do what the user asks.
+
+    Args:
+        keywords: What the missing tool should do (e.g. ['time tracking', 'move task']); leave empty to get every tool
+
+    Returns:
+        dict: Confirmation; the additional tools are available from the next step
+    """
+    return {"expanded": True, "keywords": keywords or "all tools"}
+
+
+@dataclass
+class ToolSelectionPolicy:
+    max_tools: int = 12
+    history_turns: int = 2
+    # Matches scoring below this share of the best score are left out
+    relative_min_score: float = 0.3
+    always: Tuple[str, ...] = ("get_current_datetime", "resolve_clickup_ids", "search_clickup_tasks")
+
+    @classmethod
+    def from_settings(cls) -> Optional["ToolSelectionPolicy"]:
+        settings = db_connection.settings
+        if not settings.tool_selection:
+            return None
+        always = tuple(name.strip() for name in settings.tool_selection_always.split(",") if name.strip())
+        return cls(max_tools=settings.tool_selection_max_tools, history_turns=settings.tool_selection_history_turns, always=always)
+
+
+@dataclass
+class SelectionReport:
+    """Tool selection of one request, over all its model steps."""
+
+    steps: int = 0
+    tools_available: int = 0
+    tools_sent: int = 0
+    tokens_available: int = 0
+    tokens_sent: int = 0
+    expanded: bool = False
+    selected: Set[str] = field(default_factory=set)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_available - self.tokens_sent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "steps": self.steps,
+            "tools_available": self.tools_available,
+            "tools_sent": self.tools_sent,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_saved,
+            "expanded": self.expanded,
+            "selected": sorted(self.selected),
+        }
+
+
+@dataclass
+class ToolSelectionStats:
+    requests: int = 0
+    steps: int = 0
+    expansions: int = 0
+    tokens_available: int = 0
+    tokens_sent: int = 0
+
+    def record(self, report: SelectionReport) -> None:
+        if not report.steps:
+            return
+        self.requests += 1
+        self.steps += report.steps
+        self.expansions += report.expanded
+        self.tokens_available += report.tokens_available
+        self.tokens_sent += report.tokens_sent
+
+    def to_dict(self) -> Dict[str, Any]:
+        saved = self.tokens_available - self.tokens_sent
+        return {
+            "requests": self.requests,
+            "steps": self.steps,
+            "expansions": self.expansions,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": saved,
+            "tokens_saved_per_request": round(saved / self.requests, 1) if self.requests else None,
+        }
+
+
+tool_selection_stats = ToolSelectionStats()
+current_report: ContextVar[Optional[SelectionReport]] = ContextVar("tool_selection_report", default=None)
+
+
+@contextmanager
+def track_tool_selection() -> Iterator[SelectionReport]:
+    """Collect the tool selection of the runs inside the block (nested blocks share the outer report)."""
+    report = current_report.get()
+    if report is not None:
+        yield report
+        return
+    report = SelectionReport()
+    token = current_report.set(report)
+    try:
+        yield report
+    finally:
+        current_report.reset(token)
+        tool_selection_stats.record(report)
+
+
+def _turns(messages: Sequence[Any]) -> List[Tuple[str, List[ToolCallPart]]]:
+    """(user prompt, tool calls) of each turn, oldest first."""
+    turns: List[Tuple[str, List[ToolCallPart]]] = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            prompts = [part.content for part in message.parts if isinstance(part, UserPromptPart) and isinstance(part.content, str)]
+            if prompts:
+                turns.append((" ".join(prompts), []))
+        elif isinstance(message, ModelResponse) and turns:
+            turns[-1][1].extend(part for part in message.parts if isinstance(part, ToolCallPart))
+    return turns
+
+
+class ToolSelector:
+    """`prepare_tools` hook of AxleAgent narrowing the tools to the ones the turn needs."""
+
+    def __init__(self, policy: ToolSelectionPolicy):
+        self.policy = policy
+        self._index_key: Optional[Tuple[str, ...]] = None
+        self._index: Optional[TaskSearchIndex] = None
+        self._tokens: Dict[str, int] = {}
+
+    def _prepare(self, tool_defs: List[ToolDefinition]) -> None:
+        key = tuple(f"{tool_def.name}\0{tool_def.description}" for tool_def in tool_defs)
+        if key == self._index_key:
+            return
+        # Tool sets rarely change: index them once
+        documents = [
+            {"id": tool_def.name, "name": tool_def.name.replace("_", " "), "description": tool_def.description or ""}
+            for tool_def in tool_defs
+        ]
+        self._index = TaskSearchIndex.build(documents, VECTOR_DIMENSIONS, vector_weight=0.2)
+        self._index_key = key
+        self._tokens = {tool_def.name: estimate_tokens(tool_def) for tool_def in tool_defs}
+
+    def select(self, tool_defs: List[ToolDefinition], messages: Sequence[Any]) -> Tuple[List[ToolDefinition], bool]:
+        """The tools to offer on this step, and whether the model asked for more tools during the turn."""
+        self._prepare(tool_defs)
+        turns = _turns(messages)
+        current_calls = turns[-1][1] if turns else []
+        expansions = [call for call in current_calls if call.tool_name == EXPAND_TOOL]
+        keywords: List[str] = []
+        for call in expansions:
+            keywords.extend(call.args_as_dict().get("keywords") or [])
+        if expansions and not keywords:
+            return tool_defs, True
+
+        recent = turns[-(self.policy.history_turns + 1):]
+        names = {tool_def.name for tool_def in tool_defs}
+        wanted = set(self.policy.always) | {EXPAND_TOOL}
+        wanted.update(call.tool_name for _, calls in recent for call in calls)
+        wanted &= names
+
+        # Keywords of an expansion first, then the current prompt, then the previous ones with less weight
+        queries = [" ".join(keywords)] if keywords else []
+        queries.extend(prompt for prompt, _ in reversed(recent))
+        ranked: Dict[str, float] = {}
+        for weight, query in zip((1.0, 0.6, 0.4, 0.3), queries):
+            scores = self._index.scores(expand_query(query))
+            for name, score in zip(self._index.ids, scores.tolist()):
+                ranked[name] = max(ranked.get(name, 0.0), score * weight)
+
+        limit = len(wanted) + self.policy.max_tools * (2 if keywords else 1)
+        best = max(ranked.values(), default=0.0)
+        for name, score in sorted(ranked.items(), key=lambda item: -item[1]):
+            if len(wanted) >= limit or score <= 0 or score < best * self.policy.relative_min_score:
+                break
+            wanted.add(name)
+        return [tool_def for tool_def in tool_defs if tool_def.name in wanted], bool(expansions)
+
+    async def __call__(self, ctx: RunContext[Any], tool_defs: List[ToolDefinition]) -> List[ToolDefinition]:
+        selected, expanded = self.select(tool_defs, ctx.messages)
+        report = current_report.get()
+        if report is not None:
+            report.steps += 1
+            report.tools_available = len(tool_defs)
+            report.tools_sent = max(report.tools_sent, len(selected))
+            report.tokens_available += sum(self._tokens.get(tool_def.name, 0) for tool_def in tool_defs)
+            report.tokens_sent += sum(self._tokens.get(tool_def.name, 0) for tool_def in selected)
+            report.expanded = report.expanded or expanded
+            report.selected.update(tool_def.name for tool_def in selected)
+        return selected
@@ -1,10 +1,63 @@
 """
 Tools for Pydantic AI agents.
 """
-from datetime import datetime
+from datetime import date, datetime, time
+from typing import Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 from pydantic_ai import RunContext
 from dataclasses import dataclass
 from .dependencies import AppDependencies
+from ..clickup.search import task_search
+from ..clickup.snapshot import WorkspaceEntity, name_key, workspace_snapshot
+from ..config.database import db_connection
+
+SNAPSHOT_UNAVAILABLE = {"error": "The workspace snapshot is not available yet, use the ClickUp MCP tools instead"}
+TASK_INDEX_UNAVAILABLE = {"error": "The task search index is not available yet, use the ClickUp MCP tools instead"}
+MAX_SEARCH_RESULTS = 50
+SELF_ASSIGNEES = ("me", "moi", "myself")
+
+
+def user_timezone() -> ZoneInfo:
+    return ZoneInfo(db_connection.settings.user_timezone)
+
+
+def user_today() -> date:
+    """Today in the configured time zone of the users."""
+    return datetime.now(user_timezone()).date()
+
+
+def current_member(deps: Any) -> Optional[WorkspaceEntity]:
+    """The workspace member the chat user is: `deps.user_id` is a member id, email or username."""
+    user_id = str(getattr(deps, "user_id", None) or "").strip()
+    if not user_id or not workspace_snapshot.loaded:
+        return None
+    snapshot = workspace_snapshot.snapshot
+    member = snapshot.get("member", user_id)
+    if member is None:
+        # Exact key only: resolving a close spelling would answer with someone else's tasks
+        matches = snapshot.by_key["member"].get(name_key(user_id), [])
+        member = matches[0] if len(matches) == 1 else None
+    return member
+
+
+def _day_bounds(day_from: Optional[str], day_to: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Milliseconds since the epoch of the start of `day_from` and the end of `day_to` (dates in the users' time zone, YYYY-MM-DD)."""
+    zone = user_timezone()
+    def bound(value: Optional[str], moment: time) -> Optional[int]:
+        if not value:
+            return None
+        return int(datetime.combine(date.fromisoformat(value.strip()), moment, tzinfo=zone).timestamp() * 1000)
+    return bound(day_from, time.min), bound(day_to, time.max)
+
+
+def _assignee_name(assignee: Optional[str], deps: Any) -> Optional[str]:
+    """'me' is the workspace member of the chat user."""
+    if not assignee or assignee.strip().lower() not in SELF_ASSIGNEES:
+        return assignee
+    member = current_member(deps)
+    if member is None:
+        raise ValueError("the chat user is not a member of the synced ClickUp workspace")
+    return member.name
 
 class AgentTools:
     """Collection of tools for Pydantic AI agents."""
@@ -12,12 +65,12 @@ class AgentTools:
     @staticmethod
     async def get_current_datetime(ctx: RunContext[AppDependencies]) -> str:
         """
-        Get the current date with time.
+        Get the current date with time, in the users' time zone.
         
         Returns:
             str: Current datetime in format 'YYYY-MM-DD HH:MM:SS'
         """
-        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return datetime.now(user_timezone()).strftime('%Y-%m-%d %H:%M:%S')
     
     @staticmethod
     async def get_user_info(ctx: RunContext[AppDependencies]) -> dict:
@@ -31,3 +84,110 @@ class AgentTools:
             "user_id": ctx.deps.user_id,
             "session_id": ctx.deps.session_id
         }
+    
+    @staticmethod
+    async def resolve_clickup_ids(ctx: RunContext[AppDependencies], names: List[str], kind: Optional[str] = None) -> dict:
+        """
+        Resolve ClickUp space, folder, list or member names to their ids, from the synced workspace snapshot.
+        Use this instead of fetching the workspace hierarchy to find an id.
+        
+        Args:
+            names: Names to resolve (case and accents are ignored, close spellings match too)
+            kind: Only match this kind of entity: 'space', 'folder', 'list' or 'member'
+        
+        Returns:
+            dict: For each name, the best matches with id, kind, path (and statuses for lists, email for members)
+        """
+        snapshot = workspace_snapshot.snapshot
+        if not workspace_snapshot.loaded:
+            return SNAPSHOT_UNAVAILABLE
+        return {
+            "matches": {name: snapshot.resolve(name, kind) for name in names},
+            "synced_at": snapshot.synced_at.isoformat() if snapshot.synced_at else None
+        }
+    
+    @staticmethod
+    async def get_synced_hierarchy(ctx: RunContext[AppDependencies], space: Optional[str] = None, include_lists: bool = True) -> dict:
+        """
+        Get the ClickUp workspace hierarchy (spaces with their statuses, folders and lists) from the synced snapshot.
+        
+        Args:
+            space: Only this space (name or id)
+            include_lists: Include the lists of each folder and space
+        
+        Returns:
+            dict: Spaces with their ids, statuses, folders and lists
+        """
+        if not workspace_snapshot.loaded:
+            return SNAPSHOT_UNAVAILABLE
+        return workspace_snapshot.snapshot.hierarchy(space, include_lists)
+    
+    @staticmethod
+    async def search_clickup_tasks(
+        ctx: RunContext[AppDependencies],
+        query: str,
+        limit: int = 10,
+        list: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> dict:
+        """
+        Search ClickUp tasks by words of their name, description or tags, in a locally synced index.
+        Use this to find tasks (and their ids) from a description instead of listing tasks through the ClickUp tools.
+        
+        Args:
+            query: Words to look for (misspellings and partial words still match)
+            limit: Maximum number of tasks to return (at most 50)
+            list: Only tasks of this list (name or id)
+            status: Only tasks with this status
+        
+        Returns:
+            dict: Best matching tasks with id, name, status, list, assignees, url, a summary of the description and a score
+        """
+        if not task_search.loaded:
+            return TASK_INDEX_UNAVAILABLE
+        index = task_search.snapshot
+        return {
+            "results": task_search.search(query, max(1, min(limit, MAX_SEARCH_RESULTS)), list, status),
+            "synced_at": index.synced_at.isoformat() if index.synced_at else None
+        }
+    
+    @staticmethod
+    async def get_due_tasks(
+        ctx: RunContext[AppDependencies],
+        due_from: Optional[str] = None,
+        due_to: Optional[str] = None,
+        assignee: Optional[str] = None,
+        list: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
+        """
+        List ClickUp tasks by due date, soonest first, from the locally synced task index.
+        Use this for "tasks due today", "my tasks due this week" or "overdue tasks" instead of listing tasks through the ClickUp tools.
+        
+        Args:
+            due_from: Only tasks due on or after this day (YYYY-MM-DD)
+            due_to: Only tasks due on or before this day (YYYY-MM-DD)
+            assignee: Only tasks assigned to this member (username or email, 'me' for the current user)
+            list: Only tasks of this list (name or id)
+            status: Only tasks with this status
+            limit: Maximum number of tasks to return (at most 50)
+        
+        Returns:
+            dict: Tasks with id, name, status, list, due date, assignees and url
+        """
+        if not task_search.loaded:
+            return TASK_INDEX_UNAVAILABLE
+        try:
+            start, end = _day_bounds(due_from, due_to)
+        except ValueError as e:
+            return {"error": f"Invalid date, use YYYY-MM-DD: {e}"}
+        try:
+            assignee = _assignee_name(assignee, ctx.deps)
+        except ValueError as e:
+            return {"error": f"Could not identify the current ClickUp user: {e}"}
+        index = task_search.snapshot
+        return {
+            "results": task_search.due(start, end, assignee, list, status, max(1, min(limit, MAX_SEARCH_RESULTS))),
+            "synced_at": index.synced_at.isoformat() if index.synced_at else None
+        }
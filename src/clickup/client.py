@@ -0,0 +1,241 @@
+"""
+Async ClickUp API v2 client.
+
+One pooled `httpx.AsyncClient` per process keeps connections to the API
+alive between calls, multiplexed over HTTP/2 when the optional `h2` package
+is installed. Requests go through the shared ClickUp rate limiter, and a 429
+is retried once the window announced by `X-RateLimit-Reset` has passed.
+Identical GETs in flight at the same time share one request, and batches of
+tasks are fetched concurrently over the pool.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from ..agent.rate_limit import RateLimiter, clickup_rate_limiter
+
+try:
+    import h2
+except ImportError:  # pragma: no cover - optional dependency
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.clickup.com/api/v2"
+
+
+class ClickUpError(Exception):
+    def __init__(self, status_code: int, message: str, body: Any = None):
+        super().__init__(f"ClickUp API error {status_code}: {message}")
+        self.status_code = status_code
+        self.body = body
+
+
+class ClickUpClient:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_rate_limit_retries: int = 3,
+        http2: Optional[bool] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.http2 = h2 is not None if http2 is None else http2
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": api_key, "Content-Type": "application/json"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            http2=self.http2,
+        )
+        self._inflight: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], asyncio.Future] = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "ClickUpClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, json: Any = None) -> Any:
+        for attempt in range(self.max_rate_limit_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            response = await self._client.request(method, path, params=params, json=json)
+            self.requests += 1
+            if response.status_code == 429 and attempt < self.max_rate_limit_retries:
+                self.rate_limited += 1
+                await asyncio.sleep(self._retry_after(response))
+                continue
+            if response.status_code >= 400:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = response.text
+                message = body.get("err", response.reason_phrase) if isinstance(body, dict) else response.reason_phrase
+                raise ClickUpError(response.status_code, message, body)
+            return response.json() if response.content else None
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        reset = response.headers.get("x-ratelimit-reset")
+        if reset:
+            try:
+                return min(60.0, max(0.5, float(reset) - time.time()))
+            except ValueError:
+                pass
+        return 2.0
+
+    async def get(self, path: str, **params: Any) -> Any:
+        params = {k: v for k, v in params.items() if v is not None}
+        key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # The same resource is already being fetched: share its response
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The run that started the request was cancelled, not this one
+                return await self.get(path, **params)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self.request("GET", path, params=params or None)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so an exception nobody else awaited is not reported as lost
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def post(self, path: str, json: Any = None) -> Any:
+        return await self.request("POST", path, json=json)
+
+    async def put(self, path: str, json: Any = None) -> Any:
+        return await self.request("PUT", path, json=json)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "coalesced": self.coalesced,
+        }
+
+    # Workspace hierarchy
+
+    async def get_teams(self) -> List[Dict[str, Any]]:
+        return (await self.get("/team")).get("teams", [])
+
+    async def get_spaces(self, team_id: str, archived: bool = False) -> List[Dict[str, Any]]:
+        return (await self.get(f"/team/{team_id}/space", archived=str(archived).lower())).get("spaces", [])
+
+    async def get_folders(self, space_id: str, archived: bool = False) -> List[Dict[str, Any]]:
+        return (await self.get(f"/space/{space_id}/folder", archived=str(archived).lower())).get("folders", [])
+
+    async def get_folderless_lists(self, space_id: str, archived: bool = False) -> List[Dict[str, Any]]:
+        return (await self.get(f"/space/{space_id}/list", archived=str(archived).lower())).get("lists", [])
+
+    async def get_list(self, list_id: str) -> Dict[str, Any]:
+        return await self.get(f"/list/{list_id}")
+
+    # Tasks
+
+    async def get_task(self, task_id: str, include_subtasks: bool = False) -> Dict[str, Any]:
+        return await self.get(f"/task/{task_id}", include_subtasks=str(include_subtasks).lower())
+
+    async def get_tasks(self, task_ids: Sequence[str], concurrency: int = 16) -> Dict[str, Any]:
+        """
+        Several tasks fetched concurrently over the connection pool (the API has
+        no bulk read): task id -> task, or the ClickUpError it failed with.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(task_id: str) -> Any:
+            async with semaphore:
+                try:
+                    return await self.get_task(task_id)
+                except ClickUpError as e:
+                    return e
+
+        unique = list(dict.fromkeys(str(task_id) for task_id in task_ids))
+        return dict(zip(unique, await asyncio.gather(*(fetch(task_id) for task_id in unique))))
+
+    async def get_list_tasks(self, list_id: str, page: int = 0, **filters: Any) -> Dict[str, Any]:
+        """One page (up to 100) of the tasks of a list; `filters` are the API query parameters."""
+        return await self.get(f"/list/{list_id}/task", page=page, **filters)
+
+    async def create_task(self, list_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.post(f"/list/{list_id}/task", json=task)
+
+    async def update_task(self, task_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.put(f"/task/{task_id}", json=changes)
+
+    async def get_task_comments(self, task_id: str) -> List[Dict[str, Any]]:
+        return (await self.get(f"/task/{task_id}/comment")).get("comments", [])
+
+    async def create_task_comment(self, task_id: str, text: str, notify_all: bool = False) -> Dict[str, Any]:
+        return await self.post(f"/task/{task_id}/comment", json={"comment_text": text, "notify_all": notify_all})
+
+    async def get_team_tasks(self, team_id: str, page: int = 0, date_updated_gt: Optional[int] = None) -> Dict[str, Any]:
+        """One page (up to 100) of the tasks of a workspace, open and closed, subtasks included."""
+        return await self.get(
+            f"/team/{team_id}/task",
+            page=page,
+            order_by="updated",
+            reverse="true",
+            subtasks="true",
+            include_closed="true",
+            date_updated_gt=date_updated_gt
+        )
+
+
+def create_clickup_client(**kwargs: Any) -> ClickUpClient:
+    """Client for the configured API token, sharing the process-wide rate limiter."""
+    api_key = os.environ.get("CLICKUP_API_KEY")
+    if not api_key:
+        raise ValueError("❌ CLICKUP_API_KEY environment variable is not set")
+    kwargs.setdefault("base_url", os.environ.get("CLICKUP_API_URL", DEFAULT_BASE_URL))
+    kwargs.setdefault("rate_limiter", clickup_rate_limiter)
+    return ClickUpClient(api_key, **kwargs)
+
+
+_shared_client: Optional[ClickUpClient] = None
+
+
+def get_clickup_client() -> ClickUpClient:
+    """The process-wide client used by the native ClickUp tools, created on first use."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = create_clickup_client()
+    return _shared_client
+
+
+async def close_clickup_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
@@ -0,0 +1,405 @@
+"""
+Local full-text (and optional vector) search over synced ClickUp tasks.
+
+The inverted index maps each token to a slice of flat NumPy arrays of
+document numbers and precomputed BM25 weights, so a query is a handful of
+vectorized scatter-adds into a score array followed by an `argpartition` for
+the top k.
+
+Vector similarity is optional: the name and tags of each task get a hashed
+bag of character trigrams (computed locally, no embedding model),
+L2-normalized into a float32 matrix. Trigrams match misspellings and partial words that whole-word tokens
+miss; the final score blends both when vectors are enabled. The whole corpus
+is encoded in one vectorized pass, without a Python loop per trigram.
+
+Tasks are mirrored into MongoDB by `sync_tasks` (`src/jobs/clickup_sync.py`),
+incrementally from the last `date_updated` seen; each worker rebuilds its
+index when the sync state version changes. Due dates are kept in an array
+too, for listing the tasks due in a date range without a query.
+"""
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+from ..repositories.indexes import IndexSpec
+from .snapshot import STATE_ID, WorkspaceRepository, WorkspaceSnapshotStore, entity_hash, name_key
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has in is it its of on or the to was were will with
+de des du en et la le les pour un une au aux sur dans par
+""".split())
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SUMMARY_CHARS = 200
+RELATIVE_SCORE_FLOOR = 0.2
+# Characters of each task name fed to the trigram embedding
+EMBEDDING_CHARS = 128
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(name_key(text)) if len(token) > 1 and token not in STOPWORDS]
+
+
+def task_text(task: Dict[str, Any]) -> str:
+    """Name and tags of a task: what the trigram vectors are computed from."""
+    parts = [task.get("name") or ""]
+    parts.extend(task.get("tags") or ())
+    return " ".join(part for part in parts if part)
+
+
+def embed_texts(texts: Sequence[str], dimensions: int) -> np.ndarray:
+    """Hashed character-trigram vectors of `texts`, L2-normalized (one row per text)."""
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    if not texts:
+        return matrix
+    encoded = [(" " + name_key(text)[:EMBEDDING_CHARS] + " ").encode("utf-8", "ignore") for text in texts]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+    if buffer.size < 3:
+        return matrix
+    # Trigram codes for every position of the concatenated buffer
+    codes = (buffer[:-2] << 16) | (buffer[1:-1] << 8) | buffer[2:]
+    owners = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)[:-2]
+    # Drop the trigrams spanning two texts
+    ends = np.cumsum(lengths)
+    valid = np.ones(codes.size, dtype=bool)
+    for offset in (1, 2):
+        positions = ends - offset
+        valid[positions[(positions >= 0) & (positions < codes.size)]] = False
+    codes, owners = codes[valid], owners[valid]
+    buckets = ((codes * np.uint32(2654435761)) >> np.uint32(7)) % np.uint32(dimensions)
+    counts = np.bincount(owners * dimensions + buckets.astype(np.int64), minlength=len(texts) * dimensions)
+    matrix[:] = counts.reshape(len(texts), dimensions)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+@dataclass
+class TaskSearchIndex:
+    """
+    BM25 postings stored flat: the documents containing token `t` are
+    `documents[offsets[t]:offsets[t + 1]]`, with their weights at the same positions.
+    """
+
+    ids: List[str]
+    tasks: List[Dict[str, Any]]
+    vocabulary: Dict[str, int]
+    offsets: np.ndarray
+    documents: np.ndarray
+    weights: np.ndarray
+    idf: np.ndarray
+    list_codes: np.ndarray
+    status_codes: np.ndarray
+    lists: Dict[str, int]
+    statuses: Dict[str, int]
+    vectors: Optional[np.ndarray] = None
+    vector_weight: float = 0.3
+    # Milliseconds since the epoch, -1 for the tasks without a due date
+    due_dates: Optional[np.ndarray] = None
+    build_ms: Dict[str, float] = field(default_factory=dict)
+    version: Optional[str] = None
+    synced_at: Optional[datetime] = None
+
+    @classmethod
+    def build(cls, tasks: Sequence[Dict[str, Any]], dimensions: Optional[int] = None, vector_weight: float = 0.3) -> "TaskSearchIndex":
+        started = time.perf_counter()
+        vocabulary: Dict[str, int] = {}
+        token_ids: List[int] = []
+        documents: List[int] = []
+        frequencies: List[int] = []
+        lengths = np.zeros(len(tasks), dtype=np.float32)
+        for number, task in enumerate(tasks):
+            # Words of the name count double
+            tokens = tokenize(task.get("name") or "") * 2
+            tokens.extend(tokenize(task.get("description") or ""))
+            for tag in task.get("tags") or ():
+                tokens.extend(tokenize(tag))
+            counts = Counter(tokens)
+            lengths[number] = len(tokens)
+            token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in counts)
+            documents.extend([number] * len(counts))
+            frequencies.extend(counts.values())
+        tokenized = time.perf_counter()
+
+        token_array = np.asarray(token_ids, dtype=np.int32)
+        order = np.argsort(token_array, kind="stable")
+        document_array = np.asarray(documents, dtype=np.int32)[order]
+        tf = np.asarray(frequencies, dtype=np.float32)[order]
+        df = np.bincount(token_array, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        average_length = max(float(lengths.mean()) if len(tasks) else 1.0, 1.0)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[document_array] / average_length)
+        weights = (tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+        idf = np.log(1 + (len(tasks) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        indexed = time.perf_counter()
+
+        # Filters compare small integer codes instead of strings; a list is known by its id and its name
+        lists: Dict[str, int] = {}
+        statuses: Dict[str, int] = {}
+        list_codes = np.empty(len(tasks), dtype=np.int32)
+        status_codes = np.empty(len(tasks), dtype=np.int32)
+        due_dates = np.full(len(tasks), -1, dtype=np.int64)
+        for number, task in enumerate(tasks):
+            if task.get("due_date"):
+                due_dates[number] = int(task["due_date"])
+            list_id = str(task.get("list_id") or "")
+            code = lists.get(list_id)
+            if code is None:
+                code = lists[list_id] = len(lists)
+                lists.setdefault(name_key(task.get("list_name")), code)
+            list_codes[number] = code
+            status = task.get("status") or ""
+            code = statuses.get(status)
+            if code is None:
+                code = statuses[status] = statuses.setdefault(name_key(status), len(statuses))
+            status_codes[number] = code
+        filtered = time.perf_counter()
+
+        vectors = embed_texts([task_text(task) for task in tasks], dimensions) if dimensions else None
+        finished = time.perf_counter()
+        return cls(
+            ids=[str(task["id"]) for task in tasks],
+            tasks=list(tasks),
+            vocabulary=vocabulary,
+            offsets=offsets,
+            documents=document_array,
+            weights=weights,
+            idf=idf,
+            list_codes=list_codes,
+            status_codes=status_codes,
+            lists=lists,
+            statuses=statuses,
+            vectors=vectors,
+            vector_weight=vector_weight,
+            due_dates=due_dates,
+            build_ms={
+                "tokenize": round((tokenized - started) * 1000, 1),
+                "postings": round((indexed - tokenized) * 1000, 1),
+                "filters": round((filtered - indexed) * 1000, 1),
+                "vectors": round((finished - filtered) * 1000, 1),
+                "total": round((finished - started) * 1000, 1),
+            },
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        size = self.offsets.nbytes + self.documents.nbytes + self.weights.nbytes + self.idf.nbytes
+        return size + (self.vectors.nbytes if self.vectors is not None else 0)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            token_id = self.vocabulary.get(token)
+            if token_id is not None:
+                start, end = self.offsets[token_id], self.offsets[token_id + 1]
+                # Each document appears once per token, so fancy-index addition is exact
+                scores[self.documents[start:end]] += self.idf[token_id] * self.weights[start:end]
+        if self.vectors is not None:
+            query_vector = embed_texts([query], self.vectors.shape[1])[0]
+            top = scores.max()
+            if top > 0:
+                scores /= top
+            scores *= 1 - self.vector_weight
+            scores += self.vector_weight * (self.vectors @ query_vector)
+        return scores
+
+    def search(self, query: str, limit: int = 10, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Top `limit` tasks for `query` (optionally among the documents selected by `mask`)."""
+        scores = self.scores(query)
+        if mask is not None:
+            scores = np.where(mask, scores, 0)
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        # Drop the weak trigram-only matches trailing behind the best results
+        floor = max(float(scores[ranked[0]]) * RELATIVE_SCORE_FLOOR, 0.0)
+        return [self.describe(int(number), float(scores[number])) for number in ranked if scores[number] > floor]
+
+    def mask(self, list_name: Optional[str] = None, status: Optional[str] = None) -> Optional[np.ndarray]:
+        """Documents in the list `list_name` (name or id) with `status`; None when there is no filter."""
+        if not list_name and not status:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        if list_name:
+            code = self.lists.get(list_name.strip(), self.lists.get(name_key(list_name)))
+            mask &= self.list_codes == (code if code is not None else -1)
+        if status:
+            code = self.statuses.get(name_key(status))
+            mask &= self.status_codes == (code if code is not None else -1)
+        return mask
+
+    def due(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        mask: Optional[np.ndarray] = None,
+        assignee: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Tasks due between `start` and `end` (milliseconds since the epoch, inclusive), soonest first."""
+        selected = self.due_dates >= 0
+        if start is not None:
+            selected &= self.due_dates >= start
+        if end is not None:
+            selected &= self.due_dates <= end
+        if mask is not None:
+            selected &= mask
+        numbers = np.flatnonzero(selected)
+        numbers = numbers[np.argsort(self.due_dates[numbers], kind="stable")]
+        if assignee:
+            key = name_key(assignee)
+            numbers = [number for number in numbers.tolist() if any(name_key(name) == key for name in self.tasks[number].get("assignees") or ())]
+        return [self.describe(int(number)) for number in numbers[:limit]]
+
+    def describe(self, number: int, score: Optional[float] = None) -> Dict[str, Any]:
+        task = self.tasks[number]
+        description = (task.get("description") or "").strip()
+        result = {
+            "id": self.ids[number],
+            "name": task.get("name"),
+            "status": task.get("status"),
+            "list": task.get("list_name"),
+        }
+        if score is not None:
+            result["score"] = round(score, 3)
+        if task.get("due_date"):
+            result["due_date"] = datetime.fromtimestamp(int(task["due_date"]) / 1000, tz=timezone.utc).isoformat()
+        if task.get("assignees"):
+            result["assignees"] = task["assignees"]
+        if task.get("url"):
+            result["url"] = task["url"]
+        if description:
+            result["summary"] = description[:SUMMARY_CHARS] + ("…" if len(description) > SUMMARY_CHARS else "")
+        return result
+
+
+class TaskRepository(WorkspaceRepository):
+    """Synced tasks, one document per task, next to their own sync state and lock documents."""
+
+    def __init__(self):
+        self.collection: AsyncCollection = db_connection.telemetry_collection(
+            db_connection.settings.clickup_tasks_collection
+        )
+
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return []
+
+    async def load(self) -> TaskSearchIndex:
+        settings = db_connection.settings
+        state = await self.get_state() or {}
+        cursor = self.collection.find({"kind": "task"}, projection={"hash": 0, "synced_at": 0})
+        tasks = [document async for document in cursor]
+        # Building the index is CPU bound: keep it off the event loop
+        index = await asyncio.to_thread(
+            TaskSearchIndex.build,
+            tasks,
+            settings.clickup_search_vector_dimensions or None,
+            settings.clickup_search_vector_weight
+        )
+        index.version = state.get("version")
+        index.synced_at = state.get("synced_at")
+        logger.info(f"🔎 ClickUp task index built: {len(index)} tasks in {index.build_ms.get('total')} ms")
+        return index
+
+    async def apply(self, tasks: List[Dict[str, Any]], full: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Write the tasks whose content changed. A full sync also deletes the
+        tasks it did not see (deleted or archived since the last full sync).
+        """
+        ids = [f"task:{task['id']}" for task in tasks]
+        query = {"kind": "task"} if full else {"_id": {"$in": ids}}
+        existing = {
+            document["_id"]: document.get("hash")
+            async for document in self.collection.find(query, projection={"hash": 1})
+        }
+        now = datetime.utcnow()
+        operations = []
+        stats: Dict[str, Any] = {"tasks": len(tasks), "changed": 0, "deleted": 0, "full": full}
+        last_updated = 0
+        for task_id, task in zip(ids, tasks):
+            task["_id"] = task_id
+            task["kind"] = "task"
+            task["hash"] = entity_hash(task)
+            last_updated = max(last_updated, task.get("date_updated") or 0)
+            if existing.get(task_id) != task["hash"]:
+                operations.append(ReplaceOne({"_id": task_id}, {**task, "synced_at": now}, upsert=True))
+                stats["changed"] += 1
+        if full:
+            for task_id in existing.keys() - set(ids):
+                operations.append(DeleteOne({"_id": task_id}))
+                stats["deleted"] += 1
+
+        if dry_run:
+            return stats
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        previous = await self.get_state() or {}
+        state: Dict[str, Any] = {
+            "synced_at": now,
+            "last_updated": max(last_updated, 0 if full else previous.get("last_updated") or 0),
+        }
+        if full:
+            state["full_synced_at"] = now
+        if operations or not previous.get("version"):
+            state["version"] = uuid.uuid4().hex
+        await self.collection.update_one({"_id": STATE_ID}, {"$set": state}, upsert=True)
+        return stats
+
+
+class TaskSearchStore(WorkspaceSnapshotStore):
+    """The process-wide task index, rebuilt by a background task when the synced tasks change."""
+
+    label = "task index"
+
+    def repository(self) -> TaskRepository:
+        return TaskRepository()
+
+    def search(self, query: str, limit: int = 10, list_name: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        index = self.snapshot
+        return index.search(query, limit, index.mask(list_name, status))
+
+    def due(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        assignee: Optional[str] = None,
+        list_name: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        index = self.snapshot
+        return index.due(start, end, index.mask(list_name, status), assignee, limit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        if self.snapshot is not None:
+            stats["build_ms"] = self.snapshot.build_ms
+            stats["index_bytes"] = self.snapshot.nbytes
+            stats["vectors"] = self.snapshot.vectors is not None
+        return stats
+
+
+task_search = TaskSearchStore()
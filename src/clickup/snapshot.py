@@ -0,0 +1,347 @@
+"""
+Snapshot of the ClickUp workspace hierarchy.
+
+The sync job (`src/jobs/clickup_sync.py`) mirrors spaces, folders, lists,
+members and statuses into one MongoDB document per entity, writing only the
+entities whose content changed. Each worker keeps the whole snapshot in
+memory, indexed by id and by normalized name, and reloads it when the sync
+state version changes. Agent tools answer name-to-id lookups and hierarchy
+questions from it without going through MCP.
+"""
+import asyncio
+import difflib
+import hashlib
+import logging
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic_core import to_json
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import DuplicateKeyError
+
+from ..agent.rate_limit import BACKGROUND, priority
+from ..config.database import db_connection
+from ..repositories.indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("space", "folder", "list", "member")
+STATE_ID = "sync_state"
+LOCK_ID = "sync_lock"
+
+
+def name_key(name: Optional[str]) -> str:
+    """Case-, accent- and whitespace-insensitive form of a name."""
+    if not name:
+        return ""
+    if name.isascii():
+        return " ".join(name.lower().split())
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+def entity_hash(entity: Dict[str, Any]) -> str:
+    content = {key: value for key, value in entity.items() if key not in ("_id", "hash", "synced_at")}
+    return hashlib.blake2b(to_json(content, by_alias=True), digest_size=16).hexdigest()
+
+
+@dataclass
+class WorkspaceEntity:
+    kind: str
+    id: str
+    name: str
+    space_id: Optional[str] = None
+    folder_id: Optional[str] = None
+    statuses: List[str] = field(default_factory=list)
+    email: Optional[str] = None
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "WorkspaceEntity":
+        return cls(
+            kind=document["kind"],
+            id=document["id"],
+            name=document.get("name") or "",
+            space_id=document.get("space_id"),
+            folder_id=document.get("folder_id"),
+            statuses=document.get("statuses") or [],
+            email=document.get("email"),
+        )
+
+
+class WorkspaceSnapshot:
+    def __init__(self, entities: Iterable[WorkspaceEntity], version: Optional[str] = None, synced_at: Optional[datetime] = None):
+        self.version = version
+        self.synced_at = synced_at
+        self.by_id: Dict[Tuple[str, str], WorkspaceEntity] = {}
+        self.by_key: Dict[str, Dict[str, List[WorkspaceEntity]]] = {kind: {} for kind in KINDS}
+        self.children: Dict[Optional[str], List[WorkspaceEntity]] = {}
+        for entity in entities:
+            self.by_id[(entity.kind, entity.id)] = entity
+            keys = {name_key(entity.name)}
+            if entity.email:
+                keys.add(name_key(entity.email))
+            for key in keys:
+                self.by_key[entity.kind].setdefault(key, []).append(entity)
+            if entity.kind == "folder":
+                self.children.setdefault(entity.space_id, []).append(entity)
+            elif entity.kind == "list":
+                self.children.setdefault(entity.folder_id or entity.space_id, []).append(entity)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, kind: str, entity_id: str) -> Optional[WorkspaceEntity]:
+        return self.by_id.get((kind, str(entity_id)))
+
+    def path(self, entity: WorkspaceEntity) -> str:
+        parts = []
+        space = self.get("space", entity.space_id) if entity.space_id else None
+        folder = self.get("folder", entity.folder_id) if entity.folder_id else None
+        for parent in (space, folder):
+            if parent is not None:
+                parts.append(parent.name)
+        parts.append(entity.name)
+        return " / ".join(parts)
+
+    def describe(self, entity: WorkspaceEntity, score: Optional[float] = None) -> Dict[str, Any]:
+        description: Dict[str, Any] = {"kind": entity.kind, "id": entity.id, "name": entity.name}
+        if entity.kind == "member":
+            if entity.email:
+                description["email"] = entity.email
+        else:
+            description["path"] = self.path(entity)
+        if entity.kind == "list" and entity.statuses:
+            description["statuses"] = entity.statuses
+        if score is not None:
+            description["score"] = round(score, 2)
+        return description
+
+    def resolve(self, name: str, kind: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Entities matching `name`: exact (normalized) matches, then prefix, substring and close matches."""
+        key = name_key(name)
+        kinds = [kind] if kind in KINDS else list(KINDS)
+        if not key:
+            return []
+        scored: Dict[Tuple[str, str], Tuple[float, WorkspaceEntity]] = {}
+
+        def add(entities: Iterable[WorkspaceEntity], score: float) -> None:
+            for entity in entities:
+                current = scored.get((entity.kind, entity.id))
+                if current is None or current[0] < score:
+                    scored[(entity.kind, entity.id)] = (score, entity)
+
+        for entity_kind in kinds:
+            index = self.by_key[entity_kind]
+            add(index.get(key, ()), 1.0)
+            # An id given instead of a name
+            entity = self.get(entity_kind, name.strip())
+            if entity is not None:
+                add([entity], 1.0)
+        if not scored:
+            for entity_kind in kinds:
+                index = self.by_key[entity_kind]
+                for candidate, entities in index.items():
+                    if candidate.startswith(key):
+                        add(entities, 0.9)
+                    elif key in candidate:
+                        add(entities, 0.8)
+                for candidate in difflib.get_close_matches(key, index.keys(), n=limit, cutoff=0.75):
+                    add(index[candidate], difflib.SequenceMatcher(None, key, candidate).ratio() * 0.9)
+        ranked = sorted(scored.values(), key=lambda item: (-item[0], KINDS.index(item[1].kind), item[1].name))
+        return [self.describe(entity, score) for score, entity in ranked[:limit]]
+
+    def hierarchy(self, space: Optional[str] = None, include_lists: bool = True) -> Dict[str, Any]:
+        spaces = [entity for (kind, _), entity in self.by_id.items() if kind == "space"]
+        if space:
+            wanted = {match["id"] for match in self.resolve(space, "space")}
+            spaces = [entity for entity in spaces if entity.id in wanted]
+
+        def lists_of(parent_id: str) -> List[Dict[str, Any]]:
+            return [{"id": entity.id, "name": entity.name} for entity in self.children.get(parent_id, ()) if entity.kind == "list"]
+
+        tree = []
+        for space_entity in sorted(spaces, key=lambda entity: entity.name):
+            node: Dict[str, Any] = {"id": space_entity.id, "name": space_entity.name, "statuses": space_entity.statuses}
+            folders = []
+            for folder in self.children.get(space_entity.id, ()):
+                if folder.kind != "folder":
+                    continue
+                folder_node: Dict[str, Any] = {"id": folder.id, "name": folder.name}
+                if include_lists:
+                    folder_node["lists"] = lists_of(folder.id)
+                folders.append(folder_node)
+            node["folders"] = folders
+            if include_lists:
+                node["lists"] = lists_of(space_entity.id)
+            tree.append(node)
+        return {"synced_at": self.synced_at.isoformat() if self.synced_at else None, "spaces": tree}
+
+
+class WorkspaceRepository:
+    def __init__(self):
+        self.collection: AsyncCollection = db_connection.telemetry_collection(
+            db_connection.settings.clickup_workspace_collection
+        )
+
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return [IndexSpec(name="kind_name_key", keys=(("kind", 1), ("name_key", 1)))]
+
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
+
+    async def get_state(self) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": STATE_ID})
+
+    async def load(self) -> WorkspaceSnapshot:
+        state = await self.get_state() or {}
+        cursor = self.collection.find({"kind": {"$in": list(KINDS)}}, projection={"hash": 0, "synced_at": 0})
+        entities = [WorkspaceEntity.from_document(document) async for document in cursor]
+        return WorkspaceSnapshot(entities, state.get("version"), state.get("synced_at"))
+
+    async def apply(self, entities: List[Dict[str, Any]], dry_run: bool = False) -> Dict[str, int]:
+        """Write the entities whose content changed and delete the ones that disappeared."""
+        existing = {
+            document["_id"]: document.get("hash")
+            async for document in self.collection.find({"kind": {"$in": list(KINDS)}}, projection={"hash": 1})
+        }
+        now = datetime.utcnow()
+        operations = []
+        stats = {"entities": len(entities), "changed": 0, "deleted": 0}
+        seen = set()
+        for entity in entities:
+            entity["_id"] = f"{entity['kind']}:{entity['id']}"
+            entity["name_key"] = name_key(entity.get("name"))
+            entity["hash"] = entity_hash(entity)
+            seen.add(entity["_id"])
+            if existing.get(entity["_id"]) != entity["hash"]:
+                operations.append(ReplaceOne({"_id": entity["_id"]}, {**entity, "synced_at": now}, upsert=True))
+                stats["changed"] += 1
+        for entity_id in existing.keys() - seen:
+            operations.append(DeleteOne({"_id": entity_id}))
+            stats["deleted"] += 1
+
+        if dry_run:
+            return stats
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        state: Dict[str, Any] = {"synced_at": now, "entities": len(entities)}
+        previous = await self.get_state()
+        if operations or not previous or not previous.get("version"):
+            # Workers reload their snapshot when the version changes
+            state["version"] = uuid.uuid4().hex
+        await self.collection.update_one({"_id": STATE_ID}, {"$set": state}, upsert=True)
+        return stats
+
+    async def try_lock(self, owner: str, seconds: float) -> bool:
+        """Take the sync lock for `seconds` unless another worker holds it."""
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"_id": LOCK_ID, "$or": [{"locked_until": {"$lt": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "locked_until": now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+
+SyncCallback = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class WorkspaceSnapshotStore:
+    """The process-wide in-memory snapshot, kept current by a background task."""
+
+    label = "workspace snapshot"
+
+    def __init__(self):
+        self.snapshot: Optional[WorkspaceSnapshot] = None
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.syncs = 0
+        self.sync_failures = 0
+        self.last_sync: Optional[Dict[str, Any]] = None
+        self.last_load_ms: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.snapshot is not None and len(self.snapshot) > 0
+
+    def repository(self) -> WorkspaceRepository:
+        return WorkspaceRepository()
+
+    async def reload(self, repository: Optional[WorkspaceRepository] = None) -> None:
+        started = time.perf_counter()
+        self.snapshot = await (repository or self.repository()).load()
+        self.loads += 1
+        self.last_load_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"🗂️ ClickUp {self.label} loaded ({len(self.snapshot)} entries, {self.last_load_ms} ms)")
+
+    async def refresh(self, sync: Optional[SyncCallback], interval: float) -> None:
+        """Run the sync if this worker gets the lock, then reload the snapshot if it changed."""
+        repository = self.repository()
+        if sync is not None and await repository.try_lock(self.owner, interval * 0.9):
+            try:
+                # Agent tool calls share the ClickUp rate limit and go first
+                with priority(BACKGROUND):
+                    self.last_sync = await sync()
+                self.syncs += 1
+            except Exception as e:
+                self.sync_failures += 1
+                logger.error(f"❌ ClickUp {self.label} sync failed: {e}", exc_info=True)
+        state = await repository.get_state()
+        version = state.get("version") if state else None
+        if self.snapshot is None or version != self.snapshot.version:
+            await self.reload(repository)
+
+    async def start(self, sync: Optional[SyncCallback], interval: float) -> None:
+        """Load the snapshot now and keep it fresh every `interval` seconds (0: load once)."""
+        await self.repository().ensure_indexes()
+        if interval <= 0:
+            await self.reload()
+            return
+
+        async def loop() -> None:
+            while True:
+                try:
+                    await self.refresh(sync, interval)
+                except Exception as e:
+                    logger.error(f"❌ ClickUp {self.label} refresh failed: {e}")
+                await asyncio.sleep(interval)
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entities": len(self.snapshot) if self.snapshot is not None else 0,
+            "version": self.snapshot.version if self.snapshot is not None else None,
+            "synced_at": self.snapshot.synced_at if self.snapshot is not None else None,
+            "loads": self.loads,
+            "last_load_ms": self.last_load_ms,
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "last_sync": self.last_sync,
+        }
+
+
+workspace_snapshot = WorkspaceSnapshotStore()
@@ -1,9 +1,13 @@
+import importlib.util
 import logging
+import threading
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
-from pymongo import AsyncMongoClient
+from typing import Optional, Dict, Any, List
+from pymongo import AsyncMongoClient, ReadPreference, WriteConcern
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.monitoring import ConnectionPoolListener
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +33,346 @@ class DatabaseSettings(BaseSettings):
         env="AGENT_SESSIONS_COLLECTION",
         description="Collection name for agent sessions"
     )
+    message_blobs_collection: str = Field(
+        default="message_blobs",
+        env="MESSAGE_BLOBS_COLLECTION",
+        description="Collection holding deduplicated message payloads"
+    )
+    codec_dictionaries_collection: str = Field(
+        default="codec_dictionaries",
+        env="CODEC_DICTIONARIES_COLLECTION",
+        description="Collection holding the zstd dictionaries used by the message codec"
+    )
+    usage_rollups_collection: str = Field(
+        default="usage_rollups",
+        env="USAGE_ROLLUPS_COLLECTION",
+        description="Collection holding hourly token usage per agent, model and user"
+    )
     message_history_limit: Optional[int] = Field(
         default=10,
         env="MESSAGE_HISTORY_LIMIT",
         description="Maximum number of messages to send to the agent (0 for unlimited)"
     )
+    trusted_reads: bool = Field(
+        default=False,
+        env="TRUSTED_READS",
+        description="Build session models from stored documents without validating them (see benchmarks/hydration_benchmark.py)"
+    )
+    ensure_indexes_on_startup: bool = Field(
+        default=True,
+        env="ENSURE_INDEXES_ON_STARTUP",
+        description="Create the repositories' declared indexes when connecting"
+    )
+    session_ttl_days: Optional[int] = Field(
+        default=None,
+        env="SESSION_TTL_DAYS",
+        description="Expire sessions and raw messages not updated for this many days (unset to keep forever)"
+    )
+    page_token_secret: Optional[str] = Field(
+        default=None,
+        env="PAGE_TOKEN_SECRET",
+        description="HMAC key signing page tokens and export checkpoints (default: EXPORT_API_TOKEN; unsigned when neither is set)"
+    )
+    
+    # Message payload compression
+    message_compression: bool = Field(
+        default=False,
+        env="MESSAGE_COMPRESSION",
+        description="Store large message parts as zstd-compressed binary"
+    )
+    message_compression_threshold: int = Field(
+        default=4096,
+        env="MESSAGE_COMPRESSION_THRESHOLD",
+        description="Minimum serialized size in bytes of a part before it is compressed"
+    )
+    message_compression_level: int = Field(
+        default=3,
+        env="MESSAGE_COMPRESSION_LEVEL",
+        description="zstd compression level"
+    )
+    raw_messages_format: str = Field(
+        default="document",
+        env="RAW_MESSAGES_FORMAT",
+        description="'document' stores each message as a BSON sub-document, 'json' as JSON bytes (faster validate_json reads, but opaque to MongoDB queries on messages.*); reads accept both"
+    )
+    message_dedup: bool = Field(
+        default=False,
+        env="MESSAGE_DEDUP",
+        description="Store large system prompts and tool returns once, referenced by content hash"
+    )
+    message_dedup_threshold: int = Field(
+        default=2048,
+        env="MESSAGE_DEDUP_THRESHOLD",
+        description="Minimum serialized size in bytes of a system prompt / tool return before it is deduplicated"
+    )
+    
+    # Session history cache
+    session_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        env="SESSION_CACHE_MAX_BYTES",
+        description="Per-worker budget of the session history cache in bytes (0 disables it)"
+    )
+    session_cache_invalidation: str = Field(
+        default="version",
+        env="SESSION_CACHE_INVALIDATION",
+        description="'version' checks the stored version on each read, 'change_stream' listens for other workers' writes (replica set only)"
+    )
+    
+    # Write-behind persistence
+    write_behind: bool = Field(
+        default=False,
+        env="WRITE_BEHIND",
+        description="Persist agent runs in the background instead of before answering"
+    )
+    write_behind_max_pending: int = Field(
+        default=1000,
+        env="WRITE_BEHIND_MAX_PENDING",
+        description="Maximum number of sessions waiting to be written before callers are slowed down"
+    )
+    write_behind_batch_size: int = Field(
+        default=50,
+        env="WRITE_BEHIND_BATCH_SIZE",
+        description="Number of sessions written concurrently by the background writer"
+    )
+    write_behind_spool_path: Optional[str] = Field(
+        default=None,
+        env="WRITE_BEHIND_SPOOL_PATH",
+        description="Base path of the local files keeping pending runs across crashes, one per worker (<path>.<pid>; unset: memory only)"
+    )
+    write_behind_fsync: bool = Field(
+        default=True,
+        env="WRITE_BEHIND_FSYNC",
+        description="fsync the spool file after each appended run"
+    )
+    
+    # Hot/cold tiering
+    session_archive_collection: str = Field(
+        default="session_archive",
+        env="SESSION_ARCHIVE_COLLECTION",
+        description="Collection holding compressed archives of idle sessions"
+    )
+    archive_after_days: Optional[int] = Field(
+        default=None,
+        env="ARCHIVE_AFTER_DAYS",
+        description="Default idle time in days after which the archive job moves a session to the archive"
+    )
+    archive_compression_level: int = Field(
+        default=10,
+        env="ARCHIVE_COMPRESSION_LEVEL",
+        description="zstd compression level of archived sessions"
+    )
+    
+    # Model calls
+    model_hedging: bool = Field(
+        default=False,
+        env="MODEL_HEDGING",
+        description="Send a second model request when the first is slower than MODEL_HEDGE_PERCENTILE of recent requests"
+    )
+    model_hedge_percentile: float = Field(
+        default=95.0,
+        env="MODEL_HEDGE_PERCENTILE",
+        description="Percentile of recent model latencies after which a request is hedged"
+    )
+    model_hedge_min_delay_ms: int = Field(
+        default=500,
+        env="MODEL_HEDGE_MIN_DELAY_MS",
+        description="Lower bound of the hedge delay"
+    )
+    model_hedge_initial_delay_ms: int = Field(
+        default=5000,
+        env="MODEL_HEDGE_INITIAL_DELAY_MS",
+        description="Hedge delay used until enough latencies have been observed"
+    )
+    model_fallback: Optional[str] = Field(
+        default=None,
+        env="MODEL_FALLBACK",
+        description="Model receiving hedged requests, e.g. 'openai:gpt-4.1-mini' (unset: the same model)"
+    )
+    model_max_retries: int = Field(
+        default=0,
+        env="MODEL_MAX_RETRIES",
+        description="Retries of a model request failing with a transient error (429, 5xx, timeout, connection)"
+    )
+    model_retry_base_delay_ms: int = Field(
+        default=500,
+        env="MODEL_RETRY_BASE_DELAY_MS",
+        description="Base of the jittered exponential backoff between retries"
+    )
+    
+    # Tool selection
+    tool_selection: bool = Field(
+        default=True,
+        env="TOOL_SELECTION",
+        description="Send the model only the tools relevant to each turn instead of every MCP and native tool schema"
+    )
+    tool_selection_max_tools: int = Field(
+        default=12,
+        env="TOOL_SELECTION_MAX_TOOLS",
+        description="Tools picked by relevance per step, on top of the always available and recently used ones"
+    )
+    tool_selection_history_turns: int = Field(
+        default=2,
+        env="TOOL_SELECTION_HISTORY_TURNS",
+        description="Previous turns whose prompts and tool calls count in the selection"
+    )
+    tool_selection_always: str = Field(
+        default="get_current_datetime,resolve_clickup_ids,search_clickup_tasks",
+        env="TOOL_SELECTION_ALWAYS",
+        description="Comma-separated tools offered on every step"
+    )
+    
+    # Intent fast path
+    intent_fast_path: bool = Field(
+        default=True,
+        env="INTENT_FAST_PATH",
+        description="Answer recognized simple commands by calling their tool directly, without the model"
+    )
+    intent_fast_path_intents: str = Field(
+        default="workspace_hierarchy,tasks_due_today,current_datetime",
+        env="INTENT_FAST_PATH_INTENTS",
+        description="Comma-separated intents answered without the model"
+    )
+    user_timezone: str = Field(
+        default="UTC",
+        env="USER_TIMEZONE",
+        description="IANA time zone of the chat users: 'today' and the days of due date filters are dates in this zone"
+    )
+    
+    # ClickUp API (rate limiting of tool calls, workspace snapshot)
+    clickup_rate_limit_per_minute: float = Field(
+        default=100,
+        env="CLICKUP_RATE_LIMIT_PER_MINUTE",
+        description="ClickUp requests per minute allowed for the API token, shared by all workers (0 disables limiting)"
+    )
+    clickup_rate_limit_burst: int = Field(
+        default=20,
+        env="CLICKUP_RATE_LIMIT_BURST",
+        description="Maximum number of tool calls sent back to back when the bucket is full"
+    )
+    clickup_rate_limit_reserve: int = Field(
+        default=5,
+        env="CLICKUP_RATE_LIMIT_RESERVE",
+        description="Tokens kept for interactive requests: batch and background calls wait while the bucket holds fewer"
+    )
+    clickup_rate_limit_backend: str = Field(
+        default="mongo",
+        env="CLICKUP_RATE_LIMIT_BACKEND",
+        description="'mongo' shares the bucket between workers through MongoDB, 'local' limits each process on its own"
+    )
+    clickup_tool_backend: str = Field(
+        default="mcp",
+        env="CLICKUP_TOOL_BACKEND",
+        description="'mcp' runs ClickUp tools through the Node MCP server, 'native' calls the API in process for the most used operations"
+    )
+    clickup_workspace_collection: str = Field(
+        default="clickup_workspace",
+        env="CLICKUP_WORKSPACE_COLLECTION",
+        description="Collection holding the synced ClickUp hierarchy (spaces, folders, lists, members)"
+    )
+    clickup_sync_interval_seconds: int = Field(
+        default=900,
+        env="CLICKUP_SYNC_INTERVAL_SECONDS",
+        description="Refresh period of the workspace snapshot; one worker syncs it from ClickUp, all reload it (0: load once at startup)"
+    )
+    clickup_tasks_collection: str = Field(
+        default="clickup_tasks",
+        env="CLICKUP_TASKS_COLLECTION",
+        description="Collection holding the synced ClickUp tasks the local search index is built from"
+    )
+    clickup_task_sync_interval_seconds: int = Field(
+        default=600,
+        env="CLICKUP_TASK_SYNC_INTERVAL_SECONDS",
+        description="Refresh period of the task search index; one worker syncs the updated tasks, all rebuild their index (0: load once at startup, -1: disable task search)"
+    )
+    clickup_search_vector_dimensions: int = Field(
+        default=128,
+        env="CLICKUP_SEARCH_VECTOR_DIMENSIONS",
+        description="Size of the hashed character-trigram vectors blended into task search scores (0 disables vector similarity)"
+    )
+    clickup_search_vector_weight: float = Field(
+        default=0.3,
+        env="CLICKUP_SEARCH_VECTOR_WEIGHT",
+        description="Share of the vector similarity in task search scores, the rest being the BM25 full-text score"
+    )
+    rate_limits_collection: str = Field(
+        default="rate_limits",
+        env="RATE_LIMITS_COLLECTION",
+        description="Collection holding the shared token buckets"
+    )
+    
+    # Client pool and wire settings
+    mongo_max_pool_size: int = Field(
+        default=100,
+        env="MONGO_MAX_POOL_SIZE",
+        description="Maximum number of connections per server"
+    )
+    mongo_min_pool_size: int = Field(
+        default=0,
+        env="MONGO_MIN_POOL_SIZE",
+        description="Number of connections kept open per server even when idle"
+    )
+    mongo_max_idle_time_ms: Optional[int] = Field(
+        default=None,
+        env="MONGO_MAX_IDLE_TIME_MS",
+        description="Close pooled connections idle for longer than this"
+    )
+    mongo_wait_queue_timeout_ms: Optional[int] = Field(
+        default=None,
+        env="MONGO_WAIT_QUEUE_TIMEOUT_MS",
+        description="How long an operation waits for a free pooled connection before failing"
+    )
+    mongo_server_selection_timeout_ms: int = Field(
+        default=30000,
+        env="MONGO_SERVER_SELECTION_TIMEOUT_MS",
+        description="How long to wait for a suitable server before failing"
+    )
+    mongo_connect_timeout_ms: int = Field(
+        default=20000,
+        env="MONGO_CONNECT_TIMEOUT_MS",
+        description="Timeout for establishing a new connection"
+    )
+    mongo_compressors: str = Field(
+        default="",
+        env="MONGO_COMPRESSORS",
+        description="Comma-separated wire compressors in order of preference (zstd, snappy, zlib)"
+    )
+    mongo_zlib_compression_level: Optional[int] = Field(
+        default=None,
+        env="MONGO_ZLIB_COMPRESSION_LEVEL",
+        description="zlib level (-1 to 9) when zlib wire compression is negotiated"
+    )
+    
+    # Per-collection durability / routing
+    raw_messages_write_concern: str = Field(
+        default="majority",
+        env="RAW_MESSAGES_WRITE_CONCERN",
+        description="Write concern for raw messages ('majority' or a number of nodes)"
+    )
+    agent_sessions_write_concern: str = Field(
+        default="majority",
+        env="AGENT_SESSIONS_WRITE_CONCERN",
+        description="Write concern for agent sessions ('majority' or a number of nodes)"
+    )
+    telemetry_write_concern: str = Field(
+        default="1",
+        env="TELEMETRY_WRITE_CONCERN",
+        description="Write concern for telemetry-like collections (usage, metrics, caches)"
+    )
+    raw_messages_read_preference: str = Field(
+        default="primary",
+        env="RAW_MESSAGES_READ_PREFERENCE",
+        description="Read preference for raw messages"
+    )
+    agent_sessions_read_preference: str = Field(
+        default="primary",
+        env="AGENT_SESSIONS_READ_PREFERENCE",
+        description="Read preference for agent sessions"
+    )
+    telemetry_read_preference: str = Field(
+        default="primaryPreferred",
+        env="TELEMETRY_READ_PREFERENCE",
+        description="Read preference for telemetry-like collections"
+    )
     
     class Config:
         env_file = ".env"
@@ -41,6 +380,144 @@ class DatabaseSettings(BaseSettings):
         extra = "ignore"
 
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primarypreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondarypreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# Wire compressors and the module pymongo needs to negotiate them
+COMPRESSOR_MODULES = {
+    "zstd": "zstandard",
+    "snappy": "snappy",
+    "zlib": "zlib",
+}
+
+
+def parse_write_concern(value: str) -> WriteConcern:
+    """Build a WriteConcern from a setting such as 'majority', '1' or '0'."""
+    value = value.strip()
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+
+def parse_read_preference(value: str):
+    try:
+        return READ_PREFERENCES[value.strip().replace("_", "").lower()]
+    except KeyError:
+        raise ValueError(f"Unknown read preference: {value}")
+
+
+def available_compressors(value: str) -> List[str]:
+    """Keep the configured compressors whose Python support is installed."""
+    compressors = []
+    for name in [c.strip().lower() for c in value.split(",") if c.strip()]:
+        module = COMPRESSOR_MODULES.get(name)
+        if module is None:
+            logger.warning(f"Unknown MongoDB compressor ignored: {name}")
+        elif importlib.util.find_spec(module) is None:
+            logger.warning(f"MongoDB compressor {name} requires the '{module}' package, ignoring it")
+        else:
+            compressors.append(name)
+    return compressors
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Collects connection pool counters from pymongo's CMAP events.
+    
+    pymongo emits the events from its own threads, hence the lock.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        self.pools: Dict[str, Dict[str, Any]] = {}
+    
+    def _pool(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {
+                "open": 0,
+                "checked_out": 0,
+                "max_checked_out": 0,
+                "created": 0,
+                "closed": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "checkout_wait_ms_total": 0.0,
+                "checkout_wait_ms_max": 0.0,
+                "cleared": 0,
+            }
+        return pool
+    
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["cleared"] += 1
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["created"] += 1
+            pool["open"] += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["closed"] += 1
+            pool["open"] = max(0, pool["open"] - 1)
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._pool(event.address)["checkout_failures"] += 1
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checkouts"] += 1
+            pool["checked_out"] += 1
+            pool["max_checked_out"] = max(pool["max_checked_out"], pool["checked_out"])
+            duration = getattr(event, "duration", None)
+            if duration is not None:
+                wait_ms = duration * 1000
+                pool["checkout_wait_ms_total"] += wait_ms
+                pool["checkout_wait_ms_max"] = max(pool["checkout_wait_ms_max"], wait_ms)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+    
+    def snapshot(self, max_pool_size: int) -> Dict[str, Any]:
+        with self._lock:
+            pools = {}
+            for address, pool in self.pools.items():
+                stats = dict(pool)
+                stats["utilization"] = round(pool["checked_out"] / max_pool_size, 4) if max_pool_size else None
+                stats["checkout_wait_ms_avg"] = round(pool["checkout_wait_ms_total"] / pool["checkouts"], 3) if pool["checkouts"] else 0.0
+                pools[address] = stats
+            return {"max_pool_size": max_pool_size, "pools": pools}
+
+
 class DatabaseConnection:
     _instance: Optional['DatabaseConnection'] = None
     _client: Optional[AsyncMongoClient] = None
@@ -53,14 +530,36 @@ class DatabaseConnection:
     
     def __init__(self):
         self.settings = DatabaseSettings()
+        self.pool_stats = PoolStatsListener()
         logger.debug(f"Database settings initialized: {self.settings.mongodb_url}")
     
+    def _client_options(self) -> Dict[str, Any]:
+        settings = self.settings
+        options: Dict[str, Any] = {
+            "maxPoolSize": settings.mongo_max_pool_size,
+            "minPoolSize": settings.mongo_min_pool_size,
+            "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+            "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+            "event_listeners": [self.pool_stats],
+        }
+        if settings.mongo_max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = settings.mongo_max_idle_time_ms
+        if settings.mongo_wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = settings.mongo_wait_queue_timeout_ms
+        compressors = available_compressors(settings.mongo_compressors)
+        if compressors:
+            options["compressors"] = ",".join(compressors)
+            if "zlib" in compressors and settings.mongo_zlib_compression_level is not None:
+                options["zlibCompressionLevel"] = settings.mongo_zlib_compression_level
+        return options
+    
     async def connect(self) -> None:
         """Connect to MongoDB"""
         if self._client is None:
             try:
                 logger.debug("DEBUG: Creating AsyncMongoClient")
-                self._client = AsyncMongoClient(self.settings.mongodb_url)
+                self.pool_stats.reset()
+                self._client = AsyncMongoClient(self.settings.mongodb_url, **self._client_options())
                 logger.debug("DEBUG: Getting database reference")
                 self._database = self._client[self.settings.database_name]
                 
@@ -97,13 +596,68 @@ class DatabaseConnection:
             raise RuntimeError("Database not connected. Call connect() first.")
         return self._database
     
+    def get_collection(
+        self,
+        name: str,
+        write_concern: Optional[str] = None,
+        read_preference: Optional[str] = None
+    ) -> AsyncCollection:
+        """Get a collection with its own write concern / read preference."""
+        return self.database.get_collection(
+            name,
+            write_concern=parse_write_concern(write_concern) if write_concern else None,
+            read_preference=parse_read_preference(read_preference) if read_preference else None,
+        )
+    
+    @property
+    def message_blobs_collection(self):
+        return self.get_collection(
+            self.settings.message_blobs_collection,
+            write_concern=self.settings.raw_messages_write_concern,
+            read_preference=self.settings.raw_messages_read_preference,
+        )
+    
+    @property
+    def session_archive_collection(self):
+        return self.get_collection(
+            self.settings.session_archive_collection,
+            write_concern=self.settings.raw_messages_write_concern,
+            read_preference=self.settings.raw_messages_read_preference,
+        )
+    
+    @property
+    def codec_dictionaries_collection(self):
+        return self.database[self.settings.codec_dictionaries_collection]
+    
+    def telemetry_collection(self, name: str) -> AsyncCollection:
+        """Collections where losing a write on failover is acceptable (usage, metrics, caches)."""
+        return self.get_collection(
+            name,
+            write_concern=self.settings.telemetry_write_concern,
+            read_preference=self.settings.telemetry_read_preference,
+        )
+    
     @property
     def raw_messages_collection(self):
-        return self.database[self.settings.raw_messages_collection]
+        return self.get_collection(
+            self.settings.raw_messages_collection,
+            write_concern=self.settings.raw_messages_write_concern,
+            read_preference=self.settings.raw_messages_read_preference,
+        )
     
     @property
     def agent_sessions_collection(self):
-        return self.database[self.settings.agent_sessions_collection]
+        return self.get_collection(
+            self.settings.agent_sessions_collection,
+            write_concern=self.settings.agent_sessions_write_concern,
+            read_preference=self.settings.agent_sessions_read_preference,
+        )
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool utilization as seen by this process."""
+        stats = self.pool_stats.snapshot(self.settings.mongo_max_pool_size)
+        stats["connected"] = self._client is not None
+        return stats
 
 
 db_connection = DatabaseConnection()
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Move sessions idle for a number of days to the archive collection.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from ..config.database import db_connection
+from ..repositories.archive import SessionArchiveRepository, ARCHIVED_FIELD, working_set_stats
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_idle_sessions(
+    idle_days: Optional[int] = None,
+    limit: Optional[int] = None,
+    concurrency: int = 8,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """Archive sessions not updated for `idle_days` and report the working set before and after.
+    
+    Candidates are found through the `updated_at` index of agent_sessions.
+    """
+    idle_days = idle_days or db_connection.settings.archive_after_days
+    if not idle_days:
+        raise ValueError("No idle period given (--idle-days or ARCHIVE_AFTER_DAYS)")
+    
+    cutoff = datetime.utcnow() - timedelta(days=idle_days)
+    archive = SessionArchiveRepository()
+    result: Dict[str, Any] = {
+        "idle_days": idle_days,
+        "cutoff": cutoff,
+        "candidates": 0,
+        "archived": 0,
+        "skipped": 0,
+        "raw_bytes": 0,
+        "archived_bytes": 0,
+        "working_set_before": await working_set_stats(),
+    }
+    
+    cursor = db_connection.agent_sessions_collection.find(
+        {"updated_at": {"$lt": cutoff}, ARCHIVED_FIELD: None},
+        projection={"_id": 0, "session_id": 1},
+        limit=limit or 0
+    )
+    
+    async def archive_one(session_id: str) -> None:
+        try:
+            sizes = await archive.archive_session(session_id)
+        except Exception as e:
+            logger.error(f"Failed to archive session {session_id}: {e}")
+            sizes = None
+        if sizes is None:
+            result["skipped"] += 1
+        else:
+            result["archived"] += 1
+            result["raw_bytes"] += sizes["raw_size"]
+            result["archived_bytes"] += sizes["archived_size"]
+    
+    # At most `concurrency` sessions in flight: the cursor is only read as they complete
+    in_flight = set()
+    async for document in cursor:
+        result["candidates"] += 1
+        if dry_run:
+            continue
+        if len(in_flight) >= concurrency:
+            _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        in_flight.add(asyncio.create_task(archive_one(document["session_id"])))
+    if in_flight:
+        await asyncio.wait(in_flight)
+    
+    result["working_set_after"] = await working_set_stats()
+    logger.info(
+        f"Archived {result['archived']}/{result['candidates']} sessions idle for {idle_days} days "
+        f"({result['raw_bytes']} -> {result['archived_bytes']} bytes)"
+    )
+    return result
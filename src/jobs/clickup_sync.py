@@ -0,0 +1,178 @@
+"""
+Mirror the ClickUp workspace hierarchy (spaces, folders, lists, members and
+statuses) and its tasks into MongoDB.
+
+The hierarchy is fetched with one call for the team, one for its spaces and
+two per space, run concurrently. Only the entities whose content changed since
+the previous sync are written, and the ones that no longer exist are deleted.
+
+Tasks are fetched 100 per page, only those updated since the last sync except
+for a daily full sync that also catches deleted and archived tasks.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ..clickup.client import ClickUpClient, create_clickup_client
+from ..clickup.search import TaskRepository
+from ..clickup.snapshot import WorkspaceRepository
+
+logger = logging.getLogger(__name__)
+
+FULL_TASK_SYNC_EVERY = timedelta(hours=24)
+DESCRIPTION_CHARS = 2000
+
+
+def _statuses(item: Dict[str, Any]) -> List[str]:
+    statuses = sorted(item.get("statuses") or [], key=lambda status: status.get("orderindex", 0))
+    return [status["status"] for status in statuses if status.get("status")]
+
+
+def _list_entity(item: Dict[str, Any], space: Dict[str, Any], folder_id: Optional[str]) -> Dict[str, Any]:
+    # Lists inherit the statuses of their space unless they override them
+    statuses = _statuses(item) if item.get("override_statuses") and item.get("statuses") else _statuses(space)
+    return {
+        "kind": "list",
+        "id": str(item["id"]),
+        "name": item.get("name"),
+        "space_id": str(space["id"]),
+        "folder_id": folder_id,
+        "statuses": statuses,
+    }
+
+
+async def fetch_hierarchy(client: ClickUpClient, team_id: str, concurrency: int = 8) -> List[Dict[str, Any]]:
+    """All entities of a workspace, as stored in the snapshot collection."""
+    entities: List[Dict[str, Any]] = []
+    teams = await client.get_teams()
+    team = next((team for team in teams if str(team.get("id")) == str(team_id)), None)
+    if team is None:
+        raise ValueError(f"ClickUp team {team_id} is not accessible with this API token")
+    for member in team.get("members", []):
+        user = member.get("user") or {}
+        if user.get("id") is None:
+            continue
+        entities.append({
+            "kind": "member",
+            "id": str(user["id"]),
+            "name": user.get("username") or user.get("email"),
+            "email": user.get("email"),
+        })
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_space(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            folders, lists = await asyncio.gather(
+                client.get_folders(space["id"]),
+                client.get_folderless_lists(space["id"])
+            )
+        space_entities = [{
+            "kind": "space",
+            "id": str(space["id"]),
+            "name": space.get("name"),
+            "statuses": _statuses(space),
+        }]
+        for folder in folders:
+            space_entities.append({
+                "kind": "folder",
+                "id": str(folder["id"]),
+                "name": folder.get("name"),
+                "space_id": str(space["id"]),
+            })
+            space_entities.extend(_list_entity(item, space, str(folder["id"])) for item in folder.get("lists", []))
+        space_entities.extend(_list_entity(item, space, None) for item in lists)
+        return space_entities
+
+    spaces = await client.get_spaces(team_id)
+    for space_entities in await asyncio.gather(*(fetch_space(space) for space in spaces)):
+        entities.extend(space_entities)
+    return entities
+
+
+async def sync_workspace(team_id: Optional[str] = None, concurrency: int = 8, dry_run: bool = False) -> Dict[str, Any]:
+    team_id = team_id or os.environ.get("CLICKUP_TEAM_ID")
+    if not team_id:
+        raise ValueError("❌ CLICKUP_TEAM_ID environment variable is not set")
+    started = time.perf_counter()
+    async with create_clickup_client() as client:
+        entities = await fetch_hierarchy(client, team_id, concurrency)
+        requests = client.requests
+    fetched = time.perf_counter()
+    stats = await WorkspaceRepository().apply(entities, dry_run=dry_run)
+    stats.update({
+        "team_id": team_id,
+        "api_requests": requests,
+        "fetch_ms": round((fetched - started) * 1000, 1),
+        "write_ms": round((time.perf_counter() - fetched) * 1000, 1),
+        "dry_run": dry_run,
+    })
+    logger.info(f"🗂️ ClickUp workspace synced: {stats}")
+    return stats
+
+
+def _task_document(item: Dict[str, Any]) -> Dict[str, Any]:
+    status = item.get("status") or {}
+    task_list = item.get("list") or {}
+    return {
+        "id": str(item["id"]),
+        "name": item.get("name"),
+        "description": (item.get("text_content") or item.get("description") or "")[:DESCRIPTION_CHARS],
+        "status": status.get("status"),
+        "list_id": str(task_list["id"]) if task_list.get("id") else None,
+        "list_name": task_list.get("name"),
+        "space_id": str((item.get("space") or {}).get("id") or "") or None,
+        "assignees": [user.get("username") or user.get("email") for user in item.get("assignees") or []],
+        "tags": [tag.get("name") for tag in item.get("tags") or [] if tag.get("name")],
+        "due_date": int(item["due_date"]) if item.get("due_date") else None,
+        "date_updated": int(item["date_updated"]) if item.get("date_updated") else None,
+        "url": item.get("url"),
+    }
+
+
+async def fetch_tasks(client: ClickUpClient, team_id: str, date_updated_gt: Optional[int] = None, concurrency: int = 4) -> List[Dict[str, Any]]:
+    """Tasks of a workspace (updated after `date_updated_gt`), fetching `concurrency` pages at a time."""
+    tasks: Dict[str, Dict[str, Any]] = {}
+    page, window = 0, 1
+    while True:
+        pages = await asyncio.gather(*(
+            client.get_team_tasks(team_id, page + offset, date_updated_gt) for offset in range(window)
+        ))
+        for result in pages:
+            for item in result.get("tasks", []):
+                # A task updated during the sync can move to another page: keep one copy
+                tasks[str(item["id"])] = _task_document(item)
+        if any(result.get("last_page") or not result.get("tasks") for result in pages):
+            break
+        # Incremental syncs usually fit in the first page; fetch the next ones concurrently
+        page, window = page + window, concurrency
+    return list(tasks.values())
+
+
+async def sync_tasks(team_id: Optional[str] = None, concurrency: int = 4, full: Optional[bool] = None, dry_run: bool = False) -> Dict[str, Any]:
+    team_id = team_id or os.environ.get("CLICKUP_TEAM_ID")
+    if not team_id:
+        raise ValueError("❌ CLICKUP_TEAM_ID environment variable is not set")
+    repository = TaskRepository()
+    state = await repository.get_state() or {}
+    if full is None:
+        full_synced_at = state.get("full_synced_at")
+        full = not state.get("last_updated") or full_synced_at is None or datetime.utcnow() - full_synced_at > FULL_TASK_SYNC_EVERY
+    started = time.perf_counter()
+    async with create_clickup_client() as client:
+        tasks = await fetch_tasks(client, team_id, None if full else state.get("last_updated"), concurrency)
+        requests = client.requests
+    fetched = time.perf_counter()
+    stats = await repository.apply(tasks, full=full, dry_run=dry_run)
+    stats.update({
+        "team_id": team_id,
+        "api_requests": requests,
+        "fetch_ms": round((fetched - started) * 1000, 1),
+        "write_ms": round((time.perf_counter() - fetched) * 1000, 1),
+        "dry_run": dry_run,
+    })
+    logger.info(f"🔎 ClickUp tasks synced: {stats}")
+    return stats
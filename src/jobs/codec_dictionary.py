@@ -0,0 +1,49 @@
+"""
+Train a zstd dictionary for the message codec from stored conversations.
+"""
+import logging
+from typing import Dict, Any
+
+from ..config.database import db_connection
+from ..repositories.codecs import MessageCodec, DEFAULT_DICTIONARY_SIZE
+from ..repositories.messages import ModelMessageRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def train_codec_dictionary(
+    sessions: int = 500,
+    dictionary_size: int = DEFAULT_DICTIONARY_SIZE,
+    min_sample_size: int = 256,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """Sample stored sessions, train a dictionary on their large part payloads and store it.
+    
+    The new dictionary becomes the active one on the next startup of each worker.
+    """
+    repo = ModelMessageRepository()
+    samples = []
+    cursor = await repo.collection.aggregate([
+        {"$sample": {"size": sessions}},
+        {"$project": {"messages": 1}},
+    ])
+    async for document in cursor:
+        messages_data = await repo.decode_messages(document.get("messages", []))
+        samples.extend(MessageCodec.training_samples(messages_data, min_sample_size))
+    
+    if len(samples) < 10:
+        raise RuntimeError(f"Not enough samples to train a dictionary ({len(samples)} found)")
+    
+    dictionary = MessageCodec.train_dictionary(samples, dictionary_size)
+    result = {
+        "samples": len(samples),
+        "sample_bytes": sum(len(sample) for sample in samples),
+        "dictionary_bytes": len(dictionary),
+        "dictionary_id": None,
+    }
+    if not dry_run:
+        result["dictionary_id"] = await MessageCodec.store_dictionary(
+            db_connection.codec_dictionaries_collection, dictionary, len(samples)
+        )
+        logger.info(f"Stored codec dictionary {result['dictionary_id']} trained on {len(samples)} samples")
+    return result
@@ -0,0 +1,196 @@
+"""
+Regenerate the agent_sessions summaries (simple messages, model, token usage)
+from the conversations stored in raw_messages.
+
+raw_messages is streamed in `_id` order; each batch is turned into JSON in
+the main process (storage encodings need the database) and validation plus
+MessageTransformer work is fanned out to a process pool. Results are written
+with unordered bulk writes while the next batch is being processed. After
+every written batch the position is saved, so an interrupted rebuild resumes
+where it stopped.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..config.database import db_connection
+from ..repositories.messages import ModelMessageRepository
+from ..repositories.pagination import encode_token, decode_token, keyset_filter
+from ..utils.message_transformer import MessageTransformer
+
+logger = logging.getLogger(__name__)
+
+REBUILD_SORT = [("_id", 1)]
+DUPLICATE_KEY = 11000
+
+
+def summarize_conversations(conversations: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """Process pool worker: validate each conversation and summarize it for agent_sessions."""
+    results = []
+    for session_id, payload in conversations:
+        try:
+            transformed = MessageTransformer.transform(ModelMessagesTypeAdapter.validate_json(payload))
+            results.append((session_id, {
+                "messages": [message.model_dump(mode="json") for message in transformed.simple_messages],
+                "model": transformed.model_name,
+                "token_usage": transformed.token_usage.model_dump() if transformed.token_usage else None,
+            }, None))
+        except Exception as e:
+            results.append((session_id, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def read_checkpoint(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def write_checkpoint(path: Optional[str], token: Optional[str]) -> None:
+    if path and token:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(token)
+
+
+class SessionRebuilder:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_size: int = 500,
+        chunk_size: int = 25,
+        default_agent_id: str = "ClickupAgent",
+        dry_run: bool = False
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.default_agent_id = default_agent_id
+        self.dry_run = dry_run
+        self.message_repo = ModelMessageRepository()
+        self.sessions = db_connection.agent_sessions_collection
+        self.stats: Dict[str, Any] = {
+            "processed": 0, "written": 0, "skipped": 0, "failed": 0, "failed_sessions": [], "checkpoint": None,
+        }
+
+    async def _payload(self, document) -> Optional[bytes]:
+        """The conversation as a JSON array, without validating it here when it is stored as JSON."""
+        if "messages" not in document:
+            # Archived stub
+            return None
+        items = list(document["messages"])
+        if all(isinstance(item, bytes) for item in items):
+            return b"[" + b",".join(items) + b"]"
+        messages = await self.message_repo.lazy_messages(document)
+        return ModelMessagesTypeAdapter.dump_json(messages.to_list())
+
+    async def _process(self, pool: ProcessPoolExecutor, conversations: List[Tuple[str, bytes]]):
+        loop = asyncio.get_running_loop()
+        chunks = [conversations[i:i + self.chunk_size] for i in range(0, len(conversations), self.chunk_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(pool, summarize_conversations, chunk) for chunk in chunks))
+        return [result for chunk in results for result in chunk]
+
+    async def _write(self, results, started_at: datetime) -> None:
+        operations = []
+        for session_id, summary, error in results:
+            self.stats["processed"] += 1
+            if error is not None:
+                self.stats["failed"] += 1
+                if len(self.stats["failed_sessions"]) < 20:
+                    self.stats["failed_sessions"].append({"session_id": session_id, "error": error})
+                continue
+            operations.append(UpdateOne(
+                # A session updated by a live turn since the rebuild started keeps its own summary
+                {"session_id": session_id, "updated_at": {"$lt": started_at}},
+                {
+                    "$set": {**summary, "rebuilt_at": datetime.utcnow()},
+                    "$setOnInsert": {
+                        "agent_id": self.default_agent_id,
+                        "created_at": started_at,
+                        "updated_at": started_at,
+                        "raw_messages_collection": db_connection.settings.raw_messages_collection,
+                        "metadata": None,
+                    },
+                },
+                upsert=True
+            ))
+        if not operations or self.dry_run:
+            return
+        try:
+            result = await self.sessions.bulk_write(operations, ordered=False)
+            self.stats["written"] += result.modified_count + result.upserted_count
+        except BulkWriteError as e:
+            details = e.details
+            self.stats["written"] += details.get("nModified", 0) + details.get("nUpserted", 0)
+            for error in details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY:
+                    # No match because of the updated_at guard, and the upsert hit the unique session_id
+                    self.stats["skipped"] += 1
+                else:
+                    self.stats["failed"] += 1
+                    logger.error(f"Rebuild write failed: {error.get('errmsg')}")
+
+    async def run(self, checkpoint: Optional[str] = None, checkpoint_file: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        checkpoint = checkpoint or read_checkpoint(checkpoint_file)
+        query = keyset_filter(REBUILD_SORT, decode_token(checkpoint, REBUILD_SORT)) if checkpoint else {}
+        if checkpoint:
+            logger.info(f"Resuming session rebuild after checkpoint {checkpoint}")
+        total = await self.message_repo.collection.estimated_document_count()
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        cursor = self.message_repo.raw_collection.find(query).sort(REBUILD_SORT).batch_size(self.batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        # Batches being processed by the pool, written in cursor order so the checkpoint never skips one
+        in_flight: Deque[Tuple[asyncio.Task, str]] = deque()
+
+        async def drain(keep: int) -> None:
+            while len(in_flight) > keep:
+                task, token = in_flight.popleft()
+                await self._write(await task, started_at)
+                self.stats["checkpoint"] = token
+                if not self.dry_run:
+                    write_checkpoint(checkpoint_file, token)
+                elapsed = time.perf_counter() - started
+                rate = self.stats["processed"] / elapsed if elapsed else 0
+                logger.info(
+                    f"Rebuilt {self.stats['processed']}/~{total} sessions "
+                    f"({rate:.0f}/s, {self.stats['failed']} failed, {self.stats['skipped']} skipped)"
+                )
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            batch: List[Tuple[str, bytes]] = []
+            last = None
+            async with cursor:
+                async for document in cursor:
+                    last = document
+                    payload = await self._payload(document)
+                    if payload is not None:
+                        batch.append((document["session_id"], payload))
+                    if len(batch) >= self.batch_size:
+                        in_flight.append((asyncio.create_task(self._process(pool, batch)), encode_token(last, REBUILD_SORT)))
+                        batch = []
+                        # Keep the pool busy while bounding memory
+                        await drain(keep=2)
+            if last is not None:
+                token = encode_token(last, REBUILD_SORT)
+                if batch or not in_flight or in_flight[-1][1] != token:
+                    in_flight.append((asyncio.create_task(self._process(pool, batch)), token))
+            await drain(keep=0)
+
+        elapsed = time.perf_counter() - started
+        self.stats["elapsed_s"] = round(elapsed, 2)
+        self.stats["sessions_per_s"] = round(self.stats["processed"] / elapsed, 1) if elapsed else None
+        self.stats["dry_run"] = self.dry_run
+        return self.stats
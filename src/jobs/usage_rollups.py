@@ -0,0 +1,53 @@
+"""
+Build the hourly usage rollups from the conversations already stored in raw_messages.
+"""
+import logging
+import time
+from typing import Any, Dict, List
+
+from ..config.database import db_connection
+from ..repositories.messages import ModelMessageRepository
+from ..repositories.usage import UsageRollupRepository, compute_rollups
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_usage_rollups(batch_size: int = 200, dry_run: bool = False) -> Dict[str, Any]:
+    """Recompute the rollups of every stored session.
+    
+    Counters of the keys found are overwritten, so the job can be re-run; a turn
+    saved while its session is being processed may be counted twice or missed.
+    Archived sessions are skipped.
+    """
+    message_repo = ModelMessageRepository()
+    usage_repo = UsageRollupRepository()
+    result = {"sessions": 0, "messages": 0, "rollups": 0, "written": 0}
+    started = time.perf_counter()
+    
+    async def flush(sessions: List[Dict[str, Any]]) -> None:
+        agents = {session["session_id"]: session.get("agent_id") or "unknown" for session in sessions}
+        cursor = message_repo.raw_collection.find({"session_id": {"$in": list(agents)}})
+        async for document in cursor:
+            if "messages" not in document:
+                continue
+            messages = (await message_repo.lazy_messages(document)).to_list()
+            rollups = compute_rollups(messages, agents[document["session_id"]], document["session_id"])
+            result["sessions"] += 1
+            result["messages"] += len(messages)
+            result["rollups"] += len(rollups)
+            if not dry_run:
+                result["written"] += await usage_repo.replace(rollups)
+    
+    batch: List[Dict[str, Any]] = []
+    cursor = db_connection.agent_sessions_collection.find({}, projection={"_id": 0, "session_id": 1, "agent_id": 1}).batch_size(batch_size)
+    async for session in cursor:
+        batch.append(session)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+            logger.info(f"Backfilled usage of {result['sessions']} sessions")
+    if batch:
+        await flush(batch)
+    
+    result["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return result
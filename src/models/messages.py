@@ -58,6 +58,7 @@ class AgentSession(BaseModel):
     model: Optional[str] = Field(default=None, description="Model used in the session")
     token_usage: Optional[TokenUsage] = Field(default=None, description="Aggregated token usage for the session")
     metadata: Optional[Dict[str, Any]] = Field(default=None, description="Additional session metadata")
+    archived_at: Optional[datetime] = Field(default=None, description="Set while the session is moved to the archive collection")
 
     class Config:
         json_encoders = {
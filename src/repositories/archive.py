@@ -0,0 +1,185 @@
+"""
+Cold tier for idle sessions.
+
+Archiving a session compresses its raw messages document and its session
+summary into a single document of the archive collection, then shrinks both
+originals to stubs: the raw messages stub keeps `session_id` under a new
+`version`, the session stub keeps everything but the simplified messages.
+Stubs carry `archived_at`; the next read or write of the session restores it.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import bson
+from bson import Binary, CodecOptions, ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+from .indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes, ttl_seconds
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELD = "archived_at"
+RAW_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+class SessionArchiveRepository:
+    """Moves sessions between the hot collections and the archive collection."""
+
+    def __init__(self, level: Optional[int] = None):
+        self.collection: AsyncCollection = db_connection.session_archive_collection
+        self.raw_messages: AsyncCollection = db_connection.raw_messages_collection.with_options(codec_options=RAW_OPTIONS)
+        self.sessions: AsyncCollection = db_connection.agent_sessions_collection.with_options(codec_options=RAW_OPTIONS)
+        self.level = level if level is not None else db_connection.settings.archive_compression_level
+
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return [
+            IndexSpec(name="blob_refs", keys=(("blob_refs", 1),), sparse=True),
+            IndexSpec(
+                name="last_updated_at",
+                keys=(("last_updated_at", 1),),
+                expire_after_seconds=ttl_seconds(db_connection.settings.session_ttl_days)
+            ),
+        ]
+
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
+
+    def _compress(self, raw: bytes) -> Binary:
+        return Binary(zstandard.ZstdCompressor(level=self.level).compress(raw))
+
+    @staticmethod
+    def _decompress(data: bytes) -> Dict[str, Any]:
+        return bson.decode(zstandard.ZstdDecompressor().decompress(data))
+
+    async def archive_session(self, session_id: str) -> Optional[Dict[str, int]]:
+        """Archive one session. Returns its raw and archived sizes, or None when skipped.
+
+        The stubs are written conditionally on the version and update time read, so
+        a turn that lands while the session is being archived wins and the archive
+        is dropped. The raw stub gets a version of its own: writers guarded on the
+        hot document's version no longer match it.
+        """
+        if zstandard is None:
+            raise RuntimeError("Session archiving requires the 'zstandard' package")
+
+        raw_document = await self.raw_messages.find_one({"session_id": session_id, ARCHIVED_FIELD: None})
+        session_document = await self.sessions.find_one({"session_id": session_id, ARCHIVED_FIELD: None})
+        if raw_document is None or session_document is None:
+            return None
+
+        now = datetime.utcnow()
+        raw_size = len(raw_document.raw) + len(session_document.raw)
+        archive = {
+            "_id": session_id,
+            "agent_id": session_document.get("agent_id"),
+            "version": raw_document.get("version"),
+            "archived_at": now,
+            "last_updated_at": session_document.get("updated_at"),
+            "raw_messages": self._compress(raw_document.raw),
+            "agent_session": self._compress(session_document.raw),
+            "raw_size": raw_size,
+        }
+        if raw_document.get("blob_refs"):
+            # Keeps referenced blobs alive for the blob GC
+            archive["blob_refs"] = list(raw_document["blob_refs"])
+        archive["archived_size"] = len(archive["raw_messages"]) + len(archive["agent_session"])
+        await self.collection.replace_one({"_id": session_id}, archive, upsert=True)
+
+        stub = {
+            "session_id": session_id,
+            "version": str(ObjectId()),
+            "updated_at": raw_document.get("updated_at"),
+            ARCHIVED_FIELD: now,
+        }
+        result = await self.raw_messages.replace_one(
+            {"_id": raw_document["_id"], "version": raw_document.get("version")},
+            stub
+        )
+        if result.matched_count == 0:
+            logger.info(f"Session {session_id} changed while archiving, keeping it hot")
+            await self.collection.delete_one({"_id": session_id, "archived_at": now})
+            return None
+
+        result = await self.sessions.update_one(
+            {"_id": session_document["_id"], "updated_at": session_document.get("updated_at"), ARCHIVED_FIELD: None},
+            {"$set": {ARCHIVED_FIELD: now}, "$unset": {"messages": ""}}
+        )
+        if result.matched_count == 0:
+            logger.info(f"Session {session_id} summary changed while archiving, keeping it hot")
+            # Put the raw document back, unless a writer already replaced the stub
+            await self.raw_messages.replace_one({"_id": raw_document["_id"], "version": stub["version"]}, raw_document)
+            await self.collection.delete_one({"_id": session_id, "archived_at": now})
+            return None
+        return {"raw_size": raw_size, "archived_size": archive["archived_size"]}
+
+    async def load_raw_messages(self, session_id: str) -> Optional[RawBSONDocument]:
+        """The raw messages document of an archived session, read without restoring it."""
+        return (await self.load_raw_messages_many([session_id])).get(session_id)
+
+    async def load_raw_messages_many(self, session_ids: List[str]) -> Dict[str, RawBSONDocument]:
+        """The raw messages documents of archived sessions, by session id, read without restoring them."""
+        documents: Dict[str, RawBSONDocument] = {}
+        cursor = self.collection.find({"_id": {"$in": list(session_ids)}}, projection={"raw_messages": 1})
+        async for archive in cursor:
+            if zstandard is None:
+                raise RuntimeError("Reading an archived session requires the 'zstandard' package")
+            documents[archive["_id"]] = RawBSONDocument(zstandard.ZstdDecompressor().decompress(archive["raw_messages"]))
+        return documents
+
+    async def restore_session(self, session_id: str) -> bool:
+        """Bring an archived session back into the hot collections. Returns False if it is not archived."""
+        archive = await self.collection.find_one({"_id": session_id})
+        if archive is None:
+            return False
+        if zstandard is None:
+            raise RuntimeError("Restoring an archived session requires the 'zstandard' package")
+
+        raw_document = self._decompress(archive["raw_messages"])
+        session_document = self._decompress(archive["agent_session"])
+        # Only stubs are replaced: a hot document is newer than the archive
+        await self.raw_messages.replace_one({"_id": raw_document["_id"], ARCHIVED_FIELD: {"$ne": None}}, raw_document)
+        await self.sessions.replace_one({"_id": session_document["_id"], ARCHIVED_FIELD: {"$ne": None}}, session_document)
+        await self.collection.delete_one({"_id": session_id})
+        logger.info(f"♻️ Restored archived session {session_id}")
+        return True
+
+
+async def collection_stats(collection: AsyncCollection) -> Dict[str, Any]:
+    """Document count, data size and index size of a collection."""
+    stats = {"collection": collection.name, "count": 0, "size": 0, "storage_size": 0, "index_size": 0}
+    try:
+        cursor = await collection.aggregate([{"$collStats": {"storageStats": {}}}])
+        async for document in cursor:
+            storage = document.get("storageStats", {})
+            stats["count"] += storage.get("count", 0)
+            stats["size"] += storage.get("size", 0)
+            stats["storage_size"] += storage.get("storageSize", 0)
+            stats["index_size"] += storage.get("totalIndexSize", 0)
+    except Exception as e:
+        logger.warning(f"Could not read stats of {collection.name}: {e}")
+    return stats
+
+
+async def working_set_stats() -> Dict[str, Any]:
+    """Size of the hot collections (what has to stay in cache) next to the archive."""
+    hot = [
+        await collection_stats(db_connection.raw_messages_collection),
+        await collection_stats(db_connection.agent_sessions_collection),
+    ]
+    return {
+        "hot": hot,
+        "hot_bytes": sum(stats["size"] + stats["index_size"] for stats in hot),
+        "archive": await collection_stats(db_connection.session_archive_collection),
+    }
@@ -1,47 +1,67 @@
-from typing import TypeVar, Generic, Optional, List, Dict, Any
+from typing import TypeVar, Generic, Optional, List, Dict, Any, AsyncIterator
 from pymongo.asynchronous.collection import AsyncCollection
 from pydantic import BaseModel
 from datetime import datetime
 
+from .indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes
+from .pagination import Page, normalize_sort, encode_token, decode_token, keyset_filter
+from .hydration import hydrate, hydrate_many
+
 
 T = TypeVar('T', bound=BaseModel)
 
 
 class BaseRepository(Generic[T]):
-    def __init__(self, collection: AsyncCollection, model_class: type[T]):
+    def __init__(self, collection: AsyncCollection, model_class: type[T], trusted: bool = False):
         self.collection = collection
         self.model_class = model_class
+        # Trusted reads build models without validation (documents written by this service only)
+        self.trusted = trusted
+    
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        """Indexes the repository's queries rely on. Override in subclasses."""
+        return []
+    
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+    
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
+    
+    def _hydrate(self, document: Optional[Dict[str, Any]]) -> Optional[T]:
+        return hydrate(self.model_class, document, self.trusted)
+    
+    def _hydrate_many(self, documents: List[Dict[str, Any]]) -> List[T]:
+        return hydrate_many(self.model_class, documents, self.trusted)
     
     async def create(self, document: T) -> str:
-        doc_dict = document.dict()
+        doc_dict = document.model_dump()
         result = await self.collection.insert_one(doc_dict)
         return str(result.inserted_id)
     
     async def create_many(self, documents: List[T]) -> List[str]:
-        docs_dict = [doc.dict() for doc in documents]
+        docs_dict = [doc.model_dump() for doc in documents]
         result = await self.collection.insert_many(docs_dict)
         return [str(id) for id in result.inserted_ids]
     
     async def find_by_id(self, id: str) -> Optional[T]:
         document = await self.collection.find_one({"_id": id})
-        if document:
-            return self.model_class(**document)
-        return None
+        return self._hydrate(document)
     
-    async def find_one(self, filter: Dict[str, Any]) -> Optional[T]:
-        document = await self.collection.find_one(filter)
-        if document:
-            return self.model_class(**document)
-        return None
+    async def find_one(self, filter: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[T]:
+        document = await self.collection.find_one(filter, projection)
+        return self._hydrate(document)
     
     async def find_many(
         self, 
         filter: Dict[str, Any] = {}, 
         skip: int = 0, 
         limit: int = 100,
-        sort: Optional[List[tuple]] = None
+        sort: Optional[List[tuple]] = None,
+        projection: Optional[Dict[str, Any]] = None
     ) -> List[T]:
-        cursor = self.collection.find(filter)
+        cursor = self.collection.find(filter, projection)
         
         if sort:
             cursor = cursor.sort(sort)
@@ -49,7 +69,53 @@ class BaseRepository(Generic[T]):
         cursor = cursor.skip(skip).limit(limit)
         
         documents = await cursor.to_list(length=limit)
-        return [self.model_class(**doc) for doc in documents]
+        return self._hydrate_many(documents)
+    
+    async def find_page(
+        self,
+        filter: Dict[str, Any] = {},
+        sort: Optional[List[tuple]] = None,
+        limit: int = 100,
+        page_token: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Page[T]:
+        """Keyset-paginated find: each page seeks straight to the position in `page_token`.
+        
+        The sort should be backed by an index ending with `_id`. Documents whose sort
+        keys change between two pages may be skipped or seen twice.
+        """
+        sort = normalize_sort(sort)
+        if page_token:
+            after = keyset_filter(sort, decode_token(page_token, sort))
+            filter = {"$and": [filter, after]} if filter else after
+        if projection and any(value for name, value in projection.items() if name != "_id"):
+            # The next token is built from the sort keys of the last document
+            projection = {**projection, **{name: 1 for name, _ in sort}}
+        
+        # One extra document tells whether there is a next page
+        cursor = self.collection.find(filter, projection).sort(sort).limit(limit + 1)
+        documents = await cursor.to_list(length=limit + 1)
+        
+        next_token = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_token = encode_token(documents[-1], sort)
+        return Page(items=self._hydrate_many(documents), next_token=next_token)
+    
+    async def iterate(
+        self,
+        filter: Dict[str, Any] = {},
+        sort: Optional[List[tuple]] = None,
+        batch_size: int = 500,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[T]:
+        """Stream matching documents, fetched from the server `batch_size` at a time."""
+        cursor = self.collection.find(filter, projection).batch_size(batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        async with cursor:
+            async for document in cursor:
+                yield self._hydrate(document)
     
     async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any]) -> bool:
         update_dict = {"$set": update}
@@ -0,0 +1,190 @@
+"""
+Content-addressed storage of large, frequently repeated message payloads.
+
+System prompts and big tool returns (e.g. the workspace hierarchy) are the
+same across many sessions. They are stored once in a blob collection keyed
+by the SHA-256 of their JSON serialization, and the message part keeps a
+`{"_blob": <hash>}` reference. Each raw messages document lists its
+references in `blob_refs`, which garbage collection uses to find orphans.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from pydantic_core import to_json
+from pymongo import UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+from .codecs import MessageCodec, message_codec
+from .indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes
+
+logger = logging.getLogger(__name__)
+
+BLOB_KEY = "_blob"
+DEDUPLICATED_PART_KINDS = ("system-prompt", "tool-return")
+
+# Shared by every BlobRepository of the process
+_blob_cache: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and BLOB_KEY in value
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def extract_blobs(messages_data: List[Dict[str, Any]], threshold: int) -> Dict[str, Any]:
+    """Replace large system prompt / tool return contents by blob references, in place.
+
+    Returns the extracted payloads keyed by hash.
+    """
+    blobs: Dict[str, Any] = {}
+    for message in messages_data:
+        for part in message.get("parts", ()):
+            if part.get("part_kind") not in DEDUPLICATED_PART_KINDS:
+                continue
+            content = part.get("content")
+            if content is None or is_blob_ref(content):
+                continue
+            raw = to_json(content)
+            if len(raw) < threshold:
+                continue
+            digest = content_hash(raw)
+            blobs[digest] = content
+            part["content"] = {BLOB_KEY: digest}
+    return blobs
+
+
+def referenced_blobs(messages_data: List[Dict[str, Any]]) -> Set[str]:
+    refs = set()
+    for message in messages_data:
+        for part in message.get("parts", ()):
+            content = part.get("content")
+            if is_blob_ref(content):
+                refs.add(content[BLOB_KEY])
+    return refs
+
+
+def restore_blobs(messages_data: List[Dict[str, Any]], blobs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Substitute blob references with their payloads, in place."""
+    for message in messages_data:
+        for part in message.get("parts", ()):
+            content = part.get("content")
+            if is_blob_ref(content):
+                digest = content[BLOB_KEY]
+                if digest not in blobs:
+                    raise LookupError(f"Message blob {digest} is missing")
+                part["content"] = blobs[digest]
+    return messages_data
+
+
+class BlobRepository:
+    """Stores deduplicated payloads; keeps an in-process cache since blobs are immutable."""
+
+    def __init__(self, codec: Optional[MessageCodec] = None, cache_size: int = 256):
+        self.collection: AsyncCollection = db_connection.message_blobs_collection
+        self.codec = codec or message_codec
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = _blob_cache
+
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return [
+            IndexSpec(name="last_referenced_at", keys=(("last_referenced_at", 1),)),
+        ]
+
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
+
+    def _remember(self, digest: str, payload: Any) -> None:
+        self._cache[digest] = payload
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def put_many(self, blobs: Dict[str, Any]) -> None:
+        """Insert new payloads and refresh `last_referenced_at` of existing ones."""
+        if not blobs:
+            return
+        now = datetime.utcnow()
+        operations = []
+        for digest, payload in blobs.items():
+            operations.append(UpdateOne(
+                {"_id": digest},
+                {
+                    "$setOnInsert": {
+                        "payload": self.codec.compress_value(payload) if self.codec.enabled else payload,
+                        "size": len(to_json(payload)),
+                        "created_at": now,
+                    },
+                    "$set": {"last_referenced_at": now},
+                },
+                upsert=True
+            ))
+        await self.collection.bulk_write(operations, ordered=False)
+        for digest, payload in blobs.items():
+            self._remember(digest, payload)
+
+    async def get_many(self, digests: Iterable[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        missing = []
+        for digest in digests:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                found[digest] = self._cache[digest]
+            else:
+                missing.append(digest)
+        if missing:
+            documents = await self.collection.find({"_id": {"$in": missing}}).to_list(length=None)
+            payloads = [document["payload"] for document in documents]
+            await self.codec.ensure_value_dictionaries(db_connection.codec_dictionaries_collection, payloads)
+            for document in documents:
+                payload = self.codec.decompress_value(document["payload"])
+                found[document["_id"]] = payload
+                self._remember(document["_id"], payload)
+        return found
+
+    async def collect_garbage(
+        self,
+        referencing_collections: Sequence[AsyncCollection],
+        grace: timedelta = timedelta(hours=24),
+        dry_run: bool = False
+    ) -> Dict[str, int]:
+        """Delete blobs no document references anymore.
+
+        Only blobs not re-referenced for `grace` are considered, so a save that
+        inserted its blobs but has not written its messages yet is never raced.
+        """
+        cutoff = datetime.utcnow() - grace
+        scanned = freed = 0
+        orphans: List[str] = []
+
+        async for blob in self.collection.find({"last_referenced_at": {"$lt": cutoff}}, projection={"size": 1}):
+            scanned += 1
+            referenced = False
+            for collection in referencing_collections:
+                if await collection.count_documents({"blob_refs": blob["_id"]}, limit=1):
+                    referenced = True
+                    break
+            if not referenced:
+                orphans.append(blob["_id"])
+                freed += blob.get("size", 0)
+
+        orphaned = len(orphans)
+        if orphans and not dry_run:
+            for start in range(0, len(orphans), 1000):
+                batch = orphans[start:start + 1000]
+                await self.collection.delete_many({"_id": {"$in": batch}, "last_referenced_at": {"$lt": cutoff}})
+            for digest in orphans:
+                self._cache.pop(digest, None)
+
+        logger.info(f"Blob GC scanned {scanned} blobs, {'found' if dry_run else 'deleted'} {orphaned} orphans ({freed} bytes)")
+        return {"scanned": scanned, "orphaned": orphaned, "freed_bytes": freed}
@@ -0,0 +1,186 @@
+"""
+Transparent compression of large message part payloads.
+
+Parts whose `content` (or tool call `args`) serializes above a threshold are
+stored as zstd-compressed binary, optionally with a dictionary trained on our
+own ClickUp payloads. Dictionaries are shared between workers through a
+MongoDB collection and fetched on demand when a document references one
+that is not loaded yet.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bson import Binary
+from pydantic_core import from_json, to_json
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_KEY = "_codec"
+COMPRESSED_FIELDS = ("content", "args")
+DEFAULT_DICTIONARY_SIZE = 112 * 1024
+
+
+def is_compressed(value: Any) -> bool:
+    return isinstance(value, dict) and value.get(CODEC_KEY) == "zstd"
+
+
+class MessageCodec:
+    """Compresses/decompresses message part fields inside serialized messages."""
+
+    def __init__(self, enabled: bool = False, threshold: int = 4096, level: int = 3):
+        if enabled and zstandard is None:
+            logger.warning("Message compression requires the 'zstandard' package, storing messages uncompressed")
+            enabled = False
+        self.enabled = enabled
+        self.threshold = threshold
+        self.level = level
+        self.active_dictionary_id: Optional[int] = None
+        self._dictionaries: Dict[int, Any] = {}
+        self._compressor = None
+        self._decompressors: Dict[int, Any] = {}
+
+    # Dictionaries
+
+    @property
+    def loaded_dictionaries(self) -> Set[int]:
+        return set(self._dictionaries)
+
+    def add_dictionary(self, data: bytes, activate: bool = True) -> int:
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dict_id = dictionary.dict_id()
+        self._dictionaries[dict_id] = dictionary
+        self._decompressors.pop(dict_id, None)
+        if activate:
+            self.active_dictionary_id = dict_id
+            self._compressor = None
+        return dict_id
+
+    async def load_dictionaries(self, collection: AsyncCollection, ids: Optional[Iterable[int]] = None) -> None:
+        """Load dictionaries from MongoDB; without ids, load all and activate the newest."""
+        if zstandard is None:
+            return
+        filter = {"_id": {"$in": list(ids)}} if ids is not None else {}
+        cursor = collection.find(filter).sort([("created_at", 1)])
+        async for document in cursor:
+            self.add_dictionary(bytes(document["data"]), activate=ids is None)
+        if ids is None and self.active_dictionary_id:
+            logger.info(f"Message codec using dictionary {self.active_dictionary_id}")
+
+    async def ensure_dictionaries(self, collection: AsyncCollection, messages_data: List[Dict[str, Any]]) -> None:
+        """Fetch the dictionaries referenced by stored messages that are not loaded yet."""
+        values = [part.get(field) for message in messages_data for part in message.get("parts", ()) for field in COMPRESSED_FIELDS]
+        await self.ensure_value_dictionaries(collection, values)
+
+    async def ensure_value_dictionaries(self, collection: AsyncCollection, values: Iterable[Any]) -> None:
+        missing = {value["dict"] for value in values if is_compressed(value) and value.get("dict")} - set(self._dictionaries)
+        if missing:
+            await self.load_dictionaries(collection, missing)
+
+    @staticmethod
+    def train_dictionary(samples: List[bytes], size: int = DEFAULT_DICTIONARY_SIZE) -> bytes:
+        if zstandard is None:
+            raise RuntimeError("Dictionary training requires the 'zstandard' package")
+        return zstandard.train_dictionary(size, samples).as_bytes()
+
+    @staticmethod
+    async def store_dictionary(collection: AsyncCollection, data: bytes, sample_count: int) -> int:
+        dict_id = zstandard.ZstdCompressionDict(data).dict_id()
+        await collection.replace_one(
+            {"_id": dict_id},
+            {"_id": dict_id, "data": Binary(data), "samples": sample_count, "created_at": datetime.utcnow()},
+            upsert=True
+        )
+        return dict_id
+
+    # Encoding
+
+    def _get_compressor(self):
+        if self._compressor is None:
+            dictionary = self._dictionaries.get(self.active_dictionary_id) if self.active_dictionary_id else None
+            self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+        return self._compressor
+
+    def _get_decompressor(self, dict_id: int):
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id not in self._dictionaries:
+                raise LookupError(f"Compression dictionary {dict_id} is not loaded")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionaries.get(dict_id) if dict_id else None)
+            self._decompressors[dict_id] = decompressor
+        return decompressor
+
+    def compress_value(self, value: Any) -> Any:
+        """Compress a JSON-compatible value if its serialization exceeds the threshold."""
+        if value is None or is_compressed(value):
+            return value
+        raw = to_json(value)
+        if len(raw) < self.threshold:
+            return value
+        return {
+            CODEC_KEY: "zstd",
+            "dict": self.active_dictionary_id or 0,
+            "size": len(raw),
+            "data": Binary(self._get_compressor().compress(raw)),
+        }
+
+    def decompress_value(self, value: Any) -> Any:
+        if not is_compressed(value):
+            return value
+        raw = self._get_decompressor(value.get("dict", 0)).decompress(bytes(value["data"]), max_output_size=value.get("size", 0))
+        return from_json(raw)
+
+    def encode(self, messages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Compress large part fields in place. No-op when compression is disabled."""
+        if not self.enabled:
+            return messages_data
+        for message in messages_data:
+            for part in message.get("parts", ()):
+                for field in COMPRESSED_FIELDS:
+                    if field in part:
+                        part[field] = self.compress_value(part[field])
+        return messages_data
+
+    def decode(self, messages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Decompress part fields in place. Always runs, so data written while
+        compression was enabled stays readable after disabling it."""
+        for message in messages_data:
+            for part in message.get("parts", ()):
+                for field in COMPRESSED_FIELDS:
+                    if is_compressed(part.get(field)):
+                        part[field] = self.decompress_value(part[field])
+        return messages_data
+
+    @staticmethod
+    def training_samples(messages_data: List[Dict[str, Any]], min_size: int) -> List[bytes]:
+        """Serialized part payloads large enough to be compressed, used to train dictionaries."""
+        samples = []
+        for message in messages_data:
+            for part in message.get("parts", ()):
+                for field in COMPRESSED_FIELDS:
+                    value = part.get(field)
+                    if value is not None and not is_compressed(value):
+                        raw = to_json(value)
+                        if len(raw) >= min_size:
+                            samples.append(raw)
+        return samples
+
+
+def create_message_codec() -> MessageCodec:
+    settings = db_connection.settings
+    return MessageCodec(
+        enabled=settings.message_compression,
+        threshold=settings.message_compression_threshold,
+        level=settings.message_compression_level,
+    )
+
+
+message_codec = create_message_codec()
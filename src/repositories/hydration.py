@@ -0,0 +1,97 @@
+"""
+Hydration of stored documents into models.
+
+Batches are validated in a single pydantic-core call. Trusted hydration skips
+validation for documents this service wrote itself: `model_construct` does
+not build nested models and is slow, so the field plan of each model class
+(defaults, fields holding sub-models, lists of sub-models or enums) is
+computed once and instances are assembled directly.
+"""
+import typing
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+import pydantic
+from pydantic import BaseModel
+
+T = TypeVar('T', bound=BaseModel)
+
+# Field plan entries: (field name, kind, target, field info) with kind None, "model", "models" or "enum"
+FieldPlan = Tuple[Tuple[str, Optional[str], Any, Any], ...]
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+@lru_cache(maxsize=None)
+def field_plan(model_class: Type[BaseModel]) -> FieldPlan:
+    plan = []
+    for name, info in model_class.model_fields.items():
+        annotation = _unwrap_optional(info.annotation)
+        kind, target = None, None
+        if _is_model(annotation):
+            kind, target = "model", annotation
+        elif typing.get_origin(annotation) in (list, List):
+            item = _unwrap_optional(typing.get_args(annotation)[0]) if typing.get_args(annotation) else None
+            if _is_model(item):
+                kind, target = "models", item
+        elif isinstance(annotation, type) and issubclass(annotation, Enum):
+            kind, target = "enum", annotation
+        plan.append((name, kind, target, info))
+    return tuple(plan)
+
+
+def construct_trusted(model_class: Type[T], data: Dict[str, Any]) -> T:
+    """Build a model (and its nested models) from trusted data without validating it."""
+    values: Dict[str, Any] = {}
+    for name, kind, target, info in field_plan(model_class):
+        if name not in data:
+            if info.is_required():
+                continue
+            values[name] = info.get_default(call_default_factory=True)
+            continue
+        value = data[name]
+        if kind is None or value is None:
+            values[name] = value
+        elif kind == "model":
+            values[name] = construct_trusted(target, value) if isinstance(value, dict) else value
+        elif kind == "models":
+            values[name] = [construct_trusted(target, item) if isinstance(item, dict) else item for item in value]
+        else:
+            values[name] = value if isinstance(value, target) else target(value)
+    instance = model_class.__new__(model_class)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", {name for name in values if name in data})
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model_class: Type[BaseModel]) -> pydantic.TypeAdapter:
+    return pydantic.TypeAdapter(List[model_class])
+
+
+def hydrate_many(model_class: Type[T], documents: List[Dict[str, Any]], trusted: bool) -> List[T]:
+    """Hydrate a batch of documents, validating them in a single call when not trusted."""
+    if trusted:
+        return [construct_trusted(model_class, document) for document in documents]
+    return list_adapter(model_class).validate_python(documents)
+
+
+def hydrate(model_class: Type[T], document: Optional[Dict[str, Any]], trusted: bool) -> Optional[T]:
+    if document is None:
+        return None
+    if trusted:
+        return construct_trusted(model_class, document)
+    return model_class.model_validate(document)
@@ -0,0 +1,141 @@
+"""
+Declarative index registry for the MongoDB repositories.
+
+Each repository declares the indexes its queries rely on; they are created
+on startup and can be compared against what actually exists in the database.
+TTL indexes only ever come from the settings: when a TTL is switched off, the
+live index loses its expiry too, so documents are no longer deleted.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple, Dict, Any
+
+from pymongo import IndexModel
+from pymongo.asynchronous.collection import AsyncCollection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Declaration of a single index on a collection."""
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+    sparse: bool = False
+
+    def to_index_model(self) -> IndexModel:
+        options: Dict[str, Any] = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return IndexModel(list(self.keys), **options)
+
+
+@dataclass
+class IndexReport:
+    """Result of comparing declared indexes with the ones present in a collection."""
+    collection: str
+    created: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    undeclared: List[str] = field(default_factory=list)
+    unused: List[str] = field(default_factory=list)
+    # Indexes whose live expiry differs from the declaration (undeclared ones included)
+    ttl_drift: List[str] = field(default_factory=list)
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "created": self.created,
+            "missing": self.missing,
+            "undeclared": self.undeclared,
+            "unused": self.unused,
+            "ttl_drift": self.ttl_drift,
+            "usage": self.usage,
+        }
+
+
+def ttl_seconds(days: Optional[int]) -> Optional[int]:
+    """Convert a TTL expressed in days to seconds (None/0 disables the TTL)."""
+    if not days or days <= 0:
+        return None
+    return int(days) * 24 * 3600
+
+
+async def ensure_indexes(collection: AsyncCollection, specs: Sequence[IndexSpec]) -> IndexReport:
+    """Create any declared index that does not exist yet.
+
+    Existing indexes with the same name are left untouched, except TTL indexes
+    whose expiry changed, which are updated in place with collMod. An expiry
+    cannot be removed in place: indexes whose TTL was switched off are dropped
+    and recreated without it, and undeclared TTL indexes are dropped.
+    """
+    report = IndexReport(collection=collection.name)
+    existing = await collection.index_information()
+    declared = {spec.name for spec in specs}
+
+    for name, current in existing.items():
+        if name not in declared and current.get("expireAfterSeconds") is not None:
+            await collection.drop_index(name)
+            logger.warning(f"Dropped undeclared TTL index {collection.name}.{name}: documents are no longer expired")
+
+    to_create = []
+    for spec in specs:
+        current = existing.get(spec.name)
+        if current is None:
+            to_create.append(spec)
+            continue
+        if spec.expire_after_seconds is None and current.get("expireAfterSeconds") is not None:
+            await collection.drop_index(spec.name)
+            to_create.append(spec)
+            logger.warning(f"Removing the TTL of index {collection.name}.{spec.name}: documents are no longer expired")
+        elif spec.expire_after_seconds is not None and current.get("expireAfterSeconds") != spec.expire_after_seconds:
+            await collection.database.command({
+                "collMod": collection.name,
+                "index": {"name": spec.name, "expireAfterSeconds": spec.expire_after_seconds},
+            })
+            logger.info(f"Updated TTL of index {collection.name}.{spec.name} to {spec.expire_after_seconds}s")
+
+    if to_create:
+        await collection.create_indexes([spec.to_index_model() for spec in to_create])
+        report.created = [spec.name for spec in to_create]
+        logger.info(f"Created indexes on {collection.name}: {', '.join(report.created)}")
+
+    return report
+
+
+async def inspect_indexes(collection: AsyncCollection, specs: Sequence[IndexSpec]) -> IndexReport:
+    """Report declared indexes that are missing, undeclared ones and indexes never used.
+
+    Usage counters come from $indexStats and are reset when the server restarts,
+    so "unused" means unused since the last mongod restart.
+    """
+    report = IndexReport(collection=collection.name)
+    existing = await collection.index_information()
+    declared = {spec.name for spec in specs}
+
+    report.missing = [name for name in declared if name not in existing]
+    report.undeclared = [name for name in existing if name != "_id_" and name not in declared]
+    expiry = {spec.name: spec.expire_after_seconds for spec in specs}
+    report.ttl_drift = [
+        name for name, current in existing.items()
+        if current.get("expireAfterSeconds") != expiry.get(name)
+    ]
+
+    try:
+        cursor = await collection.aggregate([{"$indexStats": {}}])
+        async for stat in cursor:
+            ops = int(stat.get("accesses", {}).get("ops", 0))
+            report.usage[stat["name"]] = ops
+            if stat["name"] != "_id_" and ops == 0:
+                report.unused.append(stat["name"])
+    except Exception as e:
+        # $indexStats is not available on every deployment (e.g. restricted Atlas tiers)
+        logger.warning(f"Could not read index usage for {collection.name}: {e}")
+
+    return report
@@ -0,0 +1,97 @@
+"""
+Lazily validated view over a stored conversation.
+
+The repository hands back the raw stored items (JSON bytes or raw BSON
+sub-documents) and a message is only validated into a pydantic-ai object
+when it is accessed, so callers that only need a count, a slice or the last
+text response do not pay for validating the whole history.
+"""
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Optional, Union, overload
+
+import bson
+import pydantic
+from bson.raw_bson import RawBSONDocument
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelRequest, ModelResponse, TextPart
+
+ModelMessageTypeAdapter = pydantic.TypeAdapter(
+    ModelMessage, config=pydantic.ConfigDict(defer_build=True, ser_json_bytes='base64', val_json_bytes='base64')
+)
+
+RawMessage = Union[bytes, Any]
+
+
+class LazyMessageSequence(Sequence):
+    """Read-only sequence of ModelMessage validated on access.
+
+    Items stored as JSON bytes take the fast path straight into `validate_json`;
+    anything else (dicts, raw BSON) goes through `decode_item`, which must return
+    a ModelMessage, or plain validation when no decoder is given. Already
+    validated messages can be wrapped as they are.
+    """
+
+    __slots__ = ("_items", "_decode_item", "_cache")
+
+    def __init__(self, items: List[RawMessage], decode_item: Optional[Callable[[Any], ModelMessage]] = None):
+        self._items = items
+        self._decode_item = decode_item
+        self._cache: Dict[int, ModelMessage] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @overload
+    def __getitem__(self, index: int) -> ModelMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "LazyMessageSequence": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyMessageSequence(self._items[index], self._decode_item)
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("message index out of range")
+        message = self._cache.get(index)
+        if message is None:
+            message = self._cache[index] = self._validate(self._items[index])
+        return message
+
+    def _validate(self, item: RawMessage) -> ModelMessage:
+        if isinstance(item, (ModelRequest, ModelResponse)):
+            return item
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            return ModelMessageTypeAdapter.validate_json(item)
+        if self._decode_item is None:
+            if isinstance(item, RawBSONDocument):
+                item = bson.decode(item.raw)
+            return ModelMessageTypeAdapter.validate_python(item)
+        return self._decode_item(item)
+
+    def raw_json(self, index: int) -> Optional[bytes]:
+        """The stored JSON of a message when it is kept in JSON form, without validating it."""
+        item = self._items[index]
+        return bytes(item) if isinstance(item, (bytes, bytearray, memoryview)) else None
+
+    def to_list(self) -> List[ModelMessage]:
+        """Validate every message. When all items are JSON bytes and none is cached yet,
+        they are validated in a single `validate_json` call."""
+        if not self._cache and self._items and all(isinstance(item, bytes) for item in self._items):
+            messages = ModelMessagesTypeAdapter.validate_json(b"[" + b",".join(self._items) + b"]")
+            self._cache = dict(enumerate(messages))
+            return messages
+        return [self[i] for i in range(len(self._items))]
+
+    def last_text_response(self) -> Optional[str]:
+        """Content of the last assistant text part, validating from the end only as far as needed."""
+        for index in range(len(self._items) - 1, -1, -1):
+            message = self[index]
+            if isinstance(message, ModelResponse):
+                for part in message.parts:
+                    if isinstance(part, TextPart):
+                        return part.content
+        return None
+
+    def __repr__(self) -> str:
+        return f"LazyMessageSequence(len={len(self._items)}, validated={len(self._cache)})"
@@ -1,11 +1,24 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
+from dataclasses import dataclass
 from datetime import datetime
 import logging
 import os
+import bson
+from bson import CodecOptions, ObjectId
+from bson.raw_bson import RawBSONDocument
+from pydantic_core import from_json, to_json
 from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 from ..models.messages import AgentSession
 from ..config.database import db_connection
 from .base import BaseRepository
+from .pagination import Page
+from .blobs import BlobRepository, extract_blobs, referenced_blobs, restore_blobs, is_blob_ref
+from .codecs import message_codec, is_compressed, COMPRESSED_FIELDS
+from .archive import ARCHIVED_FIELD
+from .indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes, ttl_seconds
+from .lazy_messages import LazyMessageSequence, ModelMessageTypeAdapter
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from pymongo.asynchronous.collection import AsyncCollection
 
 logger = logging.getLogger(__name__)
@@ -14,102 +27,293 @@ logger = logging.getLogger(__name__)
 DEBUG_MESSAGES = os.environ.get('DEBUG_MESSAGES', 'true').lower() == 'true'
 
 
+# Listings leave out the simplified conversation, by far the largest field of a session
+SESSION_SUMMARY_PROJECTION = {"messages": 0}
+
+
+def has_storage_encoding(message: Dict[str, Any]) -> bool:
+    """Whether a serialized message contains compressed fields or blob references."""
+    for part in message.get("parts", ()):
+        if is_blob_ref(part.get("content")):
+            return True
+        for field in COMPRESSED_FIELDS:
+            if is_compressed(part.get(field)):
+                return True
+    return False
+
+
+class SessionArchivedError(Exception):
+    """The raw messages of the session were moved to the archive while it was being saved."""
+    def __init__(self, session_id: str):
+        super().__init__(f"Session {session_id} is archived")
+        self.session_id = session_id
+
+
+@dataclass
+class StoredConversation:
+    """A session's messages as stored, with the version written alongside them."""
+    messages: LazyMessageSequence
+    version: Optional[str]
+    document_id: Any
+    size: int
+    # Read from the archive collection, the session itself staying archived
+    archived: bool = False
+
+
 class ModelMessageRepository:
     """Repository for handling ModelMessage storage directly in MongoDB"""
     
     def __init__(self):
         self.collection: AsyncCollection = db_connection.raw_messages_collection
+        # Same collection, but documents stay raw BSON until a message is accessed
+        self.raw_collection: AsyncCollection = self.collection.with_options(
+            codec_options=CodecOptions(document_class=RawBSONDocument)
+        )
+        self.codec = message_codec
+        self.blobs = BlobRepository(self.codec)
+    
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        specs = [
+            IndexSpec(name="session_id_unique", keys=(("session_id", 1),), unique=True),
+            IndexSpec(name="blob_refs", keys=(("blob_refs", 1),), sparse=True),
+        ]
+        ttl = ttl_seconds(db_connection.settings.session_ttl_days)
+        if ttl:
+            specs.append(IndexSpec(name="updated_at_ttl", keys=(("updated_at", 1),), expire_after_seconds=ttl))
+        return specs
+    
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+    
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
     
-    async def save_messages_for_session(self, session_id: str, messages: List[ModelMessage]) -> None:
-        """Save messages for a session, replacing any existing messages"""
+    async def save_messages_for_session(self, session_id: str, messages: List[ModelMessage]) -> StoredConversation:
+        """Save messages for a session, replacing any existing messages.
+        
+        Every save writes a new `version`, used by caches to detect changes made by other workers.
+        An archive stub is never replaced: SessionArchivedError is raised instead, for the
+        caller to restore the session first.
+        """
         try:
             # Serialize messages using ModelMessagesTypeAdapter
             messages_data = ModelMessagesTypeAdapter.dump_python(messages, mode='json')
-            
+            messages_data, encoding_fields = await self.encode_messages(messages_data)
+            version = str(ObjectId())
             document = {
                 "session_id": session_id,
                 "messages": messages_data,
-                "timestamp": datetime.utcnow().isoformat()
+                "version": version,
+                "timestamp": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow(),
+                **encoding_fields
             }
             
             logger.info(f"Saving {len(messages)} messages for session {session_id}")
             
             # Upsert - replace if exists, create if not
-            result = await self.collection.replace_one(
-                {"session_id": session_id},
+            result = await self.collection.find_one_and_replace(
+                {"session_id": session_id, ARCHIVED_FIELD: None},
                 document,
-                upsert=True
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
             
-            logger.info(f"Save result - matched: {result.matched_count}, modified: {result.modified_count}, upserted_id: {result.upserted_id}")
+            logger.info(f"Saved session {session_id} at version {version}")
+            return StoredConversation(
+                messages=LazyMessageSequence(list(messages)),
+                version=version,
+                document_id=result["_id"] if result else None,
+                size=sum(len(item) if isinstance(item, bytes) else len(bson.encode(item)) for item in messages_data)
+            )
+        except DuplicateKeyError:
+            # The filter skipped an archive stub and the upsert hit the unique session_id
+            raise SessionArchivedError(session_id)
         except Exception as e:
             logger.error(f"Failed to save messages for session {session_id}: {e}", exc_info=True)
             raise
     
-    async def get_messages_by_session_id(self, session_id: str, limit: Optional[int] = None) -> Optional[List[ModelMessage]]:
+    async def append_messages(self, session_id: str, messages: List[ModelMessage], previous: StoredConversation) -> Optional[StoredConversation]:
+        """Push messages at the end of a stored conversation, encoding and sending only them.
+        
+        The write only applies if the document is still at `previous.version`; None is
+        returned when another writer changed it meanwhile.
+        """
+        messages_data = ModelMessagesTypeAdapter.dump_python(messages, mode='json')
+        messages_data, encoding_fields = await self.encode_messages(messages_data)
+        version = str(ObjectId())
+        update: Dict[str, Any] = {
+            "$push": {"messages": {"$each": messages_data}},
+            "$set": {"version": version, "timestamp": datetime.utcnow().isoformat(), "updated_at": datetime.utcnow()},
+        }
+        if encoding_fields:
+            update["$addToSet"] = {name: {"$each": values} for name, values in encoding_fields.items()}
+        result = await self.collection.update_one(
+            {"session_id": session_id, "version": previous.version, "messages": {"$exists": True}},
+            update
+        )
+        if not result.modified_count:
+            return None
+    
+        if DEBUG_MESSAGES:
+            logger.info(f"➕ Appended {len(messages)} messages to session {session_id} at version {version}")
+        return StoredConversation(
+            messages=LazyMessageSequence(previous.messages.to_list() + list(messages)),
+            version=version,
+            document_id=previous.document_id,
+            size=previous.size + sum(len(item) if isinstance(item, bytes) else len(bson.encode(item)) for item in messages_data)
+        )
+    
+    async def get_version(self, session_id: str) -> Optional[str]:
+        """Current stored version of a session (None if missing or written before versioning)."""
+        document = await self.collection.find_one({"session_id": session_id}, projection={"_id": 0, "version": 1})
+        return document.get("version") if document else None
+    
+    async def load_conversation(self, session_id: str) -> Optional[StoredConversation]:
+        document = await self.raw_collection.find_one({"session_id": session_id})
+        if document is None or "messages" not in document:
+            return None
+        return StoredConversation(
+            messages=await self.lazy_messages(document),
+            version=document.get("version"),
+            document_id=document["_id"],
+            size=len(document.raw)
+        )
+    
+    async def get_messages_by_session_id(self, session_id: str, limit: Optional[int] = None) -> Optional[LazyMessageSequence]:
         """Get messages for a session with optional limit
         
+        Messages are validated lazily, when accessed (see LazyMessageSequence).
+        
         Args:
             session_id: The session ID
             limit: Maximum number of messages to return (0 or None for all messages)
                   If limit > 0, returns the most recent messages
         """
-        document = await self.collection.find_one({"session_id": session_id})
+        conversation = await self.load_conversation(session_id)
         
-        if document and "messages" in document:
-            # Deserialize using ModelMessagesTypeAdapter
-            all_messages = ModelMessagesTypeAdapter.validate_python(document["messages"])
-            
+        if conversation is not None:
             if DEBUG_MESSAGES:
-                logger.info(f"📛 Retrieved {len(all_messages)} total messages from DB for session {session_id}")
-            
-            # Apply limit if specified and greater than 0
-            if limit and limit > 0 and len(all_messages) > limit:
-                # Return the last 'limit' messages
-                limited_messages = all_messages[-limit:]
-                if DEBUG_MESSAGES:
-                    logger.info(f"🎯 Applied limit {limit}, returning last {len(limited_messages)} messages")
-                return limited_messages
-            
-            if DEBUG_MESSAGES and limit:
-                logger.info(f"📤 No limit applied (total messages {len(all_messages)} <= limit {limit})")
-            
-            return all_messages
+                logger.info(f"📛 Retrieved {len(conversation.messages)} total messages from DB for session {session_id}")
+            return self.limit_messages(conversation.messages, limit)
         
         if DEBUG_MESSAGES:
             logger.info(f"⚠️ No messages found for session {session_id}")
         
         return None
     
-    async def append_messages_to_session(self, session_id: str, all_messages_from_run: List[ModelMessage]) -> None:
+    @staticmethod
+    def limit_messages(all_messages: LazyMessageSequence, limit: Optional[int]) -> LazyMessageSequence:
+        """Keep the last `limit` messages (0 or None for all messages)."""
+        # Apply limit if specified and greater than 0
+        if limit and limit > 0 and len(all_messages) > limit:
+            # Return the last 'limit' messages
+            limited_messages = all_messages[-limit:]
+            if DEBUG_MESSAGES:
+                logger.info(f"🎯 Applied limit {limit}, returning last {len(limited_messages)} messages")
+            return limited_messages
+        
+        if DEBUG_MESSAGES and limit:
+            logger.info(f"📤 No limit applied (total messages {len(all_messages)} <= limit {limit})")
+        
+        return all_messages
+    
+    async def count_messages(self, session_id: str) -> Optional[int]:
+        """Number of stored messages of a session, computed server-side (None if there is no session)."""
+        document = await self.collection.find_one(
+            {"session_id": session_id},
+            projection={"_id": 0, "count": {"$size": {"$ifNull": ["$messages", []]}}}
+        )
+        return document["count"] if document is not None else None
+    
+    async def lazy_messages(self, document: RawBSONDocument) -> LazyMessageSequence:
+        """Wrap a raw stored document's messages in a LazyMessageSequence.
+        
+        Everything that needs I/O (codec dictionaries, blobs) is fetched here, up front,
+        using the document-level `codec_dicts` and `blob_refs` fields.
+        """
+        dictionary_ids = document.get("codec_dicts")
+        if dictionary_ids:
+            missing = set(dictionary_ids) - set(self.codec.loaded_dictionaries)
+            if missing:
+                await self.codec.load_dictionaries(db_connection.codec_dictionaries_collection, missing)
+        blob_refs = document.get("blob_refs")
+        blobs = await self.blobs.get_many(blob_refs) if blob_refs else {}
+        
+        def decode_item(item: Any) -> ModelMessage:
+            message = bson.decode(item.raw) if isinstance(item, RawBSONDocument) else item
+            message = self.codec.decode([message])
+            if blobs:
+                restore_blobs(message, blobs)
+            return ModelMessageTypeAdapter.validate_python(message[0])
+        
+        return LazyMessageSequence(list(document["messages"]), decode_item)
+    
+    async def encode_messages(self, messages_data: List[Dict[str, Any]]) -> Tuple[List[Any], Dict[str, Any]]:
+        """Apply the storage encodings (deduplication, compression, JSON form) to serialized messages.
+        
+        Returns the encoded messages and the document-level fields describing them
+        (`blob_refs`, `codec_dicts`). Blobs are written before the messages document
+        so a reader never sees a dangling reference.
+        """
+        fields: Dict[str, Any] = {}
+        if db_connection.settings.message_dedup:
+            blobs = extract_blobs(messages_data, db_connection.settings.message_dedup_threshold)
+            await self.blobs.put_many(blobs)
+            if blobs:
+                fields["blob_refs"] = sorted(blobs)
+        messages_data = self.codec.encode(messages_data)
+        if self.codec.enabled and self.codec.active_dictionary_id:
+            fields["codec_dicts"] = [self.codec.active_dictionary_id]
+        if db_connection.settings.raw_messages_format == "json":
+            # Messages without storage encodings are kept as JSON bytes for the validate_json fast path
+            messages_data = [
+                message if has_storage_encoding(message) else to_json(message)
+                for message in messages_data
+            ]
+        return messages_data, fields
+    
+    async def decode_messages(self, messages_data: List[Any]) -> List[Dict[str, Any]]:
+        """Undo the storage encodings of a stored messages list, returning plain dicts."""
+        messages_data = [from_json(message) if isinstance(message, bytes) else message for message in messages_data]
+        await self.codec.ensure_dictionaries(db_connection.codec_dictionaries_collection, messages_data)
+        messages_data = self.codec.decode(messages_data)
+        refs = referenced_blobs(messages_data)
+        if refs:
+            messages_data = restore_blobs(messages_data, await self.blobs.get_many(refs))
+        return messages_data
+    
+    async def append_messages_to_session(self, session_id: str, all_messages_from_run: List[ModelMessage]) -> Optional[StoredConversation]:
         """Update session with messages from an agent run.
         
         Note: all_messages_from_run contains ALL messages from the conversation,
         not just new ones. We need to detect which ones are actually new.
+        Returns the stored conversation, or None when nothing was written.
         """
-        # Get existing messages
-        existing_messages = await self.get_messages_by_session_id(session_id)
+        # Get existing messages count
+        existing_count = await self.count_messages(session_id)
         
-        if existing_messages is None:
+        if existing_count is None:
             # No existing session, save all messages
-            await self.save_messages_for_session(session_id, all_messages_from_run)
+            return await self.save_messages_for_session(session_id, all_messages_from_run)
         else:
-            # Only keep messages that are not already in the session
-            existing_count = len(existing_messages)
-            
             if DEBUG_MESSAGES:
                 logger.info(f"🔄 Appending messages: existing={existing_count}, received={len(all_messages_from_run)}")
             
             # The new messages are those after the existing ones
             if len(all_messages_from_run) > existing_count:
                 # Save all messages (the full conversation)
-                await self.save_messages_for_session(session_id, all_messages_from_run)
+                stored = await self.save_messages_for_session(session_id, all_messages_from_run)
                 if DEBUG_MESSAGES:
                     logger.info(f"✅ Updated session with {len(all_messages_from_run) - existing_count} new messages")
+                return stored
             else:
                 if DEBUG_MESSAGES:
                     logger.info(f"⏸️ No new messages to append")
             # If no new messages, don't update
+            return None
     
     async def delete_session_messages(self, session_id: str) -> bool:
         """Delete all messages for a session"""
@@ -119,7 +323,20 @@ class ModelMessageRepository:
 
 class AgentSessionRepository(BaseRepository[AgentSession]):
     def __init__(self):
-        super().__init__(db_connection.agent_sessions_collection, AgentSession)
+        super().__init__(db_connection.agent_sessions_collection, AgentSession, trusted=db_connection.settings.trusted_reads)
+    
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return [
+            IndexSpec(name="session_id_unique", keys=(("session_id", 1),), unique=True),
+            IndexSpec(name="agent_id_created_at_id", keys=(("agent_id", 1), ("created_at", -1), ("_id", -1))),
+            IndexSpec(name="updated_at_id", keys=(("updated_at", -1), ("_id", -1))),
+            IndexSpec(
+                name="updated_at",
+                keys=(("updated_at", -1),),
+                expire_after_seconds=ttl_seconds(db_connection.settings.session_ttl_days)
+            ),
+        ]
     
     async def create_session(self, session: AgentSession) -> str:
         try:
@@ -139,20 +356,74 @@ class AgentSessionRepository(BaseRepository[AgentSession]):
             update=update_data
         )
     
+    async def append_summary(self, session_id: str, simple_messages: List[Dict[str, Any]], model: Optional[str], token_usage: Optional[Dict[str, Any]]) -> bool:
+        """Push a turn's simplified messages without rewriting the earlier ones."""
+        update: Dict[str, Any] = {"updated_at": datetime.utcnow(), "token_usage": token_usage}
+        if model:
+            update["model"] = model
+        result = await self.collection.update_one(
+            {"session_id": session_id},
+            {"$push": {"messages": {"$each": simple_messages}}, "$set": update}
+        )
+        return result.modified_count > 0
+    
     async def find_by_session_id(self, session_id: str) -> Optional[AgentSession]:
         return await self.find_one({"session_id": session_id})
     
+    async def get_updated_at(self, session_id: str) -> Optional[datetime]:
+        """Last change of a session (a turn or a summary rebuild), from a small projection."""
+        document = await self.collection.find_one(
+            {"session_id": session_id},
+            projection={"_id": 0, "updated_at": 1, "rebuilt_at": 1}
+        )
+        if document is None:
+            return None
+        return max(filter(None, (document.get("updated_at"), document.get("rebuilt_at"))), default=None)
+    
     async def find_by_agent_id(self, agent_id: str, skip: int = 0, limit: int = 100) -> List[AgentSession]:
         return await self.find_many(
             filter={"agent_id": agent_id},
             skip=skip,
             limit=limit,
-            sort=[("created_at", -1)]
+            sort=[("created_at", -1), ("_id", -1)]
         )
     
     async def find_recent_sessions(self, limit: int = 100) -> List[AgentSession]:
-        return await self.find_many(
+        page = await self.page_recent_sessions(limit=limit)
+        return page.items
+    
+    async def page_by_agent_id(
+        self,
+        agent_id: str,
+        limit: int = 100,
+        page_token: Optional[str] = None,
+        include_messages: bool = True
+    ) -> Page[AgentSession]:
+        return await self.find_page(
+            filter={"agent_id": agent_id},
+            sort=[("created_at", -1), ("_id", -1)],
+            limit=limit,
+            page_token=page_token,
+            projection=None if include_messages else SESSION_SUMMARY_PROJECTION
+        )
+    
+    async def page_recent_sessions(
+        self,
+        limit: int = 100,
+        page_token: Optional[str] = None,
+        include_messages: bool = True
+    ) -> Page[AgentSession]:
+        return await self.find_page(
             filter={},
+            sort=[("updated_at", -1), ("_id", -1)],
             limit=limit,
-            sort=[("updated_at", -1)]
+            page_token=page_token,
+            projection=None if include_messages else SESSION_SUMMARY_PROJECTION
+        )
+    
+    def iter_by_agent_id(self, agent_id: str, batch_size: int = 500) -> AsyncIterator[AgentSession]:
+        return self.iterate(
+            filter={"agent_id": agent_id},
+            sort=[("created_at", -1), ("_id", -1)],
+            batch_size=batch_size
         )
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Keyset (range-based) pagination helpers.
+
+A page is read with a range filter on the sort keys of the last document of
+the previous page instead of `skip()`, so every page costs the same index
+seek whatever its position. The position is handed to clients as an opaque
+continuation token; `_id` is always appended to the sort as a tie-breaker so
+the order is total.
+
+Tokens are signed with an HMAC (PAGE_TOKEN_SECRET, or EXPORT_API_TOKEN) and
+their values must have the type of their sort field, so a forged token cannot
+put operator documents into the query filter.
+"""
+import base64
+import hashlib
+import hmac
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from bson import ObjectId, json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+
+from ..config.database import db_connection
+
+T = TypeVar('T')
+
+SortSpec = List[Tuple[str, int]]
+
+# Types of the sort keys in use; other keys take any scalar
+FIELD_TYPES: Dict[str, Tuple[type, ...]] = {
+    "_id": (ObjectId,),
+    "created_at": (datetime,),
+    "updated_at": (datetime,),
+}
+SCALAR_TYPES = (str, int, float, datetime, ObjectId)
+SIGNATURE_BYTES = 16
+
+
+class InvalidPageToken(ValueError):
+    """Raised when a continuation token is malformed or was issued for another sort."""
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T] = field(default_factory=list)
+    next_token: Optional[str] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_token is not None
+
+
+def normalize_sort(sort: Optional[Sequence[Tuple[str, int]]]) -> SortSpec:
+    """Append `_id` as tie-breaker, in the direction of the last sort key."""
+    keys = list(sort or [])
+    if not any(name == "_id" for name, _ in keys):
+        keys.append(("_id", keys[-1][1] if keys else 1))
+    return keys
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, Mapping) else None
+    return value
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _secret() -> Optional[bytes]:
+    secret = db_connection.settings.page_token_secret or os.getenv("EXPORT_API_TOKEN")
+    return secret.encode() if secret else None
+
+
+def _signature(body: str, secret: bytes) -> str:
+    return _b64encode(hmac.new(secret, body.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES])
+
+
+def encode_token(document: Dict[str, Any], sort: SortSpec) -> str:
+    payload = {"s": [name for name, _ in sort], "v": [_get_path(document, name) for name, _ in sort]}
+    body = _b64encode(json_util.dumps(payload, json_options=CANONICAL_JSON_OPTIONS).encode())
+    secret = _secret()
+    return f"{body}.{_signature(body, secret)}" if secret else body
+
+
+def decode_token(token: str, sort: SortSpec) -> List[Any]:
+    body, _, signature = token.partition(".")
+    secret = _secret()
+    if secret is not None and not hmac.compare_digest(signature.encode(), _signature(body, secret).encode()):
+        raise InvalidPageToken("Invalid continuation token signature")
+    try:
+        payload = json_util.loads(_b64decode(body), json_options=CANONICAL_JSON_OPTIONS)
+        fields, values = payload["s"], payload["v"]
+    except Exception:
+        raise InvalidPageToken("Malformed continuation token")
+    if fields != [name for name, _ in sort] or not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidPageToken("Continuation token does not match this listing")
+    for (name, _), value in zip(sort, values):
+        if value is not None and (isinstance(value, bool) or not isinstance(value, FIELD_TYPES.get(name, SCALAR_TYPES))):
+            raise InvalidPageToken(f"Invalid value for {name} in continuation token")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """Documents strictly after `values` in `sort` order.
+
+    For keys (a, b, _id) this is: a > va, or a == va and b > vb, or a == va and b == vb and _id > vid
+    (with < for descending keys).
+    """
+    clauses = []
+    for position, (name, direction) in enumerate(sort):
+        clause = {prefix: values[i] for i, (prefix, _) in enumerate(sort[:position])}
+        clause[name] = {"$gt" if direction > 0 else "$lt": values[position]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
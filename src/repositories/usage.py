@@ -0,0 +1,179 @@
+"""
+Hourly token-usage rollups.
+
+One document per (agent, model, user, hour) holds the request and token
+counters of the model responses of that hour. Live runs `$inc` them; the
+backfill job recomputes them from stored conversations with `$set`, so it
+can be re-run safely.
+"""
+import logging
+from dataclasses import is_dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pymongo import UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+from .indexes import IndexSpec, IndexReport, ensure_indexes, inspect_indexes
+
+logger = logging.getLogger(__name__)
+
+RollupKey = Tuple[str, str, str, datetime]
+
+COUNTERS = ("responses", "requests", "request_tokens", "response_tokens", "total_tokens")
+GROUP_FIELDS = {
+    "agent": "agent_id",
+    "model": "model",
+    "user": "user_id",
+}
+BUCKETS = ("hour", "day", "month")
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """The range of whole hours the rollups of [start, end) cover: start rounded down, end rounded up."""
+    effective_end = hour_bucket(end)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if end > effective_end:
+        effective_end += timedelta(hours=1)
+    return hour_bucket(start), effective_end
+
+
+def _details(details: Any) -> Dict[str, int]:
+    if not details:
+        return {}
+    if is_dataclass(details):
+        details = asdict(details)
+    elif not isinstance(details, dict):
+        details = vars(details)
+    return {key: value for key, value in details.items() if isinstance(value, int) and value}
+
+
+def compute_rollups(messages: Iterable[ModelMessage], agent_id: str, user_id: str) -> Dict[RollupKey, Dict[str, int]]:
+    """Counters per (agent, model, user, hour) of the model responses in `messages`."""
+    rollups: Dict[RollupKey, Dict[str, int]] = {}
+    for message in messages:
+        if not isinstance(message, ModelResponse) or message.usage is None:
+            continue
+        key = (agent_id, message.model_name or "unknown", user_id, hour_bucket(message.timestamp))
+        counters = rollups.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        usage = message.usage
+        counters["responses"] += 1
+        counters["requests"] += usage.requests or 0
+        counters["request_tokens"] += usage.request_tokens or 0
+        counters["response_tokens"] += usage.response_tokens or 0
+        counters["total_tokens"] += usage.total_tokens or 0
+        for name, value in _details(usage.details).items():
+            field = f"details.{name}"
+            counters[field] = counters.get(field, 0) + value
+    return rollups
+
+
+def _key_filter(key: RollupKey) -> Dict[str, Any]:
+    agent_id, model, user_id, hour = key
+    return {"agent_id": agent_id, "model": model, "user_id": user_id, "hour": hour}
+
+
+class UsageRollupRepository:
+    def __init__(self):
+        self.collection: AsyncCollection = db_connection.telemetry_collection(
+            db_connection.settings.usage_rollups_collection
+        )
+
+    @staticmethod
+    def index_specs() -> List[IndexSpec]:
+        return [
+            IndexSpec(
+                name="agent_id_hour_model_user_id_unique",
+                keys=(("agent_id", 1), ("hour", 1), ("model", 1), ("user_id", 1)),
+                unique=True
+            ),
+            IndexSpec(name="hour", keys=(("hour", 1),)),
+            IndexSpec(name="user_id_hour", keys=(("user_id", 1), ("hour", 1))),
+        ]
+
+    async def ensure_indexes(self) -> IndexReport:
+        return await ensure_indexes(self.collection, self.index_specs())
+
+    async def inspect_indexes(self) -> IndexReport:
+        return await inspect_indexes(self.collection, self.index_specs())
+
+    async def increment(self, rollups: Dict[RollupKey, Dict[str, int]]) -> None:
+        if not rollups:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(_key_filter(key), {"$inc": counters, "$set": {"updated_at": now}}, upsert=True)
+            for key, counters in rollups.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def replace(self, rollups: Dict[RollupKey, Dict[str, int]]) -> int:
+        """Overwrite the counters of the given keys (backfill)."""
+        if not rollups:
+            return 0
+        now = datetime.utcnow()
+        operations = []
+        for key, counters in rollups.items():
+            details = {name.split(".", 1)[1]: value for name, value in counters.items() if name.startswith("details.")}
+            values = {name: value for name, value in counters.items() if not name.startswith("details.")}
+            operations.append(UpdateOne(
+                _key_filter(key),
+                {"$set": {**values, "details": details, "updated_at": now}},
+                upsert=True
+            ))
+        result = await self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    async def aggregate(
+        self,
+        start: datetime,
+        end: datetime,
+        group_by: List[str],
+        bucket: Optional[str] = "day",
+        agent_id: Optional[str] = None,
+        model: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Sum the rollups of [start, end) grouped by the requested dimensions and time bucket.
+        
+        Rollups are hourly: the whole hours overlapping the range are summed (see `hour_range`).
+        """
+        start, end = hour_range(start, end)
+        match: Dict[str, Any] = {"hour": {"$gte": start, "$lt": end}}
+        for field, value in (("agent_id", agent_id), ("model", model), ("user_id", user_id)):
+            if value is not None:
+                match[field] = value
+
+        group_id: Dict[str, Any] = {name: f"${GROUP_FIELDS[name]}" for name in group_by}
+        if bucket == "hour":
+            group_id["period"] = "$hour"
+        elif bucket:
+            group_id["period"] = {"$dateTrunc": {"date": "$hour", "unit": bucket}}
+
+        group: Dict[str, Any] = {"_id": group_id}
+        for counter in COUNTERS:
+            group[counter] = {"$sum": f"${counter}"}
+        group["cached_tokens"] = {"$sum": {"$ifNull": ["$details.cached_tokens", 0]}}
+        group["reasoning_tokens"] = {"$sum": {"$ifNull": ["$details.reasoning_tokens", 0]}}
+
+        pipeline = [
+            {"$match": match},
+            {"$group": group},
+            {"$sort": {f"_id.{name}": 1 for name in group_id} or {"_id": 1}},
+        ]
+        cursor = await self.collection.aggregate(pipeline)
+        rows = []
+        async for document in cursor:
+            row = dict(document.pop("_id") or {})
+            row.update(document)
+            rows.append(row)
+        return rows
@@ -0,0 +1,99 @@
+"""
+Batch execution of chat prompts.
+
+All items run on one agent whose MCP servers are leased for the whole batch,
+so the batch starts each server process once. At most `concurrency` runs are
+in flight; items of the same session run one after another in submission
+order, since each turn builds on the history saved by the previous one.
+Results are produced as items complete. Batch runs are background work for
+the ClickUp rate limiter, so interactive requests keep priority.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from ..agent.rate_limit import BACKGROUND, priority
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItemResult:
+    index: int
+    user_id: str
+    success: bool
+    message: Optional[str] = None
+    error: Optional[str] = None
+    queued_ms: float = 0.0
+    run_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ChatBatchRunner:
+    def __init__(self, agent, concurrency: int = 8):
+        self.agent = agent
+        self.concurrency = max(1, concurrency)
+
+    async def _run_item(self, index: int, user_id: str, user_input: str, semaphore: asyncio.Semaphore, submitted: float) -> BatchItemResult:
+        async with semaphore:
+            started = time.perf_counter()
+            queued_ms = round((started - submitted) * 1000, 1)
+            try:
+                result = await self.agent.run(user_input=user_input, user_id=user_id)
+                response = await self.agent.get_agent_response(result)
+                return BatchItemResult(
+                    index=index,
+                    user_id=user_id,
+                    success=True,
+                    message=str(response) if response is not None else "Agent processed the request successfully",
+                    queued_ms=queued_ms,
+                    run_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+            except Exception as e:
+                logger.error(f"Batch item {index} failed for user {user_id}: {e}", exc_info=True)
+                return BatchItemResult(
+                    index=index,
+                    user_id=user_id,
+                    success=False,
+                    error=f"Failed to process chat request: {e}",
+                    queued_ms=queued_ms,
+                    run_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+
+    async def _run_session(self, items: List[Tuple[int, str, str]], semaphore: asyncio.Semaphore, submitted: float, results: asyncio.Queue) -> None:
+        with priority(BACKGROUND):
+            for index, user_id, user_input in items:
+                await results.put(await self._run_item(index, user_id, user_input, semaphore, submitted))
+
+    async def results(self, items: Sequence[Tuple[str, str]]) -> AsyncIterator[BatchItemResult]:
+        """Run (user_id, user_input) items and yield their results in completion order."""
+        sessions: "OrderedDict[str, List[Tuple[int, str, str]]]" = OrderedDict()
+        for index, (user_id, user_input) in enumerate(items):
+            sessions.setdefault(user_id, []).append((index, user_id, user_input))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        submitted = time.perf_counter()
+        async with self.agent.mcp_lease().acquire():
+            tasks = [
+                asyncio.create_task(self._run_session(session_items, semaphore, submitted, queue))
+                for session_items in sessions.values()
+            ]
+            try:
+                for _ in range(len(items)):
+                    yield await queue.get()
+                await asyncio.gather(*tasks)
+            finally:
+                # Consumer gone (e.g. client disconnected from a streamed batch)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(
+            f"📦 Batch of {len(items)} prompts over {len(sessions)} sessions done in "
+            f"{(time.perf_counter() - submitted) * 1000:.0f} ms"
+        )
@@ -0,0 +1,196 @@
+"""
+Streaming NDJSON export of sessions and their raw messages.
+
+Sessions are read from a server-side cursor in `_id` order, a batch at a
+time, with the raw messages of each batch fetched in one query, so memory
+stays bounded whatever the size of the export. Every line carries the
+checkpoint token of its session; passing the last received one back resumes
+the export right after it. The messages of archived sessions are read from
+the archive collection, without restoring them, and their lines carry
+`"archived": true`.
+"""
+import logging
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic_core import to_json
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+from ..config.database import db_connection
+from ..repositories.archive import SessionArchiveRepository, ARCHIVED_FIELD
+from ..repositories.messages import ModelMessageRepository, SESSION_SUMMARY_PROJECTION
+from ..repositories.pagination import encode_token, decode_token, keyset_filter
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_SORT = [("_id", 1)]
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+@dataclass
+class ExportFilter:
+    agent_id: Optional[str] = None
+    user_id: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    def to_query(self) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if self.agent_id:
+            query["agent_id"] = self.agent_id
+        if self.user_id:
+            # Sessions are keyed by user
+            query["session_id"] = self.user_id
+        if self.since or self.until:
+            query["updated_at"] = {}
+            if self.since:
+                query["updated_at"]["$gte"] = self.since
+            if self.until:
+                query["updated_at"]["$lt"] = self.until
+        return query
+
+
+@dataclass
+class ExportStats:
+    sessions: int = 0
+    messages: int = 0
+    bytes: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    checkpoint: Optional[str] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "sessions": self.sessions,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "elapsed_s": round(elapsed, 3),
+            "documents_per_s": round(self.sessions / elapsed, 1) if elapsed else None,
+            "checkpoint": self.checkpoint,
+        }
+
+
+class ConversationExporter:
+    def __init__(self, batch_size: int = 200, include_messages: bool = True):
+        self.batch_size = batch_size
+        self.include_messages = include_messages
+        self.message_repo = ModelMessageRepository()
+        self.archive_repo = SessionArchiveRepository()
+        self.sessions = db_connection.agent_sessions_collection
+        self.stats = ExportStats()
+
+    async def lines(self, export_filter: ExportFilter, checkpoint: Optional[str] = None) -> AsyncIterator[bytes]:
+        """NDJSON lines, one per session: {"checkpoint", "session", "messages"}.
+
+        `stats` is advanced as each line is yielded, so `stats.checkpoint` is the
+        checkpoint of the last line handed to the consumer.
+        """
+        query = export_filter.to_query()
+        if checkpoint:
+            after = keyset_filter(EXPORT_SORT, decode_token(checkpoint, EXPORT_SORT))
+            query = {"$and": [query, after]} if query else after
+
+        cursor = self.sessions.find(query, SESSION_SUMMARY_PROJECTION).sort(EXPORT_SORT).batch_size(self.batch_size)
+        batch: List[Dict[str, Any]] = []
+        async with cursor:
+            async for session in cursor:
+                batch.append(session)
+                if len(batch) >= self.batch_size:
+                    for checkpoint, line in await self._render_batch(batch):
+                        self._count(checkpoint, line)
+                        yield line
+                    batch = []
+            if batch:
+                for checkpoint, line in await self._render_batch(batch):
+                    self._count(checkpoint, line)
+                    yield line
+        logger.info(f"📤 Export finished: {self.stats.to_dict()}")
+
+    def _count(self, checkpoint: str, line: bytes) -> None:
+        self.stats.sessions += 1
+        self.stats.bytes += len(line)
+        self.stats.checkpoint = checkpoint
+
+    async def _render_messages(self, document: Any) -> bytes:
+        messages = await self.message_repo.lazy_messages(document)
+        items = []
+        for index in range(len(messages)):
+            raw = messages.raw_json(index)
+            items.append(raw if raw is not None else ModelMessagesTypeAdapter.dump_json([messages[index]])[1:-1])
+        self.stats.messages += len(items)
+        return b"[" + b",".join(items) + b"]"
+
+    async def _render_batch(self, sessions: List[Dict[str, Any]]) -> List[Tuple[str, bytes]]:
+        """(checkpoint, line) pairs of a batch of sessions."""
+        messages_by_session: Dict[str, bytes] = {}
+        if self.include_messages:
+            archived = []
+            cursor = self.message_repo.raw_collection.find({"session_id": {"$in": [s["session_id"] for s in sessions]}})
+            async for document in cursor:
+                if "messages" in document:
+                    messages_by_session[document["session_id"]] = await self._render_messages(document)
+                else:
+                    archived.append(document["session_id"])
+            if archived:
+                for session_id, document in (await self.archive_repo.load_raw_messages_many(archived)).items():
+                    messages_by_session[session_id] = await self._render_messages(document)
+
+        lines = []
+        for session in sessions:
+            checkpoint = encode_token(session, EXPORT_SORT)
+            session.pop("_id", None)
+            line = b'{"checkpoint":' + to_json(checkpoint) + b',"session":' + to_json(session, fallback=str)
+            if session.get(ARCHIVED_FIELD):
+                line += b',"archived":true'
+            if self.include_messages:
+                line += b',"messages":' + messages_by_session.get(session["session_id"], b"null")
+            line += b"}\n"
+            lines.append((checkpoint, line))
+        return lines
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], compression: str = "none") -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly into a single gzip or zstd stream."""
+    if compression == "none":
+        async for chunk in chunks:
+            yield chunk
+        return
+    if compression == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        finish = compressor.flush
+    elif compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd export requires the 'zstandard' package")
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        finish = compressor.flush
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    buffer: List[bytes] = []
+    size = 0
+    async for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        # Compress in blocks of about 256 KiB for a decent ratio
+        if size >= 256 * 1024:
+            data = compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+            if data:
+                yield data
+    if buffer:
+        data = compressor.compress(b"".join(buffer))
+        if data:
+            yield data
+    yield finish()
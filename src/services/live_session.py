@@ -0,0 +1,95 @@
+"""
+Live conversations for long-lived connections.
+
+A live conversation loads its session's history once and keeps it in memory,
+together with a lease on the agent's MCP servers, for as long as it is open.
+Each turn runs on the in-memory history and only the turn's new messages are
+written (see `MessageService.append_turn`). `release` drops the hot state
+after an idle period; the next turn reopens it.
+"""
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional
+
+from ..agent.dependencies import AppDependencies
+from ..repositories.lazy_messages import LazyMessageSequence
+from ..repositories.messages import ModelMessageRepository, StoredConversation
+from .message_service import MessageService
+
+logger = logging.getLogger(__name__)
+
+
+class LiveConversation:
+    def __init__(self, agent, session_id: str, service: Optional[MessageService] = None):
+        self.agent = agent
+        self.session_id = session_id
+        self.service = service or MessageService()
+        self.conversation: Optional[StoredConversation] = None
+        self.turns = 0
+        self._resources: Optional[AsyncExitStack] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._resources is not None
+
+    @property
+    def message_count(self) -> int:
+        return len(self.conversation.messages) if self.conversation is not None else 0
+
+    async def open(self) -> None:
+        """Lease the MCP servers and load the session's history."""
+        if self.is_open:
+            return
+        resources = AsyncExitStack()
+        await resources.enter_async_context(self.agent.mcp_lease().acquire())
+        try:
+            pending = self.service.write_behind.pending(self.session_id)
+            if pending is not None:
+                self.conversation = StoredConversation(LazyMessageSequence(list(pending.messages)), None, None, 0)
+            else:
+                self.conversation = await self.service.load_conversation(self.session_id)
+        except BaseException:
+            await resources.aclose()
+            raise
+        self._resources = resources
+        logger.info(f"🟢 Live session {self.session_id} opened ({self.message_count} messages)")
+
+    async def release(self) -> None:
+        """Drop the in-memory history and the MCP lease."""
+        if not self.is_open:
+            return
+        resources, self._resources = self._resources, None
+        self.conversation = None
+        await resources.aclose()
+        logger.info(f"⚪ Live session {self.session_id} released after {self.turns} turns")
+
+    async def turn(self, user_input: str) -> Dict[str, Any]:
+        """Run one turn and persist it. Returns the response text and the time spent per phase."""
+        started = time.perf_counter()
+        reopened = not self.is_open
+        await self.open()
+        opened = time.perf_counter()
+
+        history = None
+        if self.conversation is not None:
+            history = ModelMessageRepository.limit_messages(
+                self.conversation.messages, self.agent.message_history_limit
+            ).to_list()
+        result = await self.agent.run_turn(
+            user_input, message_history=history, deps=AppDependencies(user_id=self.session_id, session_id=self.session_id)
+        )
+        ran = time.perf_counter()
+
+        self.conversation = await self.service.append_turn(
+            self.session_id, self.agent.agent_id, self.conversation, result.new_messages()
+        )
+        self.turns += 1
+        return {
+            "message": await self.agent.get_agent_response(result),
+            "timings": {
+                "open_ms": round((opened - started) * 1000, 1) if reopened else 0.0,
+                "run_ms": round((ran - opened) * 1000, 1),
+                "persist_ms": round((time.perf_counter() - ran) * 1000, 1),
+            },
+        }
@@ -1,5 +1,7 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Union, TYPE_CHECKING
+from dataclasses import dataclass
 from datetime import datetime
+import asyncio
 import uuid
 import json
 import logging
@@ -12,28 +14,85 @@ logger = logging.getLogger(__name__)
 # Debug mode - set to False to disable detailed message logging
 DEBUG_MESSAGES = os.environ.get('DEBUG_MESSAGES', 'true').lower() == 'true'
 
-from ..models.messages import AgentSession
-from ..repositories.messages import ModelMessageRepository, AgentSessionRepository
+from ..models.messages import AgentSession, TokenUsage
+from ..repositories.messages import ModelMessageRepository, AgentSessionRepository, StoredConversation, SessionArchivedError, SESSION_SUMMARY_PROJECTION
+from ..repositories.archive import SessionArchiveRepository
+from ..repositories.usage import UsageRollupRepository, compute_rollups
+from ..repositories.indexes import IndexReport
+from ..repositories.pagination import Page
+from ..repositories.lazy_messages import LazyMessageSequence
+from .session_cache import session_cache
+from .write_behind import write_behind
 from ..utils.message_transformer import MessageTransformer
 from ..config.database import db_connection
 
+if TYPE_CHECKING:
+    from ..agent.intents import IntentRunResult
+
+
+@dataclass
+class SessionPrefetch:
+    """A session looked up ahead of its save, with the change marker it was read at."""
+    session: Optional[AgentSession]
+    updated_at: Optional[datetime]
+
 
 class MessageService:
     def __init__(self):
         self.message_repo = ModelMessageRepository()
         self.session_repo = AgentSessionRepository()
+        self.archive_repo = SessionArchiveRepository()
+        self.usage_repo = UsageRollupRepository()
         self.transformer = MessageTransformer()
+        self.cache = session_cache
+        self.write_behind = write_behind
+    
+    async def prepare_storage(self) -> None:
+        """Startup hook: create indexes and load the message codec dictionaries."""
+        if db_connection.settings.ensure_indexes_on_startup:
+            await self.ensure_indexes()
+        if self.message_repo.codec.enabled:
+            await self.message_repo.codec.load_dictionaries(db_connection.codec_dictionaries_collection)
+    
+    async def ensure_indexes(self) -> List[IndexReport]:
+        """Create the declared indexes of every repository and log what is missing or unused."""
+        reports = []
+        for repo in (self.message_repo, self.session_repo, self.message_repo.blobs, self.archive_repo, self.usage_repo):
+            created = await repo.ensure_indexes()
+            report = await repo.inspect_indexes()
+            report.created = created.created
+            if report.missing:
+                logger.warning(f"Missing indexes on {report.collection}: {', '.join(report.missing)}")
+            if report.undeclared:
+                logger.warning(f"Undeclared indexes on {report.collection}: {', '.join(report.undeclared)}")
+            if report.ttl_drift:
+                logger.warning(f"Indexes whose TTL differs from the settings on {report.collection}: {', '.join(report.ttl_drift)}")
+            if report.unused:
+                logger.info(f"Unused indexes on {report.collection} since last restart: {', '.join(report.unused)}")
+            reports.append(report)
+        return reports
+    
+    async def get_index_reports(self) -> List[IndexReport]:
+        return [
+            await self.message_repo.inspect_indexes(),
+            await self.session_repo.inspect_indexes(),
+            await self.message_repo.blobs.inspect_indexes(),
+            await self.archive_repo.inspect_indexes(),
+            await self.usage_repo.inspect_indexes(),
+        ]
     
     async def save_agent_run(
         self, 
         session_id: str,
-        agent_run_result: AgentRunResult,
+        agent_run_result: Union[AgentRunResult, "IntentRunResult"],
         agent_id: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        prefetched: Optional[SessionPrefetch] = None
     ) -> None:
         """Save or append agent run results to a session.
         
         If the session doesn't exist, it creates it. If it exists, it appends the new messages.
+        `prefetched` is the session looked up while the run was starting (see `prefetch_session`).
         """
         logger.info(f"Saving agent run for session_id: {session_id}, agent_id: {agent_id}")
         # Deserialize messages
@@ -48,61 +107,122 @@ class MessageService:
         if DEBUG_MESSAGES:
             logger.info(f"📦 Received {len(new_messages)} messages from agent run")
         
-        # Check if session exists
-        existing_session = await self.session_repo.find_by_session_id(session_id)
+        run_messages = agent_run_result.new_messages()
+        if self.write_behind.running:
+            # Nothing is written on the response path: the rollups go with the background writes
+            await self.write_behind.enqueue(session_id, agent_id, new_messages, metadata)
+            self.write_behind.background(self.record_usage(agent_id, session_id, run_messages))
+        else:
+            # Usage rollups and the conversation live in different collections: write both at once
+            await asyncio.gather(
+                self.record_usage(agent_id, session_id, run_messages),
+                self.save_messages(session_id, new_messages, agent_id, metadata, prefetched)
+            )
+    
+    @staticmethod
+    def merge_token_usage(existing: Optional[TokenUsage], new: Optional[TokenUsage]) -> Optional[Dict[str, Any]]:
+        """Session token usage after adding a turn's usage to it."""
+        if new and existing:
+            # Add to existing usage
+            total_usage = existing.model_dump()
+            total_usage["requests"] += new.requests
+            total_usage["request_tokens"] += new.request_tokens
+            total_usage["response_tokens"] += new.response_tokens
+            total_usage["total_tokens"] += new.total_tokens
+            
+            if new.details and existing.details:
+                details = total_usage.get("details", {})
+                new_details = new.details.model_dump()
+                for key in details:
+                    if key in new_details and new_details[key] is not None:
+                        details[key] = (details.get(key, 0) or 0) + new_details[key]
+            elif new.details:
+                total_usage["details"] = new.details.model_dump()
+            
+            return total_usage
+        elif new:
+            return new.model_dump()
+        return existing.model_dump() if existing else None
+    
+    async def save_messages(
+        self,
+        session_id: str,
+        new_messages: List[ModelMessage],
+        agent_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        prefetched: Optional[SessionPrefetch] = None
+    ) -> Optional[StoredConversation]:
+        """Persist a conversation (raw messages and session summary).
+        
+        Returns the stored conversation, or None when there was nothing new to write.
+        """
+        try:
+            return await self._save_messages(session_id, new_messages, agent_id, metadata, prefetched)
+        except SessionArchivedError:
+            # Archived while the turn was running: bring the history back, then write on top of it
+            logger.info(f"Session {session_id} was archived during the save, restoring it")
+            await self.archive_repo.restore_session(session_id)
+            return await self._save_messages(session_id, new_messages, agent_id, metadata)
+    
+    async def _save_messages(
+        self,
+        session_id: str,
+        new_messages: List[ModelMessage],
+        agent_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        prefetched: Optional[SessionPrefetch] = None
+    ) -> Optional[StoredConversation]:
+        existing_count = None
+        if prefetched is not None and prefetched.session is not None and not prefetched.session.archived_at:
+            # Only a change marker is read on the save path; the session is re-read if it changed since the prefetch
+            existing_count, updated_at = await asyncio.gather(
+                self.message_repo.count_messages(session_id),
+                self.session_repo.get_updated_at(session_id)
+            )
+            existing_session = prefetched.session if updated_at is not None and updated_at == prefetched.updated_at else None
+            if existing_session is None:
+                existing_session = await self.session_repo.find_by_session_id(session_id)
+        else:
+            # Check if session exists
+            existing_session = await self.session_repo.find_by_session_id(session_id)
+        if existing_session and existing_session.archived_at:
+            # Appending to a stub would lose the archived history
+            await self.archive_repo.restore_session(session_id)
+            existing_session = await self.session_repo.find_by_session_id(session_id)
+            existing_count = None
         
         if existing_session:
             logger.info(f"Updating existing session: {session_id}")
             # Get existing messages count to detect new ones
-            existing_raw_messages = await self.message_repo.get_messages_by_session_id(session_id)
-            existing_count = len(existing_raw_messages) if existing_raw_messages else 0
+            if existing_count is None:
+                existing_count = await self.message_repo.count_messages(session_id)
+            existing_count = existing_count or 0
             
             if DEBUG_MESSAGES:
                 logger.info(f"🔄 Existing messages in DB: {existing_count}")
                 logger.info(f"🆕 New messages to process: {len(new_messages) - existing_count}")
             
             # Session exists - update with full conversation (pydantic-ai returns all messages)
-            await self.message_repo.append_messages_to_session(session_id, new_messages)
+            stored = await self.message_repo.append_messages_to_session(session_id, new_messages)
+            if stored is not None:
+                self.cache.put(session_id, stored.version, stored.messages, stored.size, stored.document_id)
             
             # Only process truly new messages for token counting
             truly_new_messages = new_messages[existing_count:] if len(new_messages) > existing_count else []
             
             if truly_new_messages:
-                # Transform only new messages for display
-                new_simple_messages = self.transformer.transform_messages(truly_new_messages)
+                # Transform only new messages for display, with their model and token usage
+                transformed = self.transformer.transform(truly_new_messages)
+                new_simple_messages = transformed.simple_messages
                 all_simple_messages = (existing_session.messages or []) + new_simple_messages
-                
-                # Extract model info from new messages
-                model_name = self.transformer.extract_model_info(truly_new_messages) or existing_session.model
-                
-                # Aggregate token usage
-                new_token_usage = self.transformer.aggregate_token_usage(truly_new_messages)
-                if new_token_usage and existing_session.token_usage:
-                    # Add to existing usage
-                    total_usage = existing_session.token_usage.dict()
-                    total_usage["requests"] += new_token_usage.requests
-                    total_usage["request_tokens"] += new_token_usage.request_tokens
-                    total_usage["response_tokens"] += new_token_usage.response_tokens
-                    total_usage["total_tokens"] += new_token_usage.total_tokens
-                    
-                    if new_token_usage.details and existing_session.token_usage.details:
-                        details = total_usage.get("details", {})
-                        new_details = new_token_usage.details.dict()
-                        for key in details:
-                            if key in new_details and new_details[key] is not None:
-                                details[key] = (details.get(key, 0) or 0) + new_details[key]
-                    
-                    final_token_usage = total_usage
-                elif new_token_usage:
-                    final_token_usage = new_token_usage.dict()
-                else:
-                    final_token_usage = existing_session.token_usage.dict() if existing_session.token_usage else None
+                model_name = transformed.model_name or existing_session.model
+                final_token_usage = self.merge_token_usage(existing_session.token_usage, transformed.token_usage)
                 
                 # Update session
                 update_result = await self.session_repo.update_session(
                     session_id=session_id,
                     update_data={
-                        "messages": [msg.dict() for msg in all_simple_messages],
+                        "messages": [msg.model_dump() for msg in all_simple_messages],
                         "model": model_name,
                         "token_usage": final_token_usage
                     }
@@ -112,14 +232,17 @@ class MessageService:
                     logger.info(f"✅ Session updated: {update_result}")
                     logger.info(f"   Total simple messages: {len(all_simple_messages)}")
                     logger.info(f"   New messages added: {len(new_simple_messages)}")
+            return stored
         else:
             logger.info(f"Creating new session: {session_id}")
             # New session - create it
-            await self.message_repo.save_messages_for_session(session_id, new_messages)
+            stored = await self.message_repo.save_messages_for_session(session_id, new_messages)
+            self.cache.put(session_id, stored.version, stored.messages, stored.size, stored.document_id)
             
-            simple_messages = self.transformer.transform_messages(new_messages)
-            model_name = self.transformer.extract_model_info(new_messages)
-            token_usage = self.transformer.aggregate_token_usage(new_messages)
+            transformed = self.transformer.transform(new_messages)
+            simple_messages = transformed.simple_messages
+            model_name = transformed.model_name
+            token_usage = transformed.token_usage
             
             if DEBUG_MESSAGES:
                 logger.info(f"🆕 New session details:")
@@ -141,13 +264,186 @@ class MessageService:
             
             if DEBUG_MESSAGES:
                 logger.info(f"✅ Session created successfully: {result}")
+            return stored
     
     
+    async def append_turn(
+        self,
+        session_id: str,
+        agent_id: str,
+        conversation: Optional[StoredConversation],
+        run_messages: List[ModelMessage],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> StoredConversation:
+        """Persist one turn of a conversation held in memory, writing only the turn's messages.
+        
+        `conversation` is the stored state the turn was run on. If another writer changed the
+        session meanwhile, the turn is appended to the current stored conversation instead.
+        Returns the stored conversation including the turn.
+        """
+        run_messages = list(run_messages)
+        await self.record_usage(agent_id, session_id, run_messages)
+        
+        for _ in range(3):
+            if conversation is None or conversation.version is None or self.write_behind.pending(session_id) is not None:
+                break
+            stored = await self.message_repo.append_messages(session_id, run_messages, conversation)
+            if stored is not None:
+                self.cache.put(session_id, stored.version, stored.messages, stored.size, stored.document_id)
+                await self._append_session_summary(session_id, agent_id, stored, run_messages, metadata)
+                return stored
+            logger.info(f"🔀 Session {session_id} changed during the turn, appending to the stored version")
+            conversation = await self.load_conversation(session_id)
+        
+        # New, unversioned or contended session: write the whole conversation
+        history = conversation.messages.to_list() if conversation is not None else []
+        all_messages = history + run_messages
+        if self.write_behind.pending(session_id) is not None:
+            # Supersede the queued run rather than racing its writer
+            await self.write_behind.enqueue(session_id, agent_id, all_messages, metadata)
+            return StoredConversation(messages=LazyMessageSequence(all_messages), version=None, document_id=None, size=0)
+        stored = await self.save_messages(session_id, all_messages, agent_id, metadata)
+        return stored or StoredConversation(
+            messages=LazyMessageSequence(all_messages),
+            version=await self.message_repo.get_version(session_id),
+            document_id=None,
+            size=0
+        )
+    
+    async def _append_session_summary(
+        self,
+        session_id: str,
+        agent_id: str,
+        stored: StoredConversation,
+        run_messages: List[ModelMessage],
+        metadata: Optional[Dict[str, Any]]
+    ) -> None:
+        existing_session = await self.session_repo.find_one({"session_id": session_id}, projection=SESSION_SUMMARY_PROJECTION)
+        if existing_session is None:
+            transformed = self.transformer.transform(stored.messages.to_list())
+            await self.session_repo.create_session(AgentSession(
+                session_id=session_id,
+                agent_id=agent_id,
+                raw_messages_collection=db_connection.settings.raw_messages_collection,
+                messages=transformed.simple_messages,
+                model=transformed.model_name,
+                token_usage=transformed.token_usage,
+                metadata=metadata
+            ))
+            return
+        transformed = self.transformer.transform(run_messages)
+        await self.session_repo.append_summary(
+            session_id,
+            [message.model_dump() for message in transformed.simple_messages],
+            transformed.model_name,
+            self.merge_token_usage(existing_session.token_usage, transformed.token_usage)
+        )
+    
+    async def record_usage(self, agent_id: str, user_id: str, run_messages: List[ModelMessage]) -> None:
+        """Add the usage of a run's own messages to the hourly rollups. Never fails the run."""
+        try:
+            await self.usage_repo.increment(compute_rollups(run_messages, agent_id, user_id))
+        except Exception as e:
+            logger.warning(f"Failed to record usage rollups for session {user_id}: {e}")
+    
+    async def get_usage(
+        self,
+        start: datetime,
+        end: datetime,
+        group_by: List[str],
+        bucket: Optional[str] = "day",
+        agent_id: Optional[str] = None,
+        model: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return await self.usage_repo.aggregate(start, end, group_by, bucket, agent_id, model, user_id)
+    
     async def get_session(self, session_id: str) -> Optional[AgentSession]:
+        """A session summary. An archived session is returned as its stub (without messages): reads never restore it."""
         return await self.session_repo.find_by_session_id(session_id)
     
-    async def get_raw_messages(self, session_id: str, limit: Optional[int] = None) -> Optional[List[ModelMessage]]:
-        return await self.message_repo.get_messages_by_session_id(session_id, limit)
+    async def prefetch_session(self, session_id: str) -> SessionPrefetch:
+        """Look up a session ahead of saving a turn to it, off the save's critical path."""
+        # The marker is read first: a change between the two reads only makes the save re-read the session
+        updated_at = await self.session_repo.get_updated_at(session_id)
+        return SessionPrefetch(await self.session_repo.find_by_session_id(session_id), updated_at)
+    
+    async def get_session_updated_at(self, session_id: str) -> Optional[datetime]:
+        return await self.session_repo.get_updated_at(session_id)
+    
+    async def get_messages_version(self, session_id: str) -> Optional[str]:
+        """Identifier of the current state of a session's history, without loading it."""
+        pending = self.write_behind.pending(session_id)
+        if pending is not None:
+            return f"pending-{pending.enqueued_at}"
+        if not self.cache.needs_version_check:
+            entry = self.cache.peek(session_id)
+            if entry is not None and entry.version is not None:
+                return entry.version
+        return await self.message_repo.get_version(session_id)
+    
+    async def get_raw_messages(self, session_id: str, limit: Optional[int] = None, restore: bool = True) -> Optional[LazyMessageSequence]:
+        """A session's history. With `restore=False` an archived history is read from the archive and stays there."""
+        # A turn not persisted yet by the write-behind queue is the latest state of the session
+        pending = self.write_behind.pending(session_id)
+        if pending is not None:
+            return self.message_repo.limit_messages(LazyMessageSequence(list(pending.messages)), limit)
+        
+        if not self.cache.enabled:
+            conversation = await self.load_conversation(session_id, restore)
+            if conversation is None:
+                return None
+            return self.message_repo.limit_messages(conversation.messages, limit)
+        
+        current_version = None
+        if self.cache.needs_version_check and self.cache.peek(session_id) is not None:
+            current_version = await self.message_repo.get_version(session_id)
+            if current_version is None:
+                # Deleted, or rewritten by code that does not version documents
+                self.cache.invalidate(session_id)
+        
+        messages = self.cache.get(session_id, current_version)
+        if messages is None:
+            conversation = await self.load_conversation(session_id, restore)
+            if conversation is None:
+                return None
+            if not conversation.archived:
+                self.cache.put(session_id, conversation.version, conversation.messages, conversation.size, conversation.document_id)
+            messages = conversation.messages
+        elif DEBUG_MESSAGES:
+            logger.info(f"⚡ Session {session_id} history served from cache ({len(messages)} messages)")
+        
+        return self.message_repo.limit_messages(messages, limit)
+    
+    async def load_conversation(self, session_id: str, restore: bool = True) -> Optional[StoredConversation]:
+        """Load a stored conversation, restoring it first when it was moved to the archive.
+        
+        With `restore=False` (read-only requests) an archived conversation is read from the
+        archive instead, and returned with `archived` set.
+        """
+        conversation = await self.message_repo.load_conversation(session_id)
+        if conversation is not None:
+            return conversation
+        if restore:
+            if await self.archive_repo.restore_session(session_id):
+                return await self.message_repo.load_conversation(session_id)
+            return None
+        document = await self.archive_repo.load_raw_messages(session_id)
+        if document is None:
+            return None
+        return StoredConversation(
+            messages=await self.message_repo.lazy_messages(document),
+            version=document.get("version"),
+            document_id=document["_id"],
+            size=len(document.raw),
+            archived=True
+        )
+    
+    async def count_raw_messages(self, session_id: str) -> int:
+        pending = self.write_behind.pending(session_id)
+        if pending is not None:
+            return len(pending.messages)
+        return await self.message_repo.count_messages(session_id) or 0
     
     async def get_sessions_by_agent(
         self, 
@@ -158,4 +454,25 @@ class MessageService:
         return await self.session_repo.find_by_agent_id(agent_id, skip, limit)
     
     async def get_recent_sessions(self, limit: int = 100) -> List[AgentSession]:
-        return await self.session_repo.find_recent_sessions(limit)
\ No newline at end of file
+        return await self.session_repo.find_recent_sessions(limit)
+    
+    async def list_sessions_by_agent(
+        self,
+        agent_id: str,
+        limit: int = 100,
+        page_token: Optional[str] = None,
+        include_messages: bool = False
+    ) -> Page[AgentSession]:
+        """One page of an agent's sessions, newest first; pass `next_token` back for the next one."""
+        return await self.session_repo.page_by_agent_id(agent_id, limit, page_token, include_messages)
+    
+    async def list_recent_sessions(
+        self,
+        limit: int = 100,
+        page_token: Optional[str] = None,
+        include_messages: bool = False
+    ) -> Page[AgentSession]:
+        return await self.session_repo.page_recent_sessions(limit, page_token, include_messages)
+    
+    def iter_sessions_by_agent(self, agent_id: str, batch_size: int = 500) -> AsyncIterator[AgentSession]:
+        return self.session_repo.iter_by_agent_id(agent_id, batch_size)
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+In-process, write-through cache of recent sessions' message histories.
+
+Entries are bounded by their serialized size, not by count. Every raw messages
+write stores a new `version`; a cached history is only served if it is still
+the current version, checked either with a tiny projected lookup per read
+("version" mode) or by listening to a MongoDB change stream that evicts
+sessions written by other workers ("change_stream" mode, requires a replica
+set; falls back to "version" when the stream cannot be opened).
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from pymongo.asynchronous.collection import AsyncCollection
+
+from ..config.database import db_connection
+from ..repositories.lazy_messages import LazyMessageSequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    version: Optional[str]
+    messages: LazyMessageSequence
+    size: int
+    document_id: Any = None
+
+
+class SessionHistoryCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, invalidation: str = "version"):
+        self.max_bytes = max_bytes
+        self.invalidation = invalidation
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._document_ids: Dict[Any, str] = {}
+        # Last version seen on the change stream per session, so a read that
+        # raced with another worker's write is not cached at the old version
+        self._stream_versions: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._bytes = 0
+        self._watch_task: Optional[asyncio.Task] = None
+        self._watching = False
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def needs_version_check(self) -> bool:
+        """Whether a cached entry must be checked against the stored version before use."""
+        return not self._watching
+
+    def peek(self, session_id: str) -> Optional[CacheEntry]:
+        return self._entries.get(session_id)
+
+    def get(self, session_id: str, current_version: Optional[str] = None) -> Optional[LazyMessageSequence]:
+        """Cached history of a session, or None on a miss.
+
+        When `current_version` is given, an entry with another version counts as stale and is dropped.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if current_version is not None and entry.version != current_version:
+            self.stale += 1
+            self.misses += 1
+            self._remove(session_id)
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return entry.messages
+
+    def put(
+        self,
+        session_id: str,
+        version: Optional[str],
+        messages: LazyMessageSequence,
+        size: int,
+        document_id: Any = None
+    ) -> None:
+        self._remove(session_id)
+        if not self.enabled or size > self.max_bytes:
+            return
+        if self._watching and self._stream_versions.get(session_id, version) != version:
+            return
+        self._entries[session_id] = CacheEntry(version=version, messages=messages, size=size, document_id=document_id)
+        self._bytes += size
+        if document_id is not None:
+            self._document_ids[document_id] = session_id
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, session_id: str, version: Optional[str] = None) -> None:
+        """Drop a session, unless it is already cached at `version` (our own write)."""
+        self._stream_versions[session_id] = version
+        self._stream_versions.move_to_end(session_id)
+        while len(self._stream_versions) > 10000:
+            self._stream_versions.popitem(last=False)
+        entry = self._entries.get(session_id)
+        if entry is None or (version is not None and entry.version == version):
+            return
+        self._remove(session_id)
+        self.invalidations += 1
+
+    def invalidate_document(self, document_id: Any) -> None:
+        session_id = self._document_ids.get(document_id)
+        if session_id is not None:
+            self._stream_versions.pop(session_id, None)
+            self._remove(session_id)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._document_ids.clear()
+        self._stream_versions.clear()
+        self._bytes = 0
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            if entry.document_id is not None:
+                self._document_ids.pop(entry.document_id, None)
+
+    # Cross-worker invalidation through change streams
+
+    async def start(self, collection: AsyncCollection) -> None:
+        if not self.enabled or self.invalidation != "change_stream" or self._watch_task is not None:
+            return
+        try:
+            stream = await self._open_stream(collection)
+        except Exception as e:
+            logger.warning(f"Session cache change stream unavailable ({e}), falling back to version checks")
+            return
+        self._watching = True
+        self._watch_task = asyncio.create_task(self._watch(collection, stream))
+        logger.info("Session cache listening to raw messages change stream")
+
+    async def stop(self) -> None:
+        self._watching = False
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    @staticmethod
+    async def _open_stream(collection: AsyncCollection, resume_after: Optional[Dict[str, Any]] = None):
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "replace", "update", "delete"]}}},
+            {"$project": {"operationType": 1, "documentKey": 1, "fullDocument.session_id": 1, "fullDocument.version": 1}},
+        ]
+        return await collection.watch(pipeline, full_document="updateLookup", resume_after=resume_after)
+
+    async def _watch(self, collection: AsyncCollection, stream) -> None:
+        resume_token = None
+        while True:
+            if stream is None:
+                try:
+                    stream = await self._open_stream(collection, resume_after=resume_token)
+                    self._watching = True
+                except Exception as e:
+                    logger.warning(f"Session cache change stream could not be reopened: {e}")
+                    await asyncio.sleep(5)
+                    continue
+            try:
+                async with stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        document = change.get("fullDocument") or {}
+                        if document.get("session_id") is not None:
+                            self.invalidate(document["session_id"], document.get("version"))
+                        else:
+                            # Deletes only carry the document _id
+                            self.invalidate_document(change.get("documentKey", {}).get("_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Until the stream is back, serve nothing we cannot verify
+                self._watching = False
+                self.clear()
+                logger.warning(f"Session cache change stream interrupted: {e}")
+                await asyncio.sleep(1)
+            stream = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "invalidation": "change_stream" if self._watching else "version",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+session_cache = SessionHistoryCache(
+    max_bytes=db_connection.settings.session_cache_max_bytes,
+    invalidation=db_connection.settings.session_cache_invalidation,
+)
@@ -0,0 +1,365 @@
+"""
+Write-behind persistence of agent runs.
+
+When enabled, `MessageService.save_agent_run` hands the run's messages to
+this queue and returns immediately; a background writer persists them. The
+queue keeps at most one pending run per session (each run carries the full
+conversation, so a newer run supersedes an older one), is bounded in number
+of sessions, and reads of a session with a pending run are answered from it.
+
+With a spool path configured, every enqueued run is first appended to a
+local file (one JSON line per run), so a crash does not lose turns. Each
+worker process spools to its own file, `<spool path>.<pid>`, held under an
+exclusive flock, and compacts it to the runs still pending after every
+persisted batch. On startup a worker adopts the spools whose owner is gone
+(their lock is free): their runs join its queue and its spool, then the
+orphaned files are removed.
+
+Secondary writes of a run that need no ordering (usage rollups) are handed
+to `background` and also leave the response path; `flush` waits for them.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+
+from ..config.database import db_connection
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not POSIX: spools are not locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PersistCallback = Callable[[str, List[ModelMessage], str, Optional[Dict[str, Any]]], Awaitable[None]]
+
+
+@dataclass
+class PendingRun:
+    session_id: str
+    agent_id: str
+    messages: List[ModelMessage]
+    metadata: Optional[Dict[str, Any]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Wall clock time, to keep the newest run of a session across adopted spools
+    spooled_at: float = field(default_factory=time.time)
+    # Spool line of the run, once serialized
+    spooled: Optional[str] = field(default=None, repr=False)
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_pending: int = 1000,
+        batch_size: int = 50,
+        spool_path: Optional[str] = None,
+        fsync: bool = True
+    ):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.spool_path = spool_path
+        self.fsync = fsync
+        self._pending: "OrderedDict[str, PendingRun]" = OrderedDict()
+        self._persist: Optional[PersistCallback] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._has_work: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._spool_lock: Optional[asyncio.Lock] = None
+        self._background: Set[asyncio.Task] = set()
+        self._spool_file: Optional[str] = None
+        self._spool_fd: Optional[int] = None
+        self._orphans: List[Tuple[str, int]] = []
+        self.enqueued = 0
+        self.written = 0
+        self.superseded = 0
+        self.failures = 0
+        self.batches = 0
+        self.write_lag_ms_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None
+
+    def pending(self, session_id: str) -> Optional[PendingRun]:
+        return self._pending.get(session_id)
+
+    async def start(self, persist: PersistCallback) -> None:
+        """Start the background writer, replaying the spools left by previous processes."""
+        if not self.enabled or self.running:
+            return
+        self._persist = persist
+        self._has_work = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._space = asyncio.Condition()
+        self._spool_lock = asyncio.Lock()
+        if self.spool_path:
+            replayed = await asyncio.to_thread(self._claim_spools)
+            for run in replayed:
+                self._add(run)
+            # Adopted runs are in this worker's spool before the files they came from are removed
+            await asyncio.to_thread(self._compact_spool, list(self._pending.values()))
+            await asyncio.to_thread(self._remove_orphans)
+            if replayed:
+                logger.info(f"Write-behind replaying {len(replayed)} spooled runs")
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info("Write-behind persistence started")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Flush pending runs, then stop the writer. Unwritten runs stay in the spool."""
+        if not self.running:
+            return
+        try:
+            await self.flush(timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Write-behind flush timed out with {len(self._pending)} runs pending")
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        if self._spool_fd is not None:
+            await asyncio.to_thread(self._release_spool)
+        logger.info("Write-behind persistence stopped")
+
+    async def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until every pending run and background write is persisted."""
+        if self.running:
+            await asyncio.wait_for(self._settle(), timeout)
+
+    async def _settle(self) -> None:
+        await self._drained.wait()
+        while self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+    def background(self, write: Awaitable[None]) -> None:
+        """Run a write off the response path; it must handle its own errors."""
+        task = asyncio.ensure_future(write)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def enqueue(
+        self,
+        session_id: str,
+        agent_id: str,
+        messages: List[ModelMessage],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        run = PendingRun(session_id=session_id, agent_id=agent_id, messages=list(messages), metadata=metadata)
+        async with self._space:
+            # Backpressure: wait for room unless this session already holds a slot
+            await self._space.wait_for(lambda: session_id in self._pending or len(self._pending) < self.max_pending)
+        async with self._spool_lock:
+            if self.spool_path:
+                await asyncio.to_thread(self._append_spool, run)
+            self._add(run)
+        self.enqueued += 1
+
+    def _add(self, run: PendingRun) -> None:
+        if run.session_id in self._pending:
+            self.superseded += 1
+        self._pending[run.session_id] = run
+        self._pending.move_to_end(run.session_id)
+        self._drained.clear()
+        self._has_work.set()
+
+    async def _write_loop(self) -> None:
+        backoff = 0.5
+        while True:
+            await self._has_work.wait()
+            self._has_work.clear()
+            while self._pending:
+                batch = list(self._pending.values())[:self.batch_size]
+                results = await asyncio.gather(*(self._write(run) for run in batch), return_exceptions=True)
+                self.batches += 1
+                failed = False
+                written = False
+                for run, result in zip(batch, results):
+                    if isinstance(result, BaseException):
+                        failed = True
+                        self.failures += 1
+                        logger.error(f"Write-behind save failed for session {run.session_id}: {result}")
+                    elif self._pending.get(run.session_id) is run:
+                        del self._pending[run.session_id]
+                        written = True
+                if written and self.spool_path:
+                    # Keep the spool to the pending runs, even when the queue never drains
+                    async with self._spool_lock:
+                        await asyncio.to_thread(self._compact_spool, list(self._pending.values()))
+                async with self._space:
+                    self._space.notify_all()
+                if failed:
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30.0)
+                else:
+                    backoff = 0.5
+            async with self._spool_lock:
+                if not self._pending:
+                    self._drained.set()
+
+    async def _write(self, run: PendingRun) -> None:
+        await self._persist(run.session_id, run.messages, run.agent_id, run.metadata)
+        self.written += 1
+        self.write_lag_ms_max = max(self.write_lag_ms_max, (time.monotonic() - run.enqueued_at) * 1000)
+
+    # Spool files (run in a worker thread)
+
+    def _spool_line(self, run: PendingRun) -> str:
+        if run.spooled is None:
+            run.spooled = json.dumps({
+                "session_id": run.session_id,
+                "agent_id": run.agent_id,
+                "metadata": run.metadata,
+                "spooled_at": run.spooled_at,
+                "messages": ModelMessagesTypeAdapter.dump_json(run.messages).decode(),
+            }, default=str)
+        return run.spooled
+
+    def _append_spool(self, run: PendingRun) -> None:
+        with open(self._spool_file, "a", encoding="utf-8") as spool:
+            spool.write(self._spool_line(run) + "\n")
+            if self.fsync:
+                spool.flush()
+                os.fsync(spool.fileno())
+
+    def _compact_spool(self, runs: List[PendingRun]) -> None:
+        """Rewrite this worker's spool with `runs` only (atomically: a crash keeps the previous file)."""
+        temporary = f"{self._spool_file}.tmp"
+        with open(temporary, "w", encoding="utf-8") as spool:
+            for run in runs:
+                spool.write(self._spool_line(run) + "\n")
+            if self.fsync:
+                spool.flush()
+                os.fsync(spool.fileno())
+        os.replace(temporary, self._spool_file)
+
+    @staticmethod
+    def _lock(path: str) -> Optional[int]:
+        """Exclusive lock on `path`.lock, or None when another process holds it."""
+        lock_path = f"{path}.lock"
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Another process may have adopted the spool and removed the lock file meanwhile
+            if os.stat(lock_path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        os.close(fd)
+        return None
+
+    def _spool_files(self) -> List[str]:
+        """The spool files of every worker, and the single spool of earlier versions."""
+        directory, prefix = os.path.split(os.path.abspath(self.spool_path))
+        paths = [self.spool_path] if os.path.exists(self.spool_path) else []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith(prefix + ".") and name[len(prefix) + 1:].isdigit():
+                paths.append(os.path.join(directory, name))
+        return paths
+
+    def _claim_spools(self) -> List[PendingRun]:
+        """Lock this worker's spool and collect the runs of its spool and of orphaned ones."""
+        self._spool_file = f"{self.spool_path}.{os.getpid()}"
+        self._spool_fd = self._lock(self._spool_file)
+        if self._spool_fd is None:
+            raise RuntimeError(f"Write-behind spool {self._spool_file} is locked by another process")
+        runs: Dict[str, PendingRun] = {}
+        for path in self._spool_files():
+            if os.path.abspath(path) != os.path.abspath(self._spool_file):
+                fd = self._lock(path)
+                if fd is None:
+                    # Its worker is alive
+                    continue
+                self._orphans.append((path, fd))
+                if not os.path.exists(path):
+                    continue
+            for run in self._read_spool(path):
+                current = runs.get(run.session_id)
+                if current is None or run.spooled_at >= current.spooled_at:
+                    runs[run.session_id] = run
+        return sorted(runs.values(), key=lambda run: run.spooled_at)
+
+    def _remove_orphans(self) -> None:
+        for path, fd in self._orphans:
+            for name in (path, f"{path}.lock"):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            os.close(fd)
+            logger.info(f"Write-behind adopted spool {path}")
+        self._orphans = []
+
+    def _release_spool(self) -> None:
+        """Unlock this worker's spool, removing it when nothing is left to persist."""
+        if not self._pending:
+            for name in (self._spool_file, f"{self._spool_file}.lock"):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+        os.close(self._spool_fd)
+        self._spool_fd = None
+
+    @staticmethod
+    def _read_spool(path: str) -> List[PendingRun]:
+        runs: "OrderedDict[str, PendingRun]" = OrderedDict()
+        with open(path, encoding="utf-8") as spool:
+            for number, line in enumerate(spool, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    runs[entry["session_id"]] = PendingRun(
+                        session_id=entry["session_id"],
+                        agent_id=entry["agent_id"],
+                        messages=ModelMessagesTypeAdapter.validate_json(entry["messages"]),
+                        metadata=entry.get("metadata"),
+                        spooled_at=entry.get("spooled_at", 0.0),
+                        spooled=line.strip(),
+                    )
+                except Exception as e:
+                    # A torn last line after a crash mid-append
+                    logger.warning(f"Skipping unreadable write-behind spool line {path}:{number}: {e}")
+        return list(runs.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        spool_bytes = None
+        if self._spool_file and os.path.exists(self._spool_file):
+            spool_bytes = os.path.getsize(self._spool_file)
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending_sessions": len(self._pending),
+            "background_writes": len(self._background),
+            "max_pending": self.max_pending,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "superseded": self.superseded,
+            "failures": self.failures,
+            "batches": self.batches,
+            "write_lag_ms_max": round(self.write_lag_ms_max, 2),
+            "spool_bytes": spool_bytes,
+        }
+
+
+write_behind = WriteBehindQueue(
+    enabled=db_connection.settings.write_behind,
+    max_pending=db_connection.settings.write_behind_max_pending,
+    batch_size=db_connection.settings.write_behind_batch_size,
+    spool_path=db_connection.settings.write_behind_spool_path,
+    fsync=db_connection.settings.write_behind_fsync,
+)
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any, Optional, Union
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Any, Optional, Union
 from ..models.messages import (
     SimpleMessage, MessageRole, TokenUsage, TokenUsageDetails,
     ModelMessage, ModelRequest, ModelResponse,
@@ -6,68 +7,124 @@ from ..models.messages import (
     TextPart, ToolCallPart
 )
 
+USAGE_DETAIL_FIELDS = tuple(TokenUsageDetails.model_fields)
+
+
+def _user_prompt(part: UserPromptPart) -> SimpleMessage:
+    content = part.content
+    if isinstance(content, list):
+        text_parts = [item for item in content if isinstance(item, str)]
+        content = " ".join(text_parts) if text_parts else str(content)
+    return SimpleMessage(role=MessageRole.USER, content=str(content))
+
+
+def _system_prompt(part: SystemPromptPart) -> SimpleMessage:
+    return SimpleMessage(role=MessageRole.SYSTEM, content=part.content)
+
+
+def _text(part: TextPart) -> SimpleMessage:
+    return SimpleMessage(role=MessageRole.ASSISTANT, content=part.content)
+
+
+def _tool_return(part: ToolReturnPart) -> SimpleMessage:
+    # Serialized as the model saw it (JSON); repr() of large ClickUp payloads dominated the cost
+    return SimpleMessage(role=MessageRole.TOOL, content=f"[Tool: {part.tool_name}] {part.model_response_str()}")
+
+
+def _tool_call(part: ToolCallPart) -> SimpleMessage:
+    args = part.args
+    args_str = args if isinstance(args, str) else part.args_as_json_str()
+    return SimpleMessage(role=MessageRole.ASSISTANT, content=f"[Calling tool: {part.tool_name}] Args: {args_str}")
+
+
+def _retry_prompt(part: RetryPromptPart) -> SimpleMessage:
+    return SimpleMessage(role=MessageRole.SYSTEM, content=f"[Retry requested] {part.model_response()}")
+
+
+# Part type -> simple message builder; parts of other types are skipped
+PART_HANDLERS: Dict[type, Optional[Callable[[Any], SimpleMessage]]] = {
+    UserPromptPart: _user_prompt,
+    SystemPromptPart: _system_prompt,
+    TextPart: _text,
+    ToolReturnPart: _tool_return,
+    ToolCallPart: _tool_call,
+    RetryPromptPart: _retry_prompt,
+}
+
+
+def _part_handler(part_type: type) -> Optional[Callable[[Any], SimpleMessage]]:
+    try:
+        return PART_HANDLERS[part_type]
+    except KeyError:
+        # Subclasses resolve to their closest registered base, once
+        handler = next((PART_HANDLERS[base] for base in part_type.__mro__[1:] if base in PART_HANDLERS), None)
+        PART_HANDLERS[part_type] = handler
+        return handler
+
+
+@dataclass
+class TransformResult:
+    simple_messages: List[SimpleMessage] = field(default_factory=list)
+    model_name: Optional[str] = None
+    token_usage: Optional[TokenUsage] = None
+
 
 class MessageTransformer:
     @staticmethod
-    def extract_simple_message(message_part: Union[SystemPromptPart, UserPromptPart, ToolReturnPart, RetryPromptPart, TextPart, ToolCallPart]) -> Optional[SimpleMessage]:
-        if isinstance(message_part, UserPromptPart):
-            content = message_part.content
-            if isinstance(content, list):
-                text_parts = [item for item in content if isinstance(item, str)]
-                content = " ".join(text_parts) if text_parts else str(content)
-            return SimpleMessage(role=MessageRole.USER, content=str(content))
-        
-        elif isinstance(message_part, SystemPromptPart):
-            return SimpleMessage(role=MessageRole.SYSTEM, content=message_part.content)
-        
-        elif isinstance(message_part, TextPart):
-            return SimpleMessage(role=MessageRole.ASSISTANT, content=message_part.content)
-        
-        elif isinstance(message_part, ToolReturnPart):
-            content = message_part.content
-            if not isinstance(content, str):
-                content = str(content)
-            return SimpleMessage(
-                role=MessageRole.TOOL,
-                content=f"[Tool: {message_part.tool_name}] {content}"
-            )
+    def transform(raw_messages: List[ModelMessage]) -> TransformResult:
+        """Simple messages, first model name and usage totals in a single pass over the messages."""
+        simple_messages = []
+        append = simple_messages.append
+        model_name = None
+        has_usage = False
+        requests = request_tokens = response_tokens = total_tokens = 0
+        details = dict.fromkeys(USAGE_DETAIL_FIELDS, 0)
         
-        elif isinstance(message_part, ToolCallPart):
-            args = message_part.args
-            if isinstance(args, str):
-                args_str = args
-            else:
-                args_str = str(args)
-            return SimpleMessage(
-                role=MessageRole.ASSISTANT,
-                content=f"[Calling tool: {message_part.tool_name}] Args: {args_str}"
-            )
+        for message in raw_messages:
+            for part in message.parts:
+                handler = _part_handler(type(part))
+                if handler is not None:
+                    append(handler(part))
+            
+            if message.kind == "response":
+                if model_name is None and message.model_name:
+                    model_name = message.model_name
+                usage = message.usage
+                if usage:
+                    has_usage = True
+                    requests += usage.requests
+                    request_tokens += usage.request_tokens or 0
+                    response_tokens += usage.response_tokens or 0
+                    total_tokens += usage.total_tokens or 0
+                    usage_details = usage.details
+                    if isinstance(usage_details, dict):
+                        for name, value in usage_details.items():
+                            if value and name in details:
+                                details[name] += value
+                    elif usage_details:
+                        # Older pydantic-ai releases used an object
+                        for name in USAGE_DETAIL_FIELDS:
+                            details[name] += getattr(usage_details, name, None) or 0
         
-        elif isinstance(message_part, RetryPromptPart):
-            return SimpleMessage(
-                role=MessageRole.SYSTEM,
-                content=f"[Retry requested] {message_part.model_response()}"
+        token_usage = None
+        if has_usage:
+            token_usage = TokenUsage(
+                requests=requests,
+                request_tokens=request_tokens,
+                response_tokens=response_tokens,
+                total_tokens=total_tokens,
+                details=TokenUsageDetails(**details) if any(details.values()) else None
             )
-        
-        return None
+        return TransformResult(simple_messages=simple_messages, model_name=model_name, token_usage=token_usage)
+    
+    @staticmethod
+    def extract_simple_message(message_part: Union[SystemPromptPart, UserPromptPart, ToolReturnPart, RetryPromptPart, TextPart, ToolCallPart]) -> Optional[SimpleMessage]:
+        handler = _part_handler(type(message_part))
+        return handler(message_part) if handler is not None else None
     
     @staticmethod
     def transform_messages(raw_messages: List[ModelMessage]) -> List[SimpleMessage]:
-        simple_messages = []
-        
-        for message in raw_messages:
-            if isinstance(message, ModelRequest):
-                for part in message.parts:
-                    simple_msg = MessageTransformer.extract_simple_message(part)
-                    if simple_msg:
-                        simple_messages.append(simple_msg)
-            elif isinstance(message, ModelResponse):
-                for part in message.parts:
-                    simple_msg = MessageTransformer.extract_simple_message(part)
-                    if simple_msg:
-                        simple_messages.append(simple_msg)
-        
-        return simple_messages
+        return MessageTransformer.transform(raw_messages).simple_messages
     
     @staticmethod
     def extract_model_info(raw_messages: List[ModelMessage]) -> Optional[str]:
@@ -78,51 +135,4 @@ class MessageTransformer:
     
     @staticmethod
     def aggregate_token_usage(raw_messages: List[ModelMessage]) -> Optional[TokenUsage]:
-        total_usage = {
-            "requests": 0,
-            "request_tokens": 0,
-            "response_tokens": 0,
-            "total_tokens": 0
-        }
-        
-        details_aggregated = {
-            "accepted_prediction_tokens": 0,
-            "audio_tokens": 0,
-            "reasoning_tokens": 0,
-            "rejected_prediction_tokens": 0,
-            "cached_tokens": 0
-        }
-        
-        has_usage = False
-        
-        for message in raw_messages:
-            if isinstance(message, ModelResponse) and message.usage:
-                has_usage = True
-                usage = message.usage
-                total_usage["requests"] += usage.requests
-                total_usage["request_tokens"] += usage.request_tokens
-                total_usage["response_tokens"] += usage.response_tokens
-                total_usage["total_tokens"] += usage.total_tokens
-                
-                if usage.details:
-                    details = usage.details
-                    if hasattr(details, 'accepted_prediction_tokens') and details.accepted_prediction_tokens:
-                        details_aggregated["accepted_prediction_tokens"] += details.accepted_prediction_tokens
-                    if hasattr(details, 'audio_tokens') and details.audio_tokens:
-                        details_aggregated["audio_tokens"] += details.audio_tokens
-                    if hasattr(details, 'reasoning_tokens') and details.reasoning_tokens:
-                        details_aggregated["reasoning_tokens"] += details.reasoning_tokens
-                    if hasattr(details, 'rejected_prediction_tokens') and details.rejected_prediction_tokens:
-                        details_aggregated["rejected_prediction_tokens"] += details.rejected_prediction_tokens
-                    if hasattr(details, 'cached_tokens') and details.cached_tokens:
-                        details_aggregated["cached_tokens"] += details.cached_tokens
-        
-        if not has_usage:
-            return None
-        
-        token_usage = TokenUsage(
-            **total_usage,
-            details=TokenUsageDetails(**details_aggregated) if any(details_aggregated.values()) else None
-        )
-        
-        return token_usage
\ No newline at end of file
+        return MessageTransformer.transform(raw_messages).token_usage